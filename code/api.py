@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import datetime
+import gzip
+import io
+import json
+import os
+
+import anyio
+import pyarrow as pa
+import uvicorn
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import data_cache
+import instrumentation
+import store
+from datasets import DATASET_LOADERS, load_cases_deaths_vaccinations_data, load_data, \
+    load_hospitalizations_vaccinations_data
+from figure_cache import FigureCache
+from incidence import incidence_series
+from state_index import state_slice
+
+CONCURRENCY = int(os.environ.get("COVID_API_CONCURRENCY", 4))
+CACHE_BYTES = int(os.environ.get("COVID_API_CACHE_BYTES", 32 * 2 ** 20))
+MIN_COMPRESS_BYTES = 512
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+STATE_COLUMNS = ["date", "daily_deaths", "daily_fully_vaccinated", "Deaths", "People_Fully_Vaccinated"]
+
+# Encoded (and compressed) response bodies, keyed by the request and the versions of the datasets behind it.
+RESPONSE_CACHE = FigureCache(CACHE_BYTES)
+
+
+def parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, "{} must be an ISO date, got {!r}".format(name, value))
+
+
+def parse_flag(value):
+    return value is not None and value.lower() in ("1", "true", "yes")
+
+
+def state_series(path_params, query):
+    covid = load_data()
+    state = path_params["state"]
+    if state not in covid["index"]["bounds"]:
+        raise HTTPException(404, "unknown state {!r}".format(state))
+    columns = query["columns"].split(",") if query.get("columns") else STATE_COLUMNS
+    unknown = sorted(set(columns) - set(covid["data"].columns))
+    if unknown:
+        raise HTTPException(400, "unknown columns: {}".format(", ".join(unknown)))
+    start_date, end_date = parse_date(query.get("start"), "start"), parse_date(query.get("end"), "end")
+    data = state_slice(covid["index"], state, start_date, end_date)
+    if query.get("variant"):
+        data = data[data["Variant"] == query["variant"]]
+    return data[columns]
+
+
+def hospitalization_series(path_params, query):
+    hosp_vac = load_hospitalizations_vaccinations_data()
+    booster = parse_flag(query.get("booster"))
+    age_group = query.get("age_group")
+    if age_group is None:
+        return hosp_vac["data"][2 if booster else 0]
+    data = hosp_vac["data"][3 if booster else 1]
+    if age_group not in hosp_vac["age_groups"]:
+        raise HTTPException(404, "unknown age group {!r}".format(age_group))
+    return data[data["Age group"] == age_group].drop(columns="Age group")
+
+
+def incidence_table(path_params, query):
+    cas_dth_vac = load_cases_deaths_vaccinations_data()
+    booster = parse_flag(query.get("booster"))
+    incidence = cas_dth_vac["incidence"][1 if booster else 0]
+    outcome = query.get("outcome", "case")
+    age_group = query.get("age_group", "all_ages" if booster else "all_ages_adj")
+    product = query.get("product", "all_types")
+    if (outcome, age_group, product) not in incidence["series"]:
+        raise HTTPException(404, "no incidence for outcome={!r}, age_group={!r}, product={!r}".format(
+            outcome, age_group, product))
+    return incidence_series(incidence, outcome, age_group, product).reset_index()
+
+
+def encode(data, fmt):
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    # The series are daily: dates are sent as date32 (ISO dates in JSON), not as timestamps.
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.date32()))
+    if fmt == "arrow":
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    # Compacted float32 columns are written with their own shortest digits, not those of the float64 they widen to.
+    for i, field in enumerate(table.schema):
+        if pa.types.is_float32(field.type):
+            values = table.column(i).to_numpy(zero_copy_only=False).astype(str).astype("float64")
+            table = table.set_column(i, field.name, pa.array(values, from_pandas=True))
+    return json.dumps({"columns": table.to_pydict()}, default=str, separators=(",", ":")).encode()
+
+
+def compress(body, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def response_format(request):
+    fmt = request.query_params.get("format")
+    if fmt is None:
+        fmt = "arrow" if ARROW_TYPE in request.headers.get("accept", "") else "json"
+    if fmt not in ("json", "arrow"):
+        raise HTTPException(400, "format must be json or arrow")
+    return fmt
+
+
+def response_encoding(request):
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("accept-encoding", "").split(",")}
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def series_endpoint(query, sources):
+    # Wraps a query returning a DataFrame into an endpoint that serves it as column-oriented JSON or Arrow IPC.
+    # Bodies are cached per encoding until one of the `sources` store datasets changes, and at most CONCURRENCY
+    # requests build a body at a time.
+    def build(request, fmt, encoding, key):
+        raw = RESPONSE_CACHE.get(key + ("identity",))
+        if raw is None:
+            raw = encode(query(request.path_params, request.query_params), fmt)
+            RESPONSE_CACHE.put(key + ("identity",), raw)
+        if encoding == "identity" or len(raw) < MIN_COMPRESS_BYTES:
+            return raw, "identity"
+        body = compress(raw, encoding)
+        RESPONSE_CACHE.put(key + (encoding,), body)
+        return body, encoding
+
+    async def endpoint(request):
+        fmt = response_format(request)
+        encoding = response_encoding(request)
+        # The refresher may still serve the previous version of changed files: the key also names the data in use.
+        versions = tuple(store.dataset_version(name) for name in sources) + (data_cache.generation(),)
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())), fmt, versions)
+        body = RESPONSE_CACHE.get(key + (encoding,))
+        if body is None:
+            body, encoding = await anyio.to_thread.run_sync(build, request, fmt, encoding, key,
+                                                            limiter=request.app.state.limiter)
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type=ARROW_TYPE if fmt == "arrow" else "application/json", headers=headers)
+
+    return endpoint
+
+
+async def states(request):
+    covid = await anyio.to_thread.run_sync(load_data, limiter=request.app.state.limiter)
+    return JSONResponse({"states": covid["states"], "variants": covid["variants"]})
+
+
+async def options(request):
+    limiter = request.app.state.limiter
+    hosp_vac = await anyio.to_thread.run_sync(load_hospitalizations_vaccinations_data, limiter=limiter)
+    cas_dth_vac = await anyio.to_thread.run_sync(load_cases_deaths_vaccinations_data, limiter=limiter)
+    return JSONResponse({
+        "hospitalization_age_groups": hosp_vac["age_groups"],
+        "incidence_age_groups": cas_dth_vac["age_groups_cdv"],
+        "incidence_booster_age_groups": cas_dth_vac["age_groups_cdvb"],
+        "vaccine_types": cas_dth_vac["vaccine_types"],
+    })
+
+
+async def cache_stats(request):
+    return JSONResponse({"responses": RESPONSE_CACHE.stats(), "data": data_cache.stats()})
+
+
+async def metrics(request):
+    return PlainTextResponse(instrumentation.metrics_text() + data_cache.metrics_text(),
+                             media_type="text/plain; version=0.0.4")
+
+
+def create_app(concurrency=None, prefetch=True):
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        app.state.limiter = anyio.CapacityLimiter(concurrency or CONCURRENCY)
+        if prefetch:
+            data_cache.prefetch(DATASET_LOADERS.values())
+        data_cache.start_refresher()
+        yield
+        data_cache.stop_refresher()
+
+    return Starlette(lifespan=lifespan, routes=[
+        Route("/states", states),
+        # Each series is keyed on every dataset its loader reads, as declared to the data cache.
+        Route("/states/{state}", series_endpoint(state_series, load_data.sources)),
+        Route("/options", options),
+        Route("/hospitalizations", series_endpoint(hospitalization_series,
+                                                   load_hospitalizations_vaccinations_data.sources)),
+        Route("/incidence", series_endpoint(incidence_table, load_cases_deaths_vaccinations_data.sources)),
+        Route("/stats", cache_stats),
+        Route("/metrics", metrics),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API serving the dashboard's time series")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Requests building a response at the same time")
+    parser.add_argument("--no-prefetch", action="store_true", help="Load the datasets on first use only")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.concurrency, not args.no_prefetch), host=args.host, port=args.port,
+                log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
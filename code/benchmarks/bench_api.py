@@ -0,0 +1,105 @@
+import argparse
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(concurrency):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "api.py", "--port", str(port), "--concurrency", str(concurrency)])
+    url = "http://127.0.0.1:{}".format(port)
+    for _ in range(600):
+        try:
+            urllib.request.urlopen(url + "/states", timeout=60).read()
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("API server did not start")
+
+
+def fetch(url, headers):
+    start = time.perf_counter()
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=60) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def request_paths(base_url, n, seed):
+    # The kind of slices the dashboard pages show: a state over a date range, a variant, an incidence cell.
+    states = json.loads(urllib.request.urlopen(base_url + "/states").read())
+    options = json.loads(urllib.request.urlopen(base_url + "/options").read())
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.6:
+            month = rng.randint(1, 12)
+            paths.append("/states/{}?start=2021-{:02d}-01&end=2021-12-31".format(
+                urllib.parse.quote(rng.choice(states["states"])), month))
+        elif kind < 0.8:
+            paths.append("/states/{}?{}".format(urllib.parse.quote(rng.choice(states["states"])),
+                                                urllib.parse.urlencode({"variant": rng.choice(states["variants"])})))
+        else:
+            paths.append("/incidence?" + urllib.parse.urlencode({
+                "outcome": rng.choice(["case", "death"]), "age_group": rng.choice(options["incidence_age_groups"])}))
+    return paths
+
+
+def load_test(base_url, paths, clients, headers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = list(executor.map(lambda path: fetch(base_url + path, headers), paths))
+    seconds = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), len(paths) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and throughput of the HTTP API")
+    parser.add_argument("--url", help="Test a running instance instead of starting one")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrency limit of the started server")
+    parser.add_argument("--encoding", default="gzip", help="Accept-Encoding sent with every request")
+    parser.add_argument("--format", default="json", choices=["json", "arrow"])
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_server(args.concurrency)
+    try:
+        headers = {"Accept-Encoding": args.encoding}
+        if args.format == "arrow":
+            headers["Accept"] = "application/vnd.apache.arrow.stream"
+        print("{:<8} {:<8} {:>9} {:>9} {:>10}".format("pass", "clients", "p50 ms", "p99 ms", "req/s"))
+        for clients in args.clients:
+            # A new request mix per client count: the first pass builds the responses it has not seen before,
+            # the second finds them all in the response cache.
+            paths = request_paths(base_url, args.requests, seed=clients)
+            for label in ["first", "repeat"]:
+                p50, p99, rate = load_test(base_url, paths, clients, headers)
+                print("{:<8} {:<8} {:>9.2f} {:>9.2f} {:>10.0f}".format(label, clients, p50, p99, rate))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import STATES, make_covid_data
+from cleaning import DAILY_COLUMNS, daily_deltas
+
+
+def notebook_deltas(df):
+    # The cells of data_cleaning.ipynb, unchanged.
+    df = df.sort_values(by=['Province_State', 'date'])
+    df.loc[:, 'daily_confirmed'] = np.where(df.Province_State == df.Province_State.shift(1), df.Confirmed.diff(), 0)
+    df.loc[:, 'daily_deaths'] = np.where(df.Province_State == df.Province_State.shift(1), df.Deaths.diff(), 0)
+    df.loc[:, 'daily_partially_vaccinated'] = np.where(df.Province_State == df.Province_State.shift(1),
+                                                       df.People_Partially_Vaccinated.diff(), 0)
+    df.loc[:, 'daily_fully_vaccinated'] = np.where(df.Province_State == df.Province_State.shift(1),
+                                                   df.People_Fully_Vaccinated.diff(), 0)
+    df['daily_confirmed'] = np.where(df['daily_confirmed'] < 0, 0, df['daily_confirmed'])
+    df['daily_deaths'] = np.where(df['daily_deaths'] < 0, 0, df['daily_deaths'])
+    df['daily_partially_vaccinated'] = np.where(df['daily_partially_vaccinated'] < 0, 0,
+                                                df['daily_partially_vaccinated'])
+    df['daily_fully_vaccinated'] = np.where(df['daily_fully_vaccinated'] < 0, 0, df['daily_fully_vaccinated'])
+    df['daily_partially_vaccinated'] = df['daily_partially_vaccinated'].fillna(0)
+    df['daily_fully_vaccinated'] = df['daily_fully_vaccinated'].fillna(0)
+    return df
+
+
+def measure(function, data, repeat):
+    seconds = min(timed(function, data) for _ in range(repeat))
+    tracemalloc.start()
+    function(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2 ** 20
+
+
+def timed(function, data):
+    start = time.perf_counter()
+    function(data)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily deltas: data_cleaning.ipynb logic vs cleaning.daily_deltas")
+    parser.add_argument("--scale", type=int, default=100, help="Multiple of the 58-state dataset")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_covid_data(n_states=len(STATES) * args.scale).drop(columns=list(DAILY_COLUMNS.values()))
+    # Reporting corrections, so that clamping actually has something to do.
+    corrections = np.random.default_rng(0).random(len(data)) < 0.01
+    data.loc[corrections, "Deaths"] = (data.loc[corrections, "Deaths"] * 0.9).astype("int64")
+    print("rows={}".format(len(data)))
+
+    for order, frame in [("sorted", data), ("shuffled", data.sample(frac=1, random_state=0))]:
+        expected = notebook_deltas(frame)
+        actual = daily_deltas(frame)
+        for name in DAILY_COLUMNS.values():
+            assert np.allclose(expected[name].fillna(0), actual[name].reindex(expected.index)), name
+
+        for label, function in [("notebook", notebook_deltas), ("daily_deltas", daily_deltas),
+                                ("redistribute", lambda d: daily_deltas(d, redistribute=True))]:
+            seconds, peak = measure(function, frame, args.repeat)
+            print("{:<9} {:<14} {:.3f}s  peak_alloc={:.1f}MB".format(order, label, seconds, peak))
+
+
+if __name__ == "__main__":
+    main()
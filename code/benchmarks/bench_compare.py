@@ -0,0 +1,62 @@
+import argparse
+import inspect
+import time
+
+import pandas as pd
+
+import plots
+from benchmarks.synthetic import STATES, make_covid_data
+from compare import compare_states
+from derived import KEYS, derive
+from state_index import build_state_index, state_slice
+
+
+def loop_compare(index, states, column, measure, population):
+    # One filter and one pandas computation per state, as an ad-hoc comparison would do it.
+    series = {}
+    for state in states:
+        values = state_slice(index, state)[column]
+        if measure == "mean7":
+            values = values.rolling(7, min_periods=1).mean()
+        elif measure == "cumulative":
+            values = values.cumsum()
+        series[state] = values / population["population"][state] * 100000
+    return series
+
+
+def best_of(repeat, function):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of the multi-state comparison by number of states")
+    parser.add_argument("--counts", type=int, nargs="+", default=[2, 8, 16, 32, 58])
+    parser.add_argument("--measure", default="mean7", choices=["daily", "mean7", "cumulative"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_covid_data()
+    data["date"] = pd.to_datetime(data["date"])
+    data = data.merge(derive(data), on=KEYS, how="left")
+    index = build_state_index(data)
+    population = {"version": "synthetic", "population": {state: 1000000.0 for state in STATES}}
+    build = inspect.unwrap(plots.plot_daily_deaths)
+
+    print("{:<8} {:>12} {:>14} {:>12}".format("states", "loop ms", "vectorized ms", "figure ms"))
+    for count in args.counts:
+        states = STATES[:count]
+        loop = best_of(args.repeat, lambda: loop_compare(index, states, "daily_deaths", args.measure, population))
+        vectorized = best_of(args.repeat, lambda: compare_states(index, states, "daily_deaths", measure=args.measure,
+                                                                 population=population))
+        figure = best_of(args.repeat, lambda: build(index, None, None, states, args.measure, population))
+        print("{:<8} {:>12.2f} {:>14.2f} {:>12.1f}".format(count, loop * 1000, vectorized * 1000, figure * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import cube
+from benchmarks.synthetic import make_county_deaths
+
+
+def long_counties(wide):
+    # The county series as one flat frame, the shape the state-level plots filter with boolean masks.
+    counts, dates = cube.county_matrix(wide)
+    daily = np.zeros_like(counts)
+    np.fmax(np.diff(counts, axis=1), 0, out=daily[:, 1:])
+    return pd.DataFrame({
+        "Combined_Key": np.repeat(wide["Combined_Key"].to_numpy(), len(dates)),
+        "Province_State": np.repeat(wide["Province_State"].to_numpy(), len(dates)),
+        "date": np.tile(dates.to_numpy(), len(wide)),
+        "Deaths": counts.ravel(),
+        "daily_deaths": daily.ravel(),
+    })
+
+
+def mask_query(data, level, node, frequency, start, end):
+    # Boolean masks over every row, then the state sum and the weekly resample on the fly.
+    dates = data["date"]
+    rows = data[(data[level] == node) & (dates >= start) & (dates <= end)]
+    if level == "Province_State":
+        rows = rows.groupby("date", sort=True)[["Deaths", "daily_deaths"]].sum().reset_index()
+    if frequency == "week":
+        rows = rows.resample(cube.FREQUENCIES["week"], on="date").agg({"Deaths": "last", "daily_deaths": "sum"})
+    return rows
+
+
+def latencies(queries, function):
+    seconds = []
+    for query in queries:
+        start = time.perf_counter()
+        function(*query)
+        seconds.append(time.perf_counter() - start)
+    return np.percentile(seconds, [50, 99]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="County and state query latency: boolean masks vs the rollup cube")
+    parser.add_argument("--counties", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=50, help="Queries per level and frequency")
+    args = parser.parse_args()
+
+    wide = make_county_deaths(args.counties)
+    wide.attrs["version"] = "synthetic"
+    start = time.perf_counter()
+    rollup = cube.assemble(*cube.build(wide))
+    print("cube: {} nodes, built and indexed in {:.2f}s".format(len(rollup["nodes"]), time.perf_counter() - start))
+    data = long_counties(wide)
+    data["Combined_Key"] = data["Combined_Key"].astype("category")
+    data["Province_State"] = data["Province_State"].astype("category")
+
+    rng = np.random.default_rng(0)
+    low, high = pd.Timestamp("2021-01-01"), pd.Timestamp("2021-12-31")
+    print("{:<8} {:<6} {:>10} {:>10} {:>10} {:>10}".format("level", "freq", "mask p50", "mask p99", "cube p50",
+                                                          "cube p99"))
+    for level, column in [("county", "Combined_Key"), ("state", "Province_State")]:
+        nodes = rollup["nodes"].index[rollup["nodes"]["level"] == level]
+        picked = rng.choice(nodes, args.queries)
+        for frequency in cube.FREQUENCIES:
+            masks = latencies([(node,) for node in picked],
+                              lambda node: mask_query(data, column, node, frequency, low, high))
+            cubes = latencies([(node,) for node in picked],
+                              lambda node: cube.cube_slice(rollup, node, frequency, low, high))
+            print("{:<8} {:<6} {:>10.2f} {:>10.2f} {:>10.3f} {:>10.3f}".format(level, frequency, *masks, *cubes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+import data_cache
+import store
+from benchmarks.synthetic import STATES, make_covid_data
+
+
+def legacy_hash(data):
+    # How the removed st.cache hashed a DataFrame argument or return value: large frames were sampled first.
+    if len(data) >= 100000:
+        data = data.sample(n=10000, random_state=0)
+    return hashlib.md5(str(pd.util.hash_pandas_object(data).sum()).encode()).hexdigest()
+
+
+def legacy_rerun(covid, hosp, cdv):
+    # One rerun of covid_app.main under st.cache: every cached function hashed its DataFrame arguments and,
+    # to detect mutation, its DataFrame return values.
+    frames = [covid] * 3 + list(hosp) + [hosp[1]] + list(cdv) * 2
+    for frame in frames:
+        legacy_hash(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time per rerun spent in the data cache: st.cache vs data_cache")
+    parser.add_argument("--scale", type=int, default=1, help="Multiple of the 58-state covid dataset")
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        data_dir = os.path.join(work_dir, "data")
+        store_dir = os.path.join(work_dir, "store")
+        os.makedirs(data_dir)
+        for spec in store.DATASETS.values():
+            if os.path.exists(os.path.join(store.DATA_DIR, spec["file"])):
+                shutil.copy(os.path.join(store.DATA_DIR, spec["file"]), data_dir)
+        make_covid_data(n_states=len(STATES) * args.scale).to_csv(
+            os.path.join(data_dir, store.DATASETS["covid"]["file"]), index=False)
+        # Sources that are not in data/ (the county deaths unless fetched) are left out of the run.
+        names = [name for name in store.DATASETS if os.path.exists(store.source_path(name, data_dir))]
+        store.ingest(names, data_dir, store_dir)
+        store.STORE_DIR = store_dir
+
+        covid = store.load("covid")
+        hosp = [store.load(name) for name in ["hosp_adults", "hosp_age_group", "hosp_adults_booster",
+                                              "hosp_age_group_booster"]]
+        cdv = [store.load("cdv"), store.load("cdv_booster")]
+        start = time.perf_counter()
+        for _ in range(args.reruns):
+            legacy_rerun(covid, hosp, cdv)
+        before = (time.perf_counter() - start) / args.reruns
+
+        loaders = [data_cache.cached(sources=[name])(lambda name=name: store.load(name)) for name in names]
+        for load in loaders:
+            load()
+        lookups = data_cache.stats()["lookup_seconds"]
+        for _ in range(args.reruns):
+            for load in loaders:
+                load()
+        after = (data_cache.stats()["lookup_seconds"] - lookups) / args.reruns
+
+        print("covid rows={}".format(len(covid)))
+        print("st.cache hashing per rerun:   {:.3f} ms".format(before * 1000))
+        print("data_cache lookups per rerun: {:.3f} ms".format(after * 1000))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
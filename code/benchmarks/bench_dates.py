@@ -0,0 +1,72 @@
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import STATES, make_covid_data
+from state_index import build_state_index
+from variants import label_variants
+
+ERAS = pd.DataFrame({
+    "Variant": ["Alpha", "Delta", "Omicron"],
+    "start": pd.to_datetime([None, "2020-10-01", "2021-08-01"]),
+    "end": pd.to_datetime(["2020-09-30", "2021-07-31", None]),
+})
+
+
+def notebook_variants(dates):
+    # variants.ipynb: nested np.where over datetime.date objects.
+    return np.where(dates <= datetime.date(2020, 9, 30), "Alpha",
+                    np.where((dates > datetime.date(2020, 9, 30)) & (dates <= datetime.date(2021, 7, 31)), "Delta",
+                             "Omicron"))
+
+
+def slice_states(index, start, end):
+    # The per-state date range lookups of state_index.state_bounds, with bounds of the same type as the dates.
+    for low, high in index["bounds"].values():
+        dates = index["dates"][low:high]
+        np.searchsorted(dates, start, side="left"), np.searchsorted(dates, end, side="right")
+
+
+def best_of(repeat, function):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Date filtering and variant labelling on object dates vs datetime64")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="Multiples of the 58 states")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start, end = datetime.date(2021, 3, 1), datetime.date(2021, 9, 30)
+    print("{:<8} {:>10} {:<10} {:>10} {:>10} {:>10}".format("scale", "rows", "dates", "mask ms", "slice ms",
+                                                            "label ms"))
+    for scale in args.scales:
+        data = make_covid_data(n_states=len(STATES) * scale)
+        data["date"] = pd.to_datetime(data["date"])
+        data["Province_State"] = data["Province_State"].astype("category")
+        objects = data.assign(date=data["date"].dt.date)
+        for name, frame, bounds in [("object", objects, (start, end)),
+                                    ("datetime64", data, (np.datetime64(start, "us"), np.datetime64(end, "us")))]:
+            dates = frame["date"]
+            index = build_state_index(frame)
+            mask = best_of(args.repeat, lambda: frame[(dates >= bounds[0]) & (dates <= bounds[1])])
+            sliced = best_of(args.repeat, lambda: slice_states(index, *bounds))
+            if name == "object":
+                label = best_of(args.repeat, lambda: notebook_variants(dates.to_numpy()))
+            else:
+                label = best_of(args.repeat, lambda: label_variants(frame, ERAS))
+            print("{:<8} {:>10} {:<10} {:>10.2f} {:>10.2f} {:>10.2f}".format(scale, len(frame), name, mask * 1000,
+                                                                           sliced * 1000, label * 1000))
+
+
+if __name__ == "__main__":
+    main()
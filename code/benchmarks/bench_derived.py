@@ -0,0 +1,36 @@
+import argparse
+import time
+
+import pandas as pd
+
+import derived
+from benchmarks.synthetic import STATES, make_covid_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full derivation vs appending one day to the derived metrics")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="Multiples of the 58 states")
+    args = parser.parse_args()
+
+    print("{:<8} {:>10} {:>10} {:>14} {:>12}".format("scale", "rows", "full s", "incremental s", "rows derived"))
+    for scale in args.scales:
+        data = make_covid_data(n_states=len(STATES) * scale)
+        data["date"] = pd.to_datetime(data["date"])
+        data["Province_State"] = data["Province_State"].astype("category")
+        last_day = data["date"] == data["date"].max()
+        previous = derived.derive(data[~last_day])
+
+        start = time.perf_counter()
+        full = derived.derive(data)
+        full_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        incremental, rows = derived.update(data, previous)
+        incremental_seconds = time.perf_counter() - start
+        pd.testing.assert_frame_equal(incremental.sort_values(derived.KEYS, ignore_index=True),
+                                      full.sort_values(derived.KEYS, ignore_index=True))
+        print("{:<8} {:>10} {:>10.3f} {:>14.3f} {:>12}".format(scale, len(data), full_seconds, incremental_seconds,
+                                                              rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import datetime
+import inspect
+import time
+
+import pandas as pd
+
+import plots
+from benchmarks.synthetic import make_covid_data
+from state_index import build_state_index
+
+PLOTS = {
+    "plot_daily_deaths": lambda index, start, end, states: inspect.unwrap(plots.plot_daily_deaths)(
+        index, start, end, states),
+    "plot_daily_vaccines": lambda index, start, end, states: inspect.unwrap(plots.plot_daily_vaccines)(
+        index, start, end, states),
+    "plot_overall_deaths_vaccines": lambda index, start, end, states: inspect.unwrap(
+        plots.plot_overall_deaths_vaccines)(index, start, end, states[0]),
+}
+
+
+def measure(build, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = build().to_json()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return len(payload), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload size and build+serialization time with downsampling")
+    parser.add_argument("--years", type=int, default=12, help="Length of the synthetic history")
+    parser.add_argument("--states", type=int, default=5, help="States selected in the multi-state plots")
+    parser.add_argument("--widths", type=int, nargs="+", default=[30, 180, 730, 1825, 4380], help="Range in days")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    end = datetime.date(2022, 4, 30)
+    data = make_covid_data(n_states=args.states, start=end - datetime.timedelta(days=365 * args.years), end=end)
+    data["date"] = pd.to_datetime(data["date"]).dt.date
+    index = build_state_index(data)
+    states = list(index["bounds"])
+
+    print("{:<30} {:>6} {:>12} {:>10} {:>12} {:>10}".format("plot", "days", "full bytes", "full ms",
+                                                            "sampled bytes", "sampled ms"))
+    max_points = plots.MAX_POINTS
+    for name, build in PLOTS.items():
+        for width in args.widths:
+            start = end - datetime.timedelta(days=width)
+            plots.MAX_POINTS = None
+            full = measure(lambda: build(index, start, end, states), args.repeat)
+            plots.MAX_POINTS = max_points
+            sampled = measure(lambda: build(index, start, end, states), args.repeat)
+            print("{:<30} {:>6} {:>12} {:>10.1f} {:>12} {:>10.1f}".format(
+                name, width, full[0], full[1] * 1000, sampled[0], sampled[1] * 1000))
+
+
+if __name__ == "__main__":
+    main()
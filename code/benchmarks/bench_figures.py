@@ -0,0 +1,90 @@
+import argparse
+import inspect
+import json
+import os
+import tempfile
+import time
+
+import data_cache
+import figures
+import lag_correlation
+import plots
+import store
+from benchmarks.suite import first_views, ingest, measure
+from datasets import DATASET_LOADERS
+
+# The multi-state plots are also timed with more of the synthetic states selected.
+STATE_PLOTS = ["plot_daily_deaths", "plot_daily_vaccines"]
+
+
+def cases(views, state_counts):
+    for name in sorted(views):
+        yield name, name, views[name]
+    for name in STATE_PLOTS:
+        index, start, end, _ = views[name][:4]
+        states = list(index["bounds"])
+        for count in state_counts:
+            count = min(count, len(states))
+            yield "{} ({} states)".format(name, count), name, [index, start, end, states[:count]]
+
+
+def time_case(name, view, repeat):
+    # Figure build and serialization timed apart; the lag correlations are cached per data version, so every run
+    # computes them again.
+    build = inspect.unwrap(getattr(plots, name))
+    built = measure(repeat, lambda: build(*view), lag_correlation._results.clear)
+    fig = build(*view)
+    spec = fig.to_json()
+    serialized = measure(repeat, fig.to_json)
+    return {"build": built["seconds"], "to_json": serialized["seconds"], "bytes": len(spec),
+            "traces": "+".join(sorted({trace.type for trace in fig.data}))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build time, serialization time and JSON bytes of every plot "
+                                                 "function, with SVG and with WebGL traces above the threshold")
+    parser.add_argument("--scale", type=int, default=1, help="Multiple of the dataset rows")
+    parser.add_argument("--states", type=int, nargs="+", default=[5, 20, 1000],
+                        help="States selected in the extra cases of the multi-state plots")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+    args.csv_max_scale = 0
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        store.DATA_DIR, store.STORE_DIR = os.path.join(root, "data"), os.path.join(root, "store")
+        data_cache.clear()
+        ingest(args.scale, args, root, {})
+        views = first_views({name: loader() for name, loader in DATASET_LOADERS.items()})
+        webgl_points = figures.WEBGL_POINTS
+        for case, name, view in cases(views, args.states):
+            figures.WEBGL_POINTS = webgl_points
+            results[case] = time_case(name, view, args.repeat)
+            figures.WEBGL_POINTS = float("inf")
+            results[case]["svg"] = time_case(name, view, args.repeat)
+        figures.WEBGL_POINTS = webgl_points
+        data_cache.clear()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print("{:<52} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}  {}".format(
+        "plot", "build ms", "json ms", "bytes", "svg bytes", "before ms", "before B", "traces"))
+    for case, result in results.items():
+        before = baseline.get(case)
+        print("{:<52} {:>10.2f} {:>10.2f} {:>10} {:>10} {:>10} {:>10}  {}".format(
+            case, result["build"] * 1000, result["to_json"] * 1000, result["bytes"], result["svg"]["bytes"],
+            "{:.2f}".format(before["build"] * 1000) if before else "-", before["bytes"] if before else "-",
+            result["traces"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"date": time.strftime("%Y-%m-%dT%H:%M:%S"), "scale": args.scale, "results": results}, f,
+                      indent=1)
+
+
+if __name__ == "__main__":
+    main()
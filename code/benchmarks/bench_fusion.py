@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import fusion
+from benchmarks.common import peak_rss_mb
+from benchmarks.synthetic import make_daily_report, make_states, make_vaccinations, write_daily_reports
+
+
+def report(label, stats):
+    print("{:<12} files={:<5} rows={:<8} {:.2f}s  {:.0f} rows/s".format(
+        label, stats["files"], stats["rows"], stats["seconds"], stats["rows_per_sec"]))
+
+
+def run_child(reports_dir, vaccinations_path, output, workers, batch_rows):
+    stats = fusion.fuse(reports_dir, vaccinations_path, output, workers, batch_rows)
+    stats["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(stats))
+
+
+def fuse_in_child(reports_dir, vaccinations_path, output, workers, batch_rows):
+    # A fresh interpreter per run so the peak RSS belongs to that run only.
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_fusion", "--child", reports_dir,
+                             vaccinations_path, output, str(workers), str(batch_rows)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def incremental(work_dir, days, n_states):
+    reports_dir = os.path.join(work_dir, "reports")
+    partitions_dir = os.path.join(work_dir, "partitions")
+    vaccinations_path = os.path.join(work_dir, "people_vaccinated_us_timeline.csv")
+
+    report("full", fusion.ingest(reports_dir, vaccinations_path, partitions_dir, full=True))
+    report("no-op", fusion.ingest(reports_dir, vaccinations_path, partitions_dir))
+
+    date = pd.Timestamp("2020-04-12") + pd.Timedelta(days=days)
+    make_daily_report(date, make_states(n_states), np.random.default_rng(1), days).to_csv(
+        os.path.join(reports_dir, date.strftime("%m-%d-%Y.csv")), index=False)
+    report("incremental", fusion.ingest(reports_dir, vaccinations_path, partitions_dir))
+    os.remove(os.path.join(reports_dir, date.strftime("%m-%d-%Y.csv")))
+
+
+def scaling(work_dir, days, workers_list, batch_rows):
+    reports_dir = os.path.join(work_dir, "reports")
+    vaccinations_path = os.path.join(work_dir, "people_vaccinated_us_timeline.csv")
+    output = os.path.join(work_dir, "fused.feather")
+
+    print("\nworkers  days   seconds  rows/s     peak_rss")
+    for workers in workers_list:
+        stats = fuse_in_child(reports_dir, vaccinations_path, output, workers, batch_rows)
+        print("{:<8} {:<6} {:<8.2f} {:<10.0f} {:.1f}MB".format(
+            workers, stats["files"], stats["seconds"], stats["rows_per_sec"], stats["peak_rss_mb"]))
+
+    # Peak memory of the streaming writer should not grow with the number of days.
+    for fraction in [4, 2]:
+        subset_dir = os.path.join(work_dir, "reports_{}".format(fraction))
+        os.makedirs(subset_dir)
+        for name in sorted(os.listdir(reports_dir), key=lambda n: fusion.report_date(n))[:days // fraction]:
+            os.link(os.path.join(reports_dir, name), os.path.join(subset_dir, name))
+        stats = fuse_in_child(subset_dir, vaccinations_path, output, workers_list[-1], batch_rows)
+        print("{:<8} {:<6} {:<8.2f} {:<10.0f} {:.1f}MB".format(
+            workers_list[-1], stats["files"], stats["seconds"], stats["rows_per_sec"], stats["peak_rss_mb"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the daily-report fusion")
+    parser.add_argument("--days", type=int, default=500)
+    parser.add_argument("--states", type=int, default=58)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-rows", type=int, default=fusion.BATCH_ROWS)
+    parser.add_argument("--child", nargs=5, metavar=("REPORTS", "VACCINATIONS", "OUTPUT", "WORKERS", "BATCH_ROWS"))
+    args = parser.parse_args()
+
+    if args.child:
+        reports_dir, vaccinations_path, output, workers, batch_rows = args.child
+        run_child(reports_dir, vaccinations_path, output, int(workers), int(batch_rows))
+        return
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(work_dir, "reports"))
+        write_daily_reports(os.path.join(work_dir, "reports"), args.days, args.states)
+        make_vaccinations(args.states).to_csv(os.path.join(work_dir, "people_vaccinated_us_timeline.csv"),
+                                              index=False)
+        incremental(work_dir, args.days, args.states)
+        scaling(work_dir, args.days, args.workers, args.batch_rows)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
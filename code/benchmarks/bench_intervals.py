@@ -0,0 +1,35 @@
+import argparse
+import time
+
+import intervals
+from benchmarks.synthetic import make_incidence_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confidence interval throughput in cells per second")
+    parser.add_argument("--cells", type=int, default=2000)
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    data = make_incidence_data(args.cells)
+    spec = intervals.SERIES["cdv"]
+    alpha = 1 - intervals.CONFIDENCE
+    start = time.perf_counter()
+    intervals.exact_intervals(data, spec, alpha)
+    seconds = time.perf_counter() - start
+    print("exact (crude IR and IRR): {} cells in {:.3f}s, {:.0f} cells/s".format(args.cells, seconds,
+                                                                              args.cells / seconds))
+
+    print("{:<8} {:>10} {:>12}".format("workers", "seconds", "cells/s"))
+    for workers in args.workers:
+        batches, tasks = intervals.bootstrap_tasks(data, spec, spec["adjusted"], alpha, args.resamples,
+                                                   intervals.SEED)
+        start = time.perf_counter()
+        intervals.run_tasks(tasks, workers)
+        seconds = time.perf_counter() - start
+        print("{:<8} {:>10.2f} {:>12.0f}".format(workers, seconds, args.cells / seconds))
+
+
+if __name__ == "__main__":
+    main()
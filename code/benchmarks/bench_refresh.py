@@ -0,0 +1,139 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import data_cache
+import store
+from benchmarks.suite import write_source
+from benchmarks.synthetic import make_hospitalizations
+from datasets import load_hospitalizations_vaccinations_data
+
+TABLES = ["hosp_adults", "hosp_age_group", "hosp_adults_booster", "hosp_age_group_booster"]
+RATE = "Rate in unvaccinated"
+
+
+def read_loop(stop, hold, latencies, errors):
+    # A session: reads the hospitalizations and keeps them for `hold` seconds, as a page being rendered would.
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            value = load_hospitalizations_vaccinations_data()
+        except Exception as e:
+            errors.append(e)
+            continue
+        latencies.append(time.perf_counter() - start)
+        time.sleep(hold)
+        del value
+
+
+def drop(name, frame, data_dir, partial, settle):
+    # Writes a new version of a source CSV, in two halves `settle / 2` seconds apart when `partial` (a slow copy).
+    path = os.path.join(data_dir, store.DATASETS[name]["file"])
+    tmp_dir = os.path.join(data_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    write_source(name, frame, tmp_dir)
+    with open(os.path.join(tmp_dir, store.DATASETS[name]["file"])) as f:
+        text = f.read()
+    if not partial:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        return
+    with open(path, "w") as f:
+        f.write(text[:len(text) // 2])
+        f.flush()
+        time.sleep(settle / 2)
+        f.write(text[len(text) // 2:])
+
+
+def wait_for(condition, timeout):
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(0.005)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated drops of new CDC files while sessions read: time until "
+                                                 "the new version is served, refresh time, read latency and live "
+                                                 "versions")
+    parser.add_argument("--drops", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4, help="Sessions reading at the same time")
+    parser.add_argument("--hold", type=float, default=0.05, help="Seconds a session keeps the data it read")
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between two checks of the refresher")
+    parser.add_argument("--settle", type=float, default=0.2)
+    parser.add_argument("--weeks", type=int, default=520, help="Weeks of the synthetic hospitalization tables")
+    parser.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as root:
+        # No store: the sources are parsed from the dropped CSVs.
+        store.DATA_DIR, store.STORE_DIR = root, os.path.join(root, "store")
+        tables = make_hospitalizations(args.weeks)
+        for name, frame in tables.items():
+            write_source(name, frame, root)
+        data_cache.clear()
+        load_hospitalizations_vaccinations_data()
+        data_cache.SETTLE_SECONDS = args.settle
+        data_cache.start_refresher(args.interval)
+
+        stop, latencies, errors = threading.Event(), [], []
+        readers = [threading.Thread(target=read_loop, args=(stop, args.hold, latencies, errors))
+                   for _ in range(args.readers)]
+        for reader in readers:
+            reader.start()
+
+        print("{:<5} {:<24} {:<8} {:>10} {:>10}".format("drop", "dataset", "copy", "served s", "refresh s"))
+        for i in range(args.drops):
+            name = TABLES[i % len(TABLES)]
+            frame = tables[name].assign(**{RATE: tables[name][RATE] * (i + 2)})
+            partial = i % 2 == 1
+            generation = data_cache.generation()
+            drop(name, frame, root, partial, args.settle)
+            served = wait_for(lambda: data_cache.generation() > generation, args.timeout)
+            if served is None:
+                failures.append("drop {}: {} was not served within {}s".format(i, name, args.timeout))
+                continue
+            data = load_hospitalizations_vaccinations_data()["data"][TABLES.index(name)]
+            if len(data) != len(frame) or not np.allclose(data[RATE].to_numpy(), frame[RATE].to_numpy(), rtol=1e-6):
+                failures.append("drop {}: {} was served with other values than dropped".format(i, name))
+            print("{:<5} {:<24} {:<8} {:>10.3f} {:>10.3f}".format(i, name, "partial" if partial else "atomic", served,
+                                                                data_cache.stats()["last_refresh_seconds"]))
+
+        # A file whose columns changed: the refresh fails and the previous version stays served.
+        generation, errors_before = data_cache.generation(), data_cache.stats()["refresh_errors"]
+        drop("hosp_adults", tables["hosp_adults"].rename(columns={RATE: "Rate among unvaccinated"}), root, False,
+             args.settle)
+        if wait_for(lambda: data_cache.stats()["refresh_errors"] > errors_before, args.timeout) is None:
+            failures.append("the file with renamed columns was not rejected")
+        if data_cache.generation() != generation:
+            failures.append("the file with renamed columns replaced the served version")
+
+        stop.set()
+        for reader in readers:
+            reader.join()
+        data_cache.stop_refresher()
+
+    stats = data_cache.stats()
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    print("reads: {} by {} sessions, latency p50 {:.1f}us p99 {:.1f}us max {:.1f}us, {} errors".format(
+        len(latencies), args.readers, p50, p99, max(latencies) * 1e6, len(errors)))
+    print("refreshes: {} in {:.3f}s, {} failed; live versions: {} now, {} at most".format(
+        stats["refreshes"], stats["refresh_seconds"], stats["refresh_errors"], stats["live_versions"],
+        stats["peak_live_versions"]))
+    if errors:
+        failures.append("{} reads failed, first: {!r}".format(len(errors), errors[0]))
+    if failures:
+        parser.exit(1, "\n".join(failures) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import sources
+import store
+from benchmarks.common import rss_mb
+from benchmarks.synthetic import make_covid_data
+
+
+def load_csv(data_dir):
+    # Mirrors the loaders in covid_app.py before the columnar store existed.
+    frames = []
+    for name, spec in store.DATASETS.items():
+        path = os.path.join(data_dir, spec["file"])
+        if not os.path.exists(path):
+            continue
+        data = pd.read_csv(path, skiprows=sources.SCHEMAS.get(name, {}).get("preamble", 0))
+        for column in spec.get("dates", []):
+            data[column] = pd.to_datetime(data[column]).dt.date
+        frames.append(data)
+    return frames
+
+
+def load_store(store_dir):
+    frames = []
+    for name, spec in store.DATASETS.items():
+        if not os.path.exists(store.store_path(name, store_dir)):
+            continue
+        data = store.load(name, store_dir=store_dir)
+        for column in spec.get("dates", []):
+            data[column] = data[column].dt.date
+        frames.append(data)
+    return frames
+
+
+def run_child(mode, data_dir, store_dir):
+    import pyarrow  # noqa: F401
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    frames = load_csv(data_dir) if mode == "csv" else load_store(store_dir)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "seconds": seconds, "rows": sum(len(f) for f in frames),
+                      "rss_delta_mb": rss_mb() - base_rss, "rss_mb": rss_mb()}))
+
+
+def prepare(work_dir, n_states, compression):
+    data_dir = os.path.join(work_dir, "data")
+    store_dir = os.path.join(work_dir, "store")
+    os.makedirs(data_dir)
+    for spec in store.DATASETS.values():
+        path = os.path.join(store.DATA_DIR, spec["file"])
+        if os.path.exists(path):
+            shutil.copy(path, data_dir)
+    covid_path = os.path.join(data_dir, store.DATASETS["covid"]["file"])
+    if not os.path.exists(covid_path):
+        make_covid_data(n_states=n_states).to_csv(covid_path, index=False)
+    store.ingest([name for name in store.DATASETS if os.path.exists(store.source_path(name, data_dir))], data_dir,
+                 store_dir, compression)
+    return data_dir, store_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time and memory: CSV loaders vs columnar store")
+    parser.add_argument("--states", type=int, default=58, help="States in the synthetic covid dataset")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compression", default="uncompressed", choices=["lz4", "zstd", "uncompressed"])
+    parser.add_argument("--child", choices=["csv", "store"])
+    parser.add_argument("--data-dir")
+    parser.add_argument("--store-dir")
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.data_dir, args.store_dir)
+        return
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        data_dir, store_dir = prepare(work_dir, args.states, args.compression)
+        for mode in ["csv", "store"]:
+            results = []
+            for _ in range(args.repeat):
+                # A fresh interpreter per run so each measurement is a cold start.
+                output = subprocess.run([sys.executable, "-m", "benchmarks.bench_store", "--child", mode,
+                                         "--data-dir", data_dir, "--store-dir", store_dir],
+                                        check=True, capture_output=True, text=True).stdout
+                results.append(json.loads(output))
+            best = min(results, key=lambda r: r["seconds"])
+            print("{:<6} rows={:<9} load={:.3f}s  rss_delta={:.1f}MB  rss={:.1f}MB".format(
+                mode, best["rows"], best["seconds"], best["rss_delta_mb"], best["rss_mb"]))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import resource
+
+
+def _proc_status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+
+
+def rss_mb():
+    if os.path.exists("/proc/self/status"):
+        return _proc_status("VmRSS")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def peak_rss_mb():
+    # VmHWM starts over on exec, unlike ru_maxrss which a child inherits from its parent.
+    if os.path.exists("/proc/self/status"):
+        return _proc_status("VmHWM")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
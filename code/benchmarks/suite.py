@@ -0,0 +1,268 @@
+import argparse
+import datetime
+import gc
+import inspect
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import cleaning
+import cube
+import data_cache
+import derived
+import international
+import intervals
+import lag_correlation
+import plots
+import sources
+import store
+from benchmarks.synthetic import (CDV_AGE_GROUPS, CDVB_AGE_GROUPS, HOSPITALIZATION_AGE_GROUPS, STATES, make_cdv,
+                                  make_cdv_booster, make_county_deaths, make_covid_data, make_hospitalizations,
+                                  make_international, make_population, make_variant_eras)
+from datasets import DATASET_LOADERS
+from render import VIEWS, resolve
+from variants import label_variants
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Resamples of the bootstrap intervals stored during setup: the loaders only read them back.
+SETUP_RESAMPLES = 200
+
+
+def scale_shape(scale):
+    # A scale multiplies the rows of every dataset: histories grow with about its cube root, and the number of
+    # states and of age groups makes up the rest.
+    history = max(1, round(scale ** 0.3))
+    return {"history": history, "breadth": max(1, round(scale / history))}
+
+
+def make_sources(scale, seed=0):
+    # Every dataset of the store at `scale`, shaped as parsed from its source CSV.
+    shape = scale_shape(scale)
+    history, breadth = shape["history"], shape["breadth"]
+    n_states = len(STATES) * breadth
+    start = pd.Timestamp("2020-04-12")
+    end = start + pd.Timedelta(days=748 * history)
+    return {
+        "covid": lambda: make_covid_data(n_states, start, end, seed),
+        "hosp": lambda: make_hospitalizations(65 * history, len(HOSPITALIZATION_AGE_GROUPS) * breadth, seed),
+        "cdv": lambda: make_cdv(50 * history, len(CDV_AGE_GROUPS) * breadth, seed),
+        "cdv_booster": lambda: make_cdv_booster(26 * history, len(CDVB_AGE_GROUPS) * breadth, seed),
+        "population": lambda: make_population(n_states, seed),
+        "variant_eras": make_variant_eras,
+        # The US has about 3,000 counties: only their histories grow (a wider matrix does not fit in memory at 100x).
+        "counties": lambda: make_county_deaths(3000, len(STATES), "2020-01-22", end, seed),
+        "international": lambda: make_international(14 * breadth, 670 * history, seed),
+    }
+
+
+def write_source(name, data, data_dir):
+    path = os.path.join(data_dir, store.DATASETS[name]["file"])
+    with open(path, "w") as f:
+        # The CDC tables start with a title and a generation date above the header.
+        for line in range(sources.SCHEMAS.get(name, {}).get("preamble", 0)):
+            f.write("Synthetic table line {}\n".format(line + 1))
+        data.to_csv(f, index=False)
+
+
+def measure(repeat, function, setup=None):
+    # Best and mean of `repeat` runs with the garbage collector paused, as timeit does.
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            runs.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return {"seconds": min(runs), "mean": float(np.mean(runs)), "runs": len(runs)}
+
+
+def ingest(scale, args, data_dir, results):
+    # Writes the synthetic sources to the store; up to --csv-max-scale they go through CSV and read_source is timed,
+    # above it the frames are converted in memory (writing gigabytes of CSV would dominate the run).
+    csv = scale <= args.csv_max_scale
+    for group, make in make_sources(scale, args.seed).items():
+        frames = make()
+        for name, frame in (frames.items() if isinstance(frames, dict) else [(group, frames)]):
+            if csv:
+                write_source(name, frame, data_dir)
+                results["ingest/" + name] = measure(args.repeat, lambda: store.read_source(name))
+                data = store.read_source(name)
+            else:
+                data = store.convert_source(name, frame)
+            store.write_store(name, data)
+            del frame, data
+        del frames
+        gc.collect()
+    # The app reads precomputed derived columns, rollups and intervals, as their CLIs leave them.
+    covid = store.load("covid")
+    rows = derived.derive(covid)
+    rows.attrs["source_version"] = covid.attrs["version"]
+    store.write_store(derived.NAME, rows)
+    del covid, rows
+    rows, nodes = cube.build(store.load(cube.SOURCE))
+    store.write_store(cube.NODES, nodes)
+    store.write_store(cube.NAME, rows)
+    del rows, nodes
+    store.write_store(international.NAME,
+                      international.build({name: store.load(name) for name in international.SOURCES}))
+    for name in intervals.SERIES:
+        data = store.load(name)
+        store.write_store(intervals.store_name(name),
+                          intervals.confidence_intervals(data, name, resamples=SETUP_RESAMPLES))
+
+
+def time_steps(args, results):
+    for name in store.DATASETS:
+        results["store/" + name] = measure(args.repeat, lambda: store.load(name))
+    covid = store.load("covid")
+    eras = store.load("variant_eras")
+    results["cleaning/daily_deltas"] = measure(args.repeat, lambda: cleaning.daily_deltas(covid))
+    results["cleaning/derive"] = measure(args.repeat, lambda: derived.derive(covid))
+    results["variants/label_variants"] = measure(args.repeat, lambda: label_variants(covid, eras))
+    del covid
+    counties = store.load(cube.SOURCE)
+    results["cube/build"] = measure(args.repeat, lambda: cube.build(counties))
+    del counties
+    sources = {name: store.load(name) for name in international.SOURCES}
+    results["international/build"] = measure(args.repeat, lambda: international.build(sources))
+    del sources
+    for name, loader in DATASET_LOADERS.items():
+        results["loader/" + name] = measure(args.repeat, loader, data_cache.clear)
+    gc.collect()
+
+
+def first_views(bundles):
+    # The first view of every plot the dashboard can show, with its arguments resolved.
+    views = {}
+    for name, bundle in bundles.items():
+        for plot, sources, params in VIEWS[name](bundle):
+            if plot not in views:
+                views[plot] = [resolve(bundles, path) for path in sources] + params
+    return views
+
+
+def time_plots(args, results):
+    # Plot builders are pure: without the figure cache around them (unwrapped) and with the figure serialized as
+    # st.plotly_chart would send it, no Streamlit session is involved.
+    bundles = {name: loader() for name, loader in DATASET_LOADERS.items()}
+    views = first_views(bundles)
+    names = [name for name in dir(plots) if name.startswith("plot_")]
+    for name in names:
+        if name not in views:
+            print("{}: no view to time".format(name), file=sys.stderr)
+            continue
+        build = inspect.unwrap(getattr(plots, name))
+        # The lag correlations are cached per data version: every run computes them again.
+        results["plot/" + name] = measure(args.repeat, lambda: build(*views[name]).to_json(),
+                                          lag_correlation._results.clear)
+    del bundles, views
+    data_cache.clear()
+    gc.collect()
+
+
+def run_scale(scale, args):
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        data_dir, store_dir = os.path.join(root, "data"), os.path.join(root, "store")
+        os.makedirs(data_dir)
+        store.DATA_DIR, store.STORE_DIR = data_dir, store_dir
+        data_cache.clear()
+        ingest(scale, args, data_dir, results)
+        time_steps(args, results)
+        time_plots(args, results)
+        data_cache.clear()
+    return {"{}x/{}".format(scale, name): result for name, result in results.items()}
+
+
+def compare(results, baseline, threshold, min_seconds):
+    # Cases of both runs whose best time grew by more than `threshold` (a fraction) and by at least `min_seconds`.
+    rows, regressions = [], []
+    for name in sorted(set(results) & set(baseline)):
+        old, new = baseline[name]["seconds"], results[name]["seconds"]
+        change = new / old - 1 if old > 0 else 0.0
+        regressed = change > threshold and new - old >= min_seconds
+        rows.append((name, old, new, change, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loaders, cleaning, variant labelling and plots on synthetic "
+                                                 "datasets at several scales, compared against a baseline")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Multiples of the dataset rows")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case, the best one is kept")
+    parser.add_argument("--csv-max-scale", type=int, default=10,
+                        help="Largest scale whose sources are written and parsed as CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/suite-<time>.json)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown over the baseline that fails the run (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.01,
+                        help="Slowdowns smaller than this many seconds are never regressions")
+    args = parser.parse_args()
+    if min(args.scales) < 1 or args.repeat < 1:
+        parser.error("--scales and --repeat must be positive")
+    if args.threshold < 0:
+        parser.error("--threshold must not be negative")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for scale in args.scales:
+        start = time.perf_counter()
+        results.update(run_scale(scale, args))
+        print("{}x: done ({:.1f}s)".format(scale, time.perf_counter() - start))
+
+    output = args.output or os.path.join(RESULTS_DIR, "suite-{}.json".format(time.strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {
+                "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                "scales": args.scales,
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "plotly": plotly.__version__,
+                "cpus": os.cpu_count(),
+                "machine": platform.machine(),
+            },
+            "results": results,
+        }, f, indent=1, sort_keys=True)
+
+    print("{:<62} {:>12}".format("case", "best ms"))
+    for name, result in results.items():
+        print("{:<62} {:>12.2f}".format(name, result["seconds"] * 1000))
+    print("results -> {}".format(output))
+    if baseline is None:
+        return
+    rows, regressions = compare(results, baseline, args.threshold, args.min_seconds)
+    print("\n{:<62} {:>12} {:>12} {:>9}".format("case", "baseline ms", "current ms", "change"))
+    for name, old, new, change, regressed in rows:
+        print("{:<62} {:>12.2f} {:>12.2f} {:>+8.1%}{}".format(name, old * 1000, new * 1000, change,
+                                                             "  REGRESSION" if regressed else ""))
+    if regressions:
+        parser.exit(1, "{} regressions over {:.0%}: {}\n".format(len(regressions), args.threshold,
+                                                                ", ".join(regressions)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+STATES = ["Alabama", "Alaska", "American Samoa", "Arizona", "Arkansas", "California", "Colorado", "Connecticut",
+          "Delaware", "Diamond Princess", "District of Columbia", "Florida", "Georgia", "Grand Princess", "Guam",
+          "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland",
+          "Massachusetts", "Michigan", "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada",
+          "New Hampshire", "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota",
+          "Northern Mariana Islands", "Ohio", "Oklahoma", "Oregon", "Pennsylvania", "Puerto Rico", "Rhode Island",
+          "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont", "Virgin Islands", "Virginia",
+          "Washington", "West Virginia", "Wisconsin", "Wyoming"]
+
+
+def make_states(n_states):
+    if n_states <= len(STATES):
+        return STATES[:n_states]
+    return STATES + ["State {}".format(i) for i in range(len(STATES), n_states)]
+
+
+def make_covid_data(n_states=len(STATES), start="2020-04-12", end="2022-04-30", seed=0):
+    rng = np.random.default_rng(seed)
+    states = make_states(n_states)
+    dates = pd.date_range(start, end, freq="D")
+    n_days = len(dates)
+
+    daily_confirmed = rng.poisson(2000, size=(n_states, n_days))
+    daily_deaths = rng.poisson(30, size=(n_states, n_days))
+    daily_fully = rng.poisson(5000, size=(n_states, n_days))
+    daily_partially = rng.poisson(6000, size=(n_states, n_days))
+    vaccination_start = np.searchsorted(dates.values, np.datetime64("2020-12-14"))
+    daily_fully[:, :vaccination_start] = 0
+    daily_partially[:, :vaccination_start] = 0
+
+    confirmed = daily_confirmed.cumsum(axis=1)
+    deaths = daily_deaths.cumsum(axis=1)
+    fully = daily_fully.cumsum(axis=1).astype(float)
+    partially = daily_partially.cumsum(axis=1).astype(float)
+    fully[:, :vaccination_start] = np.nan
+    partially[:, :vaccination_start] = np.nan
+
+    state_column = np.repeat(np.array(states, dtype=object), n_days)
+    date_column = np.tile(dates.values, n_states)
+    fips = np.repeat(np.arange(1, n_states + 1), n_days)
+    date_values = date_column.astype("datetime64[D]")
+    variant = np.where(date_values <= np.datetime64("2020-09-30"), "Alpha",
+                       np.where(date_values <= np.datetime64("2021-07-31"), "Delta", "Omicron"))
+
+    return pd.DataFrame({
+        "Province_State": state_column,
+        "Country_Region": "US",
+        "Last_Update": np.tile(dates.strftime("%Y-%m-%d 04:30:00"), n_states),
+        "Lat": np.repeat(rng.uniform(18, 65, n_states), n_days),
+        "Long": np.repeat(rng.uniform(-170, -65, n_states), n_days),
+        "Confirmed": confirmed.ravel(),
+        "Deaths": deaths.ravel(),
+        "Recovered": np.nan,
+        "Active": (confirmed - deaths).ravel().astype(float),
+        "FIPS": fips.astype(float),
+        "Incident_Rate": rng.uniform(0, 30000, n_states * n_days),
+        "Total_Test_Results": (confirmed * 10).ravel().astype(float),
+        "People_Hospitalized": np.nan,
+        "Case_Fatality_Ratio": (deaths / np.maximum(confirmed, 1) * 100).ravel(),
+        "UID": (84000000 + fips).astype(float),
+        "ISO3": "USA",
+        "Testing_Rate": rng.uniform(0, 300000, n_states * n_days),
+        "Hospitalization_Rate": np.nan,
+        "date": np.tile(dates.strftime("%Y-%m-%d"), n_states),
+        "Combined_Key": np.repeat(np.array([state + ", US" for state in states], dtype=object), n_days),
+        "People_Fully_Vaccinated": fully.ravel(),
+        "People_Partially_Vaccinated": partially.ravel(),
+        "daily_confirmed": np.concatenate([np.zeros((n_states, 1)), daily_confirmed[:, 1:]], axis=1).ravel(),
+        "daily_deaths": np.concatenate([np.zeros((n_states, 1)), daily_deaths[:, 1:]], axis=1).ravel(),
+        "daily_partially_vaccinated": daily_partially.ravel().astype(float),
+        "daily_fully_vaccinated": daily_fully.ravel().astype(float),
+        "Variant": variant,
+    })
+
+
+def make_daily_report(date, states, rng, day_index=0):
+    # The JHU reports renamed a few columns in November 2020; keep both vintages so readers see the real drift.
+    n_states = len(states)
+    old_vintage = pd.Timestamp(date) < pd.Timestamp("2020-11-09")
+    confirmed = rng.poisson(2000, n_states) * (day_index + 1)
+    deaths = rng.poisson(30, n_states) * (day_index + 1)
+    report = {
+        "Province_State": states,
+        "Country_Region": "US",
+        "Last_Update": pd.Timestamp(date).strftime("%Y-%m-%d 04:30:00"),
+        "Lat": rng.uniform(18, 65, n_states),
+        "Long_": rng.uniform(-170, -65, n_states),
+        "Confirmed": confirmed,
+        "Deaths": deaths,
+        "Recovered": np.nan,
+        "Active": (confirmed - deaths).astype(float),
+        "FIPS": np.arange(1, n_states + 1, dtype=float),
+        "Incident_Rate": rng.uniform(0, 30000, n_states),
+        "People_Tested" if old_vintage else "Total_Test_Results": confirmed * 10.0,
+        "People_Hospitalized": np.nan,
+        "Mortality_Rate" if old_vintage else "Case_Fatality_Ratio": deaths / np.maximum(confirmed, 1) * 100,
+        "UID": 84000000.0 + np.arange(1, n_states + 1),
+        "ISO3": "USA",
+        "Testing_Rate": rng.uniform(0, 300000, n_states),
+        "Hospitalization_Rate": np.nan,
+    }
+    return pd.DataFrame(report)
+
+
+def write_daily_reports(out_dir, n_days, n_states=len(STATES), start="2020-04-12", seed=0):
+    rng = np.random.default_rng(seed)
+    states = make_states(n_states)
+    paths = []
+    for day_index, date in enumerate(pd.date_range(start, periods=n_days, freq="D")):
+        path = os.path.join(out_dir, date.strftime("%m-%d-%Y.csv"))
+        make_daily_report(date, states, rng, day_index).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def make_vaccinations(n_states=len(STATES), start="2020-12-10", end="2022-04-30", seed=0):
+    rng = np.random.default_rng(seed)
+    states = make_states(n_states)
+    dates = pd.date_range(start, end, freq="D")
+    n_days = len(dates)
+    state_column = np.repeat(np.array(states, dtype=object), n_days)
+    return pd.DataFrame({
+        "FIPS": np.repeat(np.arange(1, n_states + 1), n_days),
+        "Province_State": state_column,
+        "Country_Region": "US",
+        "Date": np.tile(dates.strftime("%Y-%m-%d"), n_states),
+        "Lat": np.repeat(rng.uniform(18, 65, n_states), n_days),
+        "Long_": np.repeat(rng.uniform(-170, -65, n_states), n_days),
+        "Combined_Key": np.char.add(state_column.astype(str), ", US"),
+        "People_Fully_Vaccinated": rng.poisson(5000, (n_states, n_days)).cumsum(axis=1).ravel().astype(float),
+        "People_Partially_Vaccinated": rng.poisson(6000, (n_states, n_days)).cumsum(axis=1).ravel().astype(float),
+    })
+
+
+def make_incidence_data(n_cells, seed=0):
+    # Weekly cells of cases_deaths_vaccinations.csv with counts, populations and the IRs and IRRs derived from them;
+    # every cell has age-adjusted rates, so all of them are bootstrapped.
+    rng = np.random.default_rng(seed)
+    vax_population = rng.integers(10 ** 4, 10 ** 8, n_cells).astype(float)
+    unvax_population = rng.integers(10 ** 4, 10 ** 8, n_cells).astype(float)
+    vax = rng.poisson(vax_population * 1e-4).astype(float)
+    unvax = rng.poisson(unvax_population * 5e-4).astype(float)
+    vax_ir, unvax_ir = vax / vax_population * 100000, unvax / unvax_population * 100000
+    adjustment = rng.uniform(0.8, 1.2, (2, n_cells))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "outcome": "case",
+            "Age group": "all_ages_adj",
+            "Vaccine product": "all_types",
+            "date": pd.date_range("2021-04-03", periods=n_cells, freq="W-SAT"),
+            "Vaccinated with outcome": vax,
+            "Fully vaccinated population": vax_population,
+            "Unvaccinated with outcome": unvax,
+            "Unvaccinated population": unvax_population,
+            "Crude vax IR": vax_ir,
+            "Crude unvax IR": unvax_ir,
+            "Crude IRR": unvax_ir / vax_ir,
+            "Age adjusted vax IR": vax_ir * adjustment[0],
+            "Age adjusted unvax IR": unvax_ir * adjustment[1],
+            "Age adjusted IRR": unvax_ir * adjustment[1] / (vax_ir * adjustment[0]),
+        })
+
+
+CDV_AGE_GROUPS = ["12-17", "18-29", "30-49", "50-64", "65-79", "80+"]
+CDVB_AGE_GROUPS = ["12-17", "18-49", "50-64", "65+"]
+HOSPITALIZATION_AGE_GROUPS = ["5-11 yr", "12-17 yr", "18-49 yr", "50-64 yr", "65+ yr"]
+VACCINE_PRODUCTS = ["Janssen", "Moderna", "Pfizer"]
+
+
+def make_age_groups(base, n_groups, suffix=""):
+    return (base + ["Age {}{}".format(i, suffix) for i in range(len(base), n_groups)])[:n_groups]
+
+
+def make_weeks(start, n_weeks):
+    return pd.date_range(start, periods=n_weeks, freq="W-SAT")
+
+
+def make_population(n_states=len(STATES), seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Province_State": make_states(n_states),
+                         "Population": rng.integers(50000, 40000000, n_states)})
+
+
+def make_variant_eras():
+    return pd.DataFrame({
+        "Variant": ["Alpha", "Delta", "Omicron"],
+        "start": [np.nan, "2020-10-01", "2021-08-01"],
+        "end": ["2020-09-30", "2021-07-31", np.nan],
+        "Province_State": np.nan,
+    })
+
+
+def make_hospitalizations(n_weeks=65, n_age_groups=len(HOSPITALIZATION_AGE_GROUPS), seed=0):
+    # The four CDC hospitalization tables as parsed from their CSVs (below the two title lines), dates as published.
+    rng = np.random.default_rng(seed)
+    weeks = make_weeks("2021-01-30", n_weeks)
+    booster_weeks = make_weeks("2021-10-02", max(n_weeks // 2, 1))
+    age_groups = make_age_groups(HOSPITALIZATION_AGE_GROUPS, n_age_groups, " yr")
+
+    def rates(n_rows, *scales):
+        return [np.round(rng.gamma(2, scale / 2, n_rows), 1) for scale in scales]
+
+    unvax, vax = rates(len(weeks), 20, 2)
+    boosted, primary, booster_unvax = rates(len(booster_weeks), 1, 4, 40)
+    hosp_adults = pd.DataFrame({"Week ending": weeks.strftime("%Y-%m-%d"), "Rate in unvaccinated": unvax,
+                                "Rate in fully vaccinated": vax})
+    unvax, vax = rates(len(weeks) * n_age_groups, 20, 2)
+    hosp_age_group = pd.DataFrame({"Week ending": np.repeat(weeks.strftime("%Y-%m-%d"), n_age_groups),
+                                   "Age group": np.tile(age_groups, len(weeks)),
+                                   "Rate in unvaccinated": unvax, "Rate in fully vaccinated": vax})
+    hosp_adults_booster = pd.DataFrame({
+        "Week ending": booster_weeks.strftime("%Y-%m-%d"),
+        "Rate in fully vaccinated with additional or booster": boosted,
+        "Rate in fully vaccinated without additional or booster": primary,
+        "Rate in unvaccinated": booster_unvax,
+    })
+    boosted, primary, booster_unvax = rates(len(booster_weeks) * n_age_groups, 1, 4, 40)
+    hosp_age_group_booster = pd.DataFrame({
+        "Week ending": np.repeat(booster_weeks.strftime("%d-%m-%Y"), n_age_groups),
+        "Age group": np.tile(age_groups, len(booster_weeks)),
+        "Rate in fully vaccinated with additional or booster": boosted,
+        "Rate in fully vaccinated without additional or booster": primary,
+        "Rate in unvaccinated": booster_unvax,
+    })
+    return {"hosp_adults": hosp_adults, "hosp_age_group": hosp_age_group, "hosp_adults_booster": hosp_adults_booster,
+            "hosp_age_group_booster": hosp_age_group_booster}
+
+
+def incidence_cells(weeks, age_groups, adjusted_group, all_types):
+    # Rows of a weekly incidence table: every age group over all vaccine products, then the age-adjusted group per
+    # vaccine product, for cases and deaths.
+    groups = [(age_group, all_types) for age_group in age_groups + [adjusted_group]]
+    groups += [(adjusted_group, product) for product in VACCINE_PRODUCTS]
+    n_rows = len(weeks) * len(groups)
+    return pd.DataFrame({
+        "outcome": np.repeat(["case", "death"], n_rows),
+        "week": np.tile(np.repeat(weeks, len(groups)), 2),
+        "age_group": np.tile([group[0] for group in groups], 2 * len(weeks)),
+        "product": np.tile([group[1] for group in groups], 2 * len(weeks)),
+    })
+
+
+def incidence_counts(rng, n_rows, rate, scale=1.0):
+    population = rng.integers(10 ** 4, 10 ** 8, n_rows).astype(float)
+    with_outcome = rng.poisson(population * rate * scale).astype(float)
+    return with_outcome, population, with_outcome / population * 100000
+
+
+def blank_row(data):
+    # The published files end with an empty line that pandas reads as a row of NaN.
+    return pd.concat([data, pd.DataFrame(np.nan, index=[0], columns=data.columns)], ignore_index=True)
+
+
+def make_cdv(n_weeks=50, n_age_groups=len(CDV_AGE_GROUPS), seed=0):
+    rng = np.random.default_rng(seed)
+    cells = incidence_cells(make_weeks("2021-04-03", n_weeks), make_age_groups(CDV_AGE_GROUPS, n_age_groups),
+                            "all_ages_adj", "all_types")
+    n_rows = len(cells)
+    scale = np.where(cells["outcome"] == "case", 1.0, 0.01)
+    vax, vax_population, vax_ir = incidence_counts(rng, n_rows, 1e-4, scale)
+    unvax, unvax_population, unvax_ir = incidence_counts(rng, n_rows, 5e-4, scale)
+    adjusted = (cells["age_group"] == "all_ages_adj").to_numpy()
+    adjustment = np.where(adjusted, rng.uniform(0.8, 1.2, (2, n_rows)), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        data = pd.DataFrame({
+            "outcome": cells["outcome"],
+            "month": cells["week"].dt.strftime("%b-%y"),
+            "MMWR week": cells["week"].dt.strftime("%Y%U").astype(int),
+            "Age group": cells["age_group"].replace({"12-17": "Dec-17"}),
+            "Vaccine product": cells["product"],
+            "Vaccinated with outcome": vax,
+            "Fully vaccinated population": vax_population,
+            "Unvaccinated with outcome": unvax,
+            "Unvaccinated population": unvax_population,
+            "Crude vax IR": vax_ir,
+            "Crude unvax IR": unvax_ir,
+            "Crude IRR": unvax_ir / vax_ir,
+            "Age adjusted vax IR": vax_ir * adjustment[0],
+            "Age adjusted unvax IR": unvax_ir * adjustment[1],
+            "Age adjusted IRR": unvax_ir * adjustment[1] / (vax_ir * adjustment[0]),
+            "Continuity correction": (vax == 0).astype(int),
+            "date": cells["week"].dt.strftime("%m-%d-%Y"),
+        })
+    return blank_row(data)
+
+
+def make_cdv_booster(n_weeks=26, n_age_groups=len(CDVB_AGE_GROUPS), seed=0):
+    rng = np.random.default_rng(seed)
+    cells = incidence_cells(make_weeks("2021-09-18", n_weeks), make_age_groups(CDVB_AGE_GROUPS, n_age_groups),
+                            "all_ages", "all_types")
+    n_rows = len(cells)
+    scale = np.where(cells["outcome"] == "case", 1.0, 0.01)
+    boosted, boosted_population, booster_ir = incidence_counts(rng, n_rows, 3e-5, scale)
+    primary, primary_population, primary_ir = incidence_counts(rng, n_rows, 1e-4, scale)
+    unvax, unvax_population, unvax_ir = incidence_counts(rng, n_rows, 5e-4, scale)
+    adjusted = (cells["age_group"] == "all_ages").to_numpy()
+    adjustment = np.where(adjusted, rng.uniform(0.8, 1.2, (3, n_rows)), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        data = pd.DataFrame({
+            "outcome": cells["outcome"],
+            "date": cells["week"].dt.strftime("%m-%d-%Y"),
+            "month": cells["week"].dt.strftime("%b-%y"),
+            "mmwr_week": cells["week"].dt.strftime("%Y%U").astype(int),
+            "age_group": cells["age_group"].replace({"12-17": "Dec-17"}),
+            "vaccine_product": cells["product"],
+            "boosted_with_outcome": boosted,
+            "boosted_population": boosted_population,
+            "primary_series_only_with_outcome": primary,
+            "primary_series_only_population": primary_population,
+            "unvaccinated_with_outcome": unvax,
+            "unvaccinated_population": unvax_population,
+            "crude_booster_ir": booster_ir,
+            "crude_primary_series_only_ir": primary_ir,
+            "crude_unvax_ir": unvax_ir,
+            "crude_booster_irr": unvax_ir / booster_ir,
+            "crude_irr": unvax_ir / primary_ir,
+            "age_adj_booster_ir": booster_ir * adjustment[0],
+            "age_adj_vax_ir": primary_ir * adjustment[1],
+            "age_adj_unvax_ir": unvax_ir * adjustment[2],
+            "age_adj_booster_irr": unvax_ir * adjustment[2] / (booster_ir * adjustment[0]),
+            "age_adj_irr": unvax_ir * adjustment[2] / (primary_ir * adjustment[1]),
+            "continuity_correction": (boosted == 0).astype(int),
+        })
+    return blank_row(data)
+
+
+def make_county_deaths(n_counties=3000, n_states=len(STATES), start="2020-01-22", end="2022-04-30", seed=0):
+    # time_series_covid19_deaths_US.csv of JHU CSSE: one row per county, one cumulative column per day.
+    rng = np.random.default_rng(seed)
+    states = np.array(make_states(n_states), dtype=object)[np.sort(rng.integers(0, n_states, n_counties))]
+    counties = np.array(["County {}".format(i) for i in range(n_counties)], dtype=object)
+    dates = pd.date_range(start, end, freq="D")
+    deaths = rng.poisson(rng.uniform(0, 3, (n_counties, 1)), size=(n_counties, len(dates))).cumsum(axis=1)
+    fips = 1000 + np.arange(n_counties)
+    keys = pd.DataFrame({
+        "UID": 84000000 + fips,
+        "iso2": "US",
+        "iso3": "USA",
+        "code3": 840,
+        "FIPS": fips.astype(float),
+        "Admin2": counties,
+        "Province_State": states,
+        "Country_Region": "US",
+        "Lat": rng.uniform(18, 65, n_counties),
+        "Long_": rng.uniform(-170, -65, n_counties),
+        "Combined_Key": counties + ", " + states + ", US",
+        "Population": rng.integers(1000, 5000000, n_counties),
+    })
+    columns = ["{}/{}/{}".format(date.month, date.day, date.strftime("%y")) for date in dates]
+    return pd.concat([keys, pd.DataFrame(deaths, columns=columns)], axis=1)
+
+
+def make_international(n_countries=14, n_days=670, seed=0):
+    # The wide tables of data-cases.csv, data-death.csv and data-vaccination.csv: one cumulative column per country,
+    # cases and vaccinations by date, deaths by the days since each country entered the table.
+    rng = np.random.default_rng(seed)
+    countries = ["China"] + ["Country {}".format(i) for i in range(1, n_countries)]
+    dates = pd.date_range("2020-01-22", periods=n_days, freq="D")
+    vaccination_dates = dates[dates >= "2020-12-15"]
+    cases = rng.poisson(rng.uniform(100, 50000, (1, n_countries)), size=(n_days, n_countries)).cumsum(axis=0)
+    deaths = rng.poisson(rng.uniform(1, 1000, (1, n_countries)), size=(n_days, n_countries)).cumsum(axis=0)
+    coverage = np.minimum(rng.uniform(0, 0.3, (len(vaccination_dates), n_countries)).cumsum(axis=0), 95).round(2)
+    return {
+        "intl_cases": pd.concat([pd.DataFrame({"date": dates.strftime("%m/%d/%Y")}),
+                                 pd.DataFrame(cases, columns=countries)], axis=1),
+        "intl_deaths": pd.concat([pd.DataFrame({"DAY": np.arange(1, n_days + 1),
+                                                "Date for China": dates.strftime("%m/%d/%Y")}),
+                                  pd.DataFrame(deaths, columns=countries)], axis=1),
+        "intl_vaccinations": pd.concat([pd.DataFrame({"Date": vaccination_dates.strftime("%d/%m/%Y")}),
+                                        pd.DataFrame(coverage, columns=countries)], axis=1),
+    }
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+DAILY_COLUMNS = {
+    "Confirmed": "daily_confirmed",
+    "Deaths": "daily_deaths",
+    "People_Partially_Vaccinated": "daily_partially_vaccinated",
+    "People_Fully_Vaccinated": "daily_fully_vaccinated",
+}
+
+
+def group_order(data, group="Province_State", date="date"):
+    # Row positions sorted by (group, date) and the group code of each sorted row; only the keys are sorted.
+    # The order is None when the rows already come grouped and in date order, as the stored datasets do.
+    codes = pd.factorize(data[group])[0].astype("int64")
+    date_codes, dates = pd.factorize(data[date], sort=True)
+    keys = codes * len(dates) + date_codes
+    if np.all(keys[1:] >= keys[:-1]):
+        return None, codes
+    order = np.argsort(keys, kind="stable")
+    return order, codes[order]
+
+
+def group_starts(codes):
+    starts = np.empty(len(codes), dtype=bool)
+    starts[:1] = True
+    np.not_equal(codes[1:], codes[:-1], out=starts[1:])
+    return starts
+
+
+def daily_deltas(data, columns=None, group="Province_State", date="date", redistribute=False):
+    # Per-group day-over-day differences of cumulative columns, clamped at zero with missing values as zero.
+    # With redistribute=True a drop in a cumulative series is taken out of the preceding days instead of being
+    # clamped away, so the deltas still add up to the latest cumulative value.
+    columns = list(columns or DAILY_COLUMNS)
+    names = [DAILY_COLUMNS.get(column, "daily_" + column.lower()) for column in columns]
+    order, codes = group_order(data, group, date)
+    values = np.empty((len(columns), len(codes)))
+    for i, column in enumerate(columns):
+        values[i] = data[column].to_numpy(dtype="float64")
+        if order is not None:
+            values[i] = values[i][order]
+    if redistribute:
+        values = pd.DataFrame(values.T[::-1]).groupby(codes[::-1]).cummin().to_numpy().T[:, ::-1]
+
+    deltas = np.zeros_like(values)
+    np.subtract(values[:, 1:], values[:, :-1], out=deltas[:, 1:])
+    deltas[:, group_starts(codes)] = 0
+    np.fmax(deltas, 0, out=deltas)
+
+    if order is not None:
+        result = np.empty_like(deltas)
+        result[:, order] = deltas
+        deltas = result
+    return data.assign(**dict(zip(names, deltas)))
@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from incidence import CDV_KEYS, CDVB_KEYS
+
+INT32 = np.iinfo("int32")
+# Whole numbers up to 2**24 are exact in float32.
+FLOAT32_EXACT = 2 ** 24
+
+# Per dataset: the columns no page or endpoint reads and the labels kept as categories (the dates of the source files
+# are parsed by their schemas in sources.py). Numeric columns are downcast by their values (see downcast).
+SCHEMAS = {
+    "covid": {
+        "drop": ["Country_Region", "Last_Update", "Lat", "Long", "Recovered", "Active", "FIPS", "Incident_Rate",
+                 "Total_Test_Results", "People_Hospitalized", "Case_Fatality_Ratio", "UID", "ISO3", "Testing_Rate",
+                 "Hospitalization_Rate", "Combined_Key"],
+        "categories": ["Province_State", "Variant"],
+    },
+    "hosp_adults": {},
+    "hosp_age_group": {"categories": ["Age group"]},
+    "hosp_adults_booster": {},
+    "hosp_age_group_booster": {"categories": ["Age group"]},
+    "cdv": {"drop": ["month", "MMWR week", "Continuity correction"], "categories": CDV_KEYS},
+    "cdv_booster": {"drop": ["month", "mmwr_week", "continuity_correction"], "categories": CDVB_KEYS},
+    "covid_cube": {"categories": ["frequency", "node"]},
+    "international": {"categories": ["metric", "country"]},
+}
+
+_reports = {}
+_reports_lock = threading.Lock()
+
+
+def frame_bytes(data):
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+
+def downcast(values):
+    # int32 for whole numbers in its range without missing values, float32 for other values up to 2**24 (whole
+    # numbers stay exact, rates and averages keep 7 significant digits), float64 otherwise.
+    if values.dtype.kind in "iu":
+        if len(values) and (values.min() < INT32.min or values.max() > INT32.max):
+            return values
+        return values.astype("int32")
+    if values.dtype.kind != "f" or values.dtype.itemsize <= 4:
+        return values
+    present = values[~np.isnan(values)]
+    if not len(present):
+        return values.astype("float32")
+    largest = np.abs(present).max()
+    if not np.isfinite(largest) or largest > np.finfo("float32").max:
+        return values
+    whole = np.all(present == np.round(present))
+    if whole and len(present) == len(values) and INT32.min <= present.min() and present.max() <= INT32.max:
+        return values.astype("int32")
+    return values.astype("float32") if largest <= FLOAT32_EXACT else values
+
+
+def compact(name, data):
+    # Applies the schema of `name` to a loaded frame and records its in-memory size before and after.
+    schema = SCHEMAS[name]
+    before = frame_bytes(data)
+    attrs = dict(data.attrs)
+    data = data.drop(columns=[column for column in schema.get("drop", []) if column in data])
+    columns = {}
+    for column in data.columns:
+        if column in schema.get("categories", []):
+            columns[column] = data[column].astype("category")
+        elif pd.api.types.is_numeric_dtype(data[column]) and not pd.api.types.is_bool_dtype(data[column]):
+            columns[column] = pd.Series(downcast(data[column].to_numpy()), index=data.index)
+    data = data.assign(**columns)
+    data.attrs = attrs
+    with _reports_lock:
+        _reports[name] = {"before": before, "after": frame_bytes(data), "rows": len(data)}
+    return data
+
+
+def memory_report():
+    # Bytes of every dataset compacted by this process, as loaded and after compaction.
+    with _reports_lock:
+        report = pd.DataFrame.from_dict(_reports, orient="index", columns=["rows", "before", "after"])
+    report["saved"] = 1 - report["after"] / report["before"]
+    return report.rename_axis("dataset")
+
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from state_index import state_bounds
+
+# Rolling means are read from the columns precomputed by derived.py over each state's whole history.
+MEASURES = {"daily": "{}", "mean7": "{}_mean7", "mean14": "{}_mean14", "cumulative": "{}"}
+PER_PEOPLE = 100000
+
+
+def build_population(data, group="Province_State"):
+    population = data.dropna(subset=["Population"])
+    return {
+        "version": data.attrs.get("version"),
+        "population": dict(zip(population[group], population["Population"].astype("float64"))),
+    }
+
+
+def compare_states(index, states, column, start_date=None, end_date=None, measure="daily", population=None):
+    # The `measure` of `column` for every selected state, computed over all of them at once: the rows of each
+    # state are gathered into one array and cumulative sums are taken with cumsum differences that restart at
+    # every state. With a population table, values are per 100k people (NaN for states without a population).
+    if measure not in MEASURES:
+        raise ValueError("unknown measure {!r}".format(measure))
+    states = [state for state in states if state in index["bounds"]]
+    bounds = np.array([state_bounds(index, state, start_date, end_date) for state in states], dtype="int64")
+    bounds = bounds.reshape(-1, 2)
+    lengths = bounds[:, 1] - bounds[:, 0]
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(bounds[:, 0] - offsets, lengths) + np.arange(lengths.sum())
+
+    values = index["data"][MEASURES[measure].format(column)].to_numpy(dtype="float64")[positions]
+    if measure == "cumulative":
+        sums = np.concatenate([[0.0], np.cumsum(np.where(np.isnan(values), 0.0, values))])
+        values = sums[1:] - np.repeat(sums[offsets], lengths)
+
+    if population is not None:
+        people = np.array([population["population"].get(state, np.nan) for state in states], dtype="float64")
+        values = values / np.repeat(people, lengths) * PER_PEOPLE
+
+    return {
+        "states": states,
+        "dates": index["dates"][positions],
+        "values": values,
+        "bounds": dict(zip(states, zip(offsets, offsets + lengths))),
+    }
+
+
+def comparison_series(comparison, state):
+    start, stop = comparison["bounds"][state]
+    return pd.Series(comparison["dates"][start:stop]), pd.Series(comparison["values"][start:stop])
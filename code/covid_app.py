@@ -1,206 +1,321 @@
-import pandas as pd
+import os
+
 import streamlit as st
 
 st.set_page_config(layout="wide")
 
+import compaction
+import data_cache
+import instrumentation
+from cube import NATION, children_totals
+from datasets import DATASET_LOADERS
+from lag_correlation import ALL_ERAS, lag_correlations, strongest_lags
 from plots import plot_daily_deaths, plot_daily_vaccines, plot_daily_deaths_vaccines, plot_overall_deaths_vaccines, \
     plot_variant_daily_deaths_vaccines, plot_adult_hospitalizations_vaccinations, \
     plot_age_group_hospitalizations_vaccinations, plot_booster_adult_hospitalizations_vaccinations, \
     plot_booster_age_group_hospitalizations_vaccinations, plot_overall_cases_vaccinations, \
     plot_age_group_cases_vaccinations, plot_vaccine_cases_vaccinations, plot_overall_cases_vaccinations_booster, \
-    plot_age_group_cases_vaccinations_booster, plot_vaccine_cases_vaccinations_booster
+    plot_age_group_cases_vaccinations_booster, plot_vaccine_cases_vaccinations_booster, plot_lag_correlations, \
+    plot_drilldown, plot_international
+
+# COVID_PREFETCH=1 loads the datasets of the other pages in the background once the first page has rendered. Off by
+# default: it loads all of them, the county cube (about 55MB) included, whether a session opens those pages or not.
+PREFETCH = os.environ.get("COVID_PREFETCH", "0") == "1"
+# COVID_DEBUG=1 opens the timings panel of the sidebar by default.
+DEBUG = os.environ.get("COVID_DEBUG", "0") == "1"
+MEASURE_LABELS = {"Daily": "daily", "7-day average": "mean7", "14-day average": "mean14", "Cumulative": "cumulative"}
+SMOOTHING_LABELS = {"None": "daily", "7-day average": "mean7", "14-day average": "mean14"}
+FREQUENCY_LABELS = {"Daily": "day", "Weekly": "week"}
+DEATHS_LABELS = {"New deaths": "daily", "Cumulative deaths": "cumulative"}
+INTERNATIONAL_LABELS = {"Daily": "daily", "7-day average": "mean7", "Cumulative": "cumulative"}
+VACCINATION_LABELS = {"Daily fully vaccinated": "daily", "Coverage (people fully vaccinated)": "coverage"}
+
+PAGES = {}
+
+
+@instrumentation.timed("chart")
+def show_chart(fig):
+    # Streamlit's theme would be merged over the figure's template (figures.py), replacing its font and ticks.
+    st.plotly_chart(fig, width="stretch", theme=None)
+
+
+def page(title, datasets=()):
+    # Registers a page handler; it is called with the loaded datasets it names, in that order.
+    def decorator(render):
+        PAGES[title] = {"render": render, "datasets": list(datasets)}
+        return render
+
+    return decorator
+
 
+@page("Introduction")
+def introduction_page():
+    st.write("")
+    st.write("")
+    st.write("The following are the visualizations that are present in the application:")
+    st.write("- Cases and Deaths w.r.t vaccinations across the US (country level)")
+    st.write("- Hospitalizations w.r.t vaccinations across the US (country level)")
+    st.write("- Cases and Deaths w.r.t vaccinations for all states in the US")
+    st.write("- Cases and Deaths w.r.t vaccinations during different variants of COVID-19 for all states in the US")
+    st.write("- Correlation of vaccinations with deaths up to 90 days later for all states and variants in the US")
+    st.write("- Deaths across the US, drilled down to states and counties")
+    st.write("- Deaths and vaccinations of countries around the world")
 
-@st.cache
-def load_data():
-    data = pd.read_csv(
-        "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/us_covid19_vaccine_cases_deaths_daily_count_variant.csv")
-    data["date"] = pd.to_datetime(data["date"]).dt.date
-    return data
 
+@page("US - Cases, Deaths and Vaccines", datasets=["cases_deaths"])
+def cases_deaths_vaccines_page(cas_dth_vac):
+    cdv_incidence = cas_dth_vac["incidence"][0]
+    st.write('<style>div.row-widget.stRadio > div{flex-direction:row;}</style>', unsafe_allow_html=True)
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        main_choice = st.radio("Plot", options=["Overall", "Age group", "Vaccine type"], index=0, key="cdvb_choice")
+    with col2:
+        cd_choice = st.radio("Cases/Deaths", options=["Cases", "Deaths"], index=0,
+                             key="age_group_cases_deaths_vaccines")
 
-@st.cache
-def load_hospitalizations_vaccinations_data():
-    data_1 = pd.read_csv(
-        "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/adults_hospitalizations_vaccinations.csv",
-        header=2)
-    data_2 = pd.read_csv(
-        "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/age_group_hospitalizations_vaccinations.csv",
-        header=2
-    )
-    data_3 = pd.read_csv(
-        "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/adults_hospitalizations_vaccinations_booster.csv",
-        header=2)
-    data_4 = pd.read_csv(
-        "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/age_group_hospitalizations_vaccinations_booster.csv",
-        header=2)
-    return data_1, data_2, data_3, data_4
+    if main_choice == "Overall":
+        show_chart(plot_overall_cases_vaccinations(cdv_incidence, cd_choice))
+    elif main_choice == "Age group":
+        age_group = st.selectbox("Choose age group", options=cas_dth_vac["age_groups_cdv"], index=2,
+                                 key="age_group_cases_deaths_vaccines_booster")
+        show_chart(plot_age_group_cases_vaccinations(cdv_incidence, cd_choice, age_group))
+    elif main_choice == "Vaccine type":
+        show_chart(plot_vaccine_cases_vaccinations(cdv_incidence, cd_choice))
 
 
-@st.cache
-def load_cases_deaths_vaccinations_data():
-    data_1 = pd.read_csv(
-        "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/cases_deaths_vaccinations.csv")
-    data_1["Age group"] = data_1["Age group"].replace({"Dec-17": "12-17", "05-Nov": "05-11"})
-    data_1["date"] = pd.to_datetime(data_1["date"]).dt.date
+@page("US - Cases, Deaths and Vaccines (Booster)", datasets=["cases_deaths"])
+def cases_deaths_vaccines_booster_page(cas_dth_vac):
+    cdvb_incidence = cas_dth_vac["incidence"][1]
+    st.write('<style>div.row-widget.stRadio > div{flex-direction:row;}</style>', unsafe_allow_html=True)
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        main_choice = st.radio("Plot", options=["Overall", "Age group", "Vaccine type"], index=0, key="cdvb_choice")
+    with col2:
+        cd_choice = st.radio("Cases/Deaths", options=["Cases", "Deaths"], index=0,
+                             key="age_group_cases_deaths_vaccines")
 
-    data_2 = pd.read_csv(
-        "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/cases_deaths_vaccinations_booster.csv")
-    data_2["age_group"] = data_2["age_group"].replace({"Dec-17": "12-17"})
-    data_2["date"] = pd.to_datetime(data_2["date"]).dt.date
-    return data_1, data_2
+    if main_choice == "Overall":
+        show_chart(plot_overall_cases_vaccinations_booster(cdvb_incidence, cd_choice))
+    elif main_choice == "Age group":
+        age_group = st.selectbox("Choose age group", options=cas_dth_vac["age_groups_cdvb"], index=2,
+                                 key="age_group_cases_deaths_vaccines_booster")
+        show_chart(plot_age_group_cases_vaccinations_booster(cdvb_incidence, cd_choice, age_group))
+    elif main_choice == "Vaccine type":
+        vaccine = st.selectbox("Choose vaccine type", options=cas_dth_vac["vaccine_types"], index=2,
+                               key="vac_cases_deaths_vaccines_booster")
+        show_chart(plot_vaccine_cases_vaccinations_booster(cdvb_incidence, cd_choice, vaccine))
 
 
-@st.cache
-def get_all_states(df):
-    return df["Province_State"].unique().tolist()
+@page("US - Hospitalizations and Vaccines", datasets=["hospitalizations"])
+def hospitalizations_vaccines_page(hosp_vac):
+    hosp_vac_data_1, hosp_vac_data_2 = hosp_vac["data"][:2]
+    choice = st.radio("Choose age-adjusted or not", options=["Age adjusted", "Age group"], index=0,
+                      key="hosp_vacc")
+    if choice == "Age adjusted":
+        show_chart(plot_adult_hospitalizations_vaccinations(hosp_vac_data_1))
+    else:
+        age_group = st.selectbox("Choose age group", options=hosp_vac["age_groups"], index=1,
+                                 key="age_group_hospitalizations_vaccines")
+        show_chart(plot_age_group_hospitalizations_vaccinations(hosp_vac_data_2, age_group))
 
 
-@st.cache
-def get_all_variants(df):
-    return df["Variant"].unique().tolist()
+@page("US - Hospitalizations and Vaccines (Booster)", datasets=["hospitalizations"])
+def hospitalizations_vaccines_booster_page(hosp_vac):
+    hosp_vac_data_3, hosp_vac_data_4 = hosp_vac["data"][2:]
+    choice = st.radio("Choose age-adjusted or not", options=["Age adjusted", "Age group"], index=0,
+                      key="hosp_vacc_booster")
+    if choice == "Age adjusted":
+        show_chart(plot_booster_adult_hospitalizations_vaccinations(hosp_vac_data_3))
+    else:
+        age_group = st.selectbox("Choose age group", options=hosp_vac["age_groups"], index=1,
+                                 key="age_group_hospitalizations_vaccines_booster")
+        show_chart(plot_booster_age_group_hospitalizations_vaccinations(hosp_vac_data_4, age_group))
 
 
-@st.cache
-def get_all_age_groups_hospitalizations(df):
-    return df["Age group"].unique().tolist()
+def comparison_options(covid, key):
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        measure = st.radio("Show", options=list(MEASURE_LABELS), index=0, horizontal=True, key=key)
+    with col2:
+        per_capita = st.checkbox("Per 100k people", key=key + "_per_capita")
+    return MEASURE_LABELS[measure], covid["population"] if per_capita else None
 
 
-@st.cache
-def get_all_age_groups_cdv(df):
-    return sorted(df["Age group"].unique().tolist()[:-1])[:-1]
+@page("US States - Daily Deaths", datasets=["covid"])
+def daily_deaths_page(covid):
+    covid_data = covid["data"]
+    states = st.multiselect("Choose state/s", options=covid["states"], default=["California", "New York"],
+                            key="deaths")
+    min_date, max_date = covid_data["date"][0].date(), covid_data["date"][len(covid_data) - 1].date()
+    start_date, end_date = st.slider("Date", value=(min_date, max_date), key="deaths_dates")
+    measure, population = comparison_options(covid, key="deaths_measure")
+    show_chart(plot_daily_deaths(covid["index"], start_date, end_date, states, measure, population))
 
 
-@st.cache
-def get_all_age_groups_cdvb(df):
-    return sorted(df["age_group"].unique().tolist()[:-1])[:-1]
+@page("US States - Daily Vaccines", datasets=["covid"])
+def daily_vaccines_page(covid):
+    covid_data = covid["data"]
+    states = st.multiselect("Choose state/s", options=covid["states"], default=["California", "New York"],
+                            key="vaccines")
+    min_date, max_date = covid_data["date"][0].date(), covid_data["date"][len(covid_data) - 1].date()
+    start_date, end_date = st.slider("Date", value=(min_date, max_date), key="vaccines_dates")
+    measure, population = comparison_options(covid, key="vaccines_measure")
+    show_chart(plot_daily_vaccines(covid["index"], start_date, end_date, states, measure, population))
 
 
-@st.cache
-def get_all_vaccine_types():
-    return ["Janssen", "Moderna", "Pfizer"]
+@page("US State - Daily Deaths and Vaccines", datasets=["covid"])
+def daily_deaths_vaccines_page(covid):
+    covid_data = covid["data"]
+    min_date, max_date = covid_data["date"][0].date(), covid_data["date"][len(covid_data) - 1].date()
+    state = st.selectbox("Choose state", options=covid["states"], index=5, key="deaths_vaccines")
+    start_date, end_date = st.slider("Dates", min_value=min_date, max_value=max_date, value=(min_date, max_date),
+                                     key="deaths_vaccines_dates")
+    smoothing = st.radio("Smoothing", options=list(SMOOTHING_LABELS), index=0, horizontal=True,
+                         key="deaths_vaccines_smoothing")
+    measure = SMOOTHING_LABELS[smoothing]
+    show_chart(plot_daily_deaths_vaccines(covid["index"], start_date, end_date, state, measure))
+
+
+@page("US State - Overall Deaths and Vaccines", datasets=["covid"])
+def overall_deaths_vaccines_page(covid):
+    covid_data = covid["data"]
+    min_date, max_date = covid_data["date"][0].date(), covid_data["date"][len(covid_data) - 1].date()
+    state = st.selectbox("Choose state", options=covid["states"], index=0, key="overall_deaths_vaccines")
+    start_date, end_date = st.slider("Dates", min_value=min_date, max_value=max_date, value=(min_date, max_date),
+                                     key="overall_deaths_vaccines_dates")
+    show_chart(plot_overall_deaths_vaccines(covid["index"], start_date, end_date, state))
+
+
+@page("US State - Variant", datasets=["covid"])
+def variant_page(covid):
+    state = st.selectbox("Choose state", options=covid["states"], index=5)
+    variant = st.selectbox("Variant", options=covid["variants"], index=1)
+    smoothing = st.radio("Smoothing", options=list(SMOOTHING_LABELS), index=0, horizontal=True,
+                         key="variant_smoothing")
+    show_chart(plot_variant_daily_deaths_vaccines(covid["index"], state, variant, SMOOTHING_LABELS[smoothing]))
+
+
+@page("US States - Vaccination and Mortality Lags", datasets=["covid"])
+def lag_correlation_page(covid):
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        vaccination = st.radio("Vaccinations", options=list(VACCINATION_LABELS), index=0, horizontal=True,
+                               key="lag_vaccination")
+    with col2:
+        era = st.selectbox("Variant era", options=[ALL_ERAS] + covid["variants"], index=0, key="lag_era")
+    vaccination = VACCINATION_LABELS[vaccination]
+    show_chart(plot_lag_correlations(covid["index"], vaccination, era))
+    matrix = lag_correlations(covid["index"], vaccination).xs(era, level="era")
+    st.write("Lag of the strongest correlation per state")
+    st.dataframe(strongest_lags(matrix), width="stretch")
+    with st.expander("Lag-correlation matrix"):
+        st.dataframe(matrix.style.format("{:.3f}"), width="stretch")
+
+
+@page("US Counties - Drill-down", datasets=["counties"])
+def drilldown_page(cube):
+    nodes = cube["nodes"]
+    col1, col2 = st.columns(2)
+    with col1:
+        state = st.selectbox("State", options=[NATION] + cube["children"][NATION], index=0, key="drilldown_state",
+                             format_func=lambda node: "All states" if node == NATION else node)
+    node = state
+    if state != NATION:
+        with col2:
+            node = st.selectbox("County", options=[state] + cube["children"].get(state, []), index=0,
+                                key="drilldown_county",
+                                format_func=lambda node: "All counties" if node == state else nodes.at[node, "name"])
+    col3, col4 = st.columns(2)
+    with col3:
+        frequency = st.radio("Frequency", options=list(FREQUENCY_LABELS), index=0, horizontal=True,
+                             key="drilldown_frequency")
+    with col4:
+        measure = st.radio("Show", options=list(DEATHS_LABELS), index=0, horizontal=True, key="drilldown_measure")
+    frequency = FREQUENCY_LABELS[frequency]
+    dates = cube["frames"][frequency]["data"]["date"]
+    min_date, max_date = dates.iloc[0].date(), dates.iloc[-1].date()
+    start_date, end_date = st.slider("Dates", min_value=min_date, max_value=max_date, value=(min_date, max_date),
+                                     key="drilldown_dates_" + frequency)
+    show_chart(plot_drilldown(cube, node, frequency, DEATHS_LABELS[measure], start_date, end_date))
+    if node in cube["children"]:
+        st.write("Deaths per {} in the selected dates".format("state" if node == NATION else "county"))
+        st.dataframe(children_totals(cube, node, frequency, start_date, end_date), width="stretch")
+
+
+@page("Countries - Deaths and Vaccinations", datasets=["international"])
+def international_page(international):
+    countries = international["countries"]
+    options = sorted(set(countries["deaths"]) | set(countries["vaccinations"]))
+    default = [country for country in ["US", "UK", "Brazil", "India"] if country in options]
+    selected = st.multiselect("Choose countries", options=options, default=default, key="international")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        measure = st.radio("Deaths", options=list(INTERNATIONAL_LABELS), index=1, horizontal=True,
+                           key="international_measure")
+    with col2:
+        cases = st.checkbox("Show cases", key="international_cases")
+    deaths = [country for country in selected if country in countries["deaths"]]
+    show_chart(plot_international(international, "deaths", deaths, INTERNATIONAL_LABELS[measure]))
+    st.caption("Death series start on the day each country entered the source table; only China's carry dates.")
+    vaccinated = [country for country in selected if country in countries["vaccinations"]]
+    show_chart(plot_international(international, "vaccinations", vaccinated, "cumulative"))
+    if cases:
+        reported = [country for country in selected if country in countries["cases"]]
+        show_chart(plot_international(international, "cases", reported, INTERNATIONAL_LABELS[measure]))
+
+
+@page("Thank you!")
+def thank_you_page():
+    st.write("")
+    st.markdown("<h1 style='text-align: center; color: #636EFA;'>Thank you!</h1>", unsafe_allow_html=True)
+    st.snow()
+    st.balloons()
+
+
+def debug_panel(report):
+    st.sidebar.write("Rerun of {!r}: {:.3f}s".format(report["label"], report["seconds"]))
+    st.sidebar.dataframe(instrumentation.summary(report), width="stretch")
+    if report["profile"]:
+        st.sidebar.write("cProfile written to `{}`".format(report["profile"]))
+    with st.sidebar.expander("Memory per dataset"):
+        st.dataframe(compaction.memory_report(), width="stretch")
+    with st.sidebar.expander("Prometheus metrics"):
+        st.code(instrumentation.metrics_text() + data_cache.metrics_text(), language="text")
+
+
+def watch_data():
+    # Reruns the session when the refresher has swapped in a new version of a dataset since its last full run.
+    if data_cache.generation() != st.session_state.get("data_generation"):
+        st.rerun()
+
+
+if data_cache.REFRESH_SECONDS > 0:
+    watch_data = st.fragment(run_every=data_cache.REFRESH_SECONDS)(watch_data)
 
 
 def main():
     st.markdown("# Covid-19 Deaths and Vaccine Data")
     st.write("This application shows different visualizations for Covid-19 deaths and vaccine data")
 
-    option = st.sidebar.selectbox("Plots",
-                                  options=["Introduction", "US - Cases, Deaths and Vaccines",
-                                           "US - Cases, Deaths and Vaccines (Booster)",
-                                           "US - Hospitalizations and Vaccines",
-                                           "US - Hospitalizations and Vaccines (Booster)",
-                                           "US States - Daily Deaths", "US States - Daily Vaccines",
-                                           "US State - Daily Deaths and Vaccines",
-                                           "US State - Overall Deaths and Vaccines", "US State - Variant",
-                                           "Thank you!"
-                                           ], index=0)
-    covid_data = load_data()
-    all_states = get_all_states(covid_data)
-    all_variants = get_all_variants(covid_data)
-
-    cas_dth_vac_data_1, cas_dth_vac_data_2 = load_cases_deaths_vaccinations_data()
-    age_groups_cdv = get_all_age_groups_cdv(cas_dth_vac_data_1)
-    age_groups_cdvb = get_all_age_groups_cdvb(cas_dth_vac_data_2)
-    vacc_types = get_all_vaccine_types()
-
-    hosp_vac_data_1, hosp_vac_data_2, hosp_vac_data_3, hosp_vac_data_4 = load_hospitalizations_vaccinations_data()
-    age_groups_hosp = get_all_age_groups_hospitalizations(hosp_vac_data_2)
-
-    if option == "Introduction":
-        st.write("")
-        st.write("")
-        st.write("The following are the visualizations that are present in the application:")
-        st.write("- Cases and Deaths w.r.t vaccinations across the US (country level)")
-        st.write("- Hospitalizations w.r.t vaccinations across the US (country level)")
-        st.write("- Cases and Deaths w.r.t vaccinations for all states in the US")
-        st.write("- Cases and Deaths w.r.t vaccinations during different variants of COVID-19 for all states in the US")
-    elif option == "US States - Daily Deaths":
-        states = st.multiselect("Choose state/s", options=all_states, default=["California", "New York"], key="deaths")
-        start_date, end_date = st.slider("Date", value=(covid_data["date"][0], covid_data["date"][len(covid_data) - 1]),
-                                         key="deaths")
-        plot_daily_deaths(covid_data, start_date, end_date, states)
-    elif option == "US States - Daily Vaccines":
-        states = st.multiselect("Choose state/s", options=all_states, default=["California", "New York"],
-                                key="vaccines")
-        start_date, end_date = st.slider("Date", value=(covid_data["date"][0], covid_data["date"][len(covid_data) - 1]),
-                                         key="vaccines")
-        plot_daily_vaccines(covid_data, start_date, end_date, states)
-    elif option == "US State - Daily Deaths and Vaccines":
-        min_date, max_date = covid_data["date"][0], covid_data["date"][len(covid_data) - 1]
-        state = st.selectbox("Choose state", options=all_states, index=5, key="deaths_vaccines")
-        start_date, end_date = st.slider("Dates", min_value=min_date, max_value=max_date, value=(min_date, max_date),
-                                         key="deaths_vaccines")
-        plot_daily_deaths_vaccines(covid_data, start_date, end_date, state)
-    elif option == "US State - Overall Deaths and Vaccines":
-        min_date, max_date = covid_data["date"][0], covid_data["date"][len(covid_data) - 1]
-        state = st.selectbox("Choose state", options=all_states, index=0, key="overall_deaths_vaccines")
-        start_date, end_date = st.slider("Dates", min_value=min_date, max_value=max_date, value=(min_date, max_date),
-                                         key="overall_deaths_vaccines")
-        plot_overall_deaths_vaccines(covid_data, start_date, end_date, state)
-    elif option == "US State - Variant":
-        state = st.selectbox("Choose state", options=all_states, index=5)
-        variant = st.selectbox("Variant", options=all_variants, index=1)
-        plot_variant_daily_deaths_vaccines(covid_data, state, variant)
-    elif option == "US - Hospitalizations and Vaccines":
-        choice = st.radio("Choose age-adjusted or not", options=["Age adjusted", "Age group"], index=0,
-                          key="hosp_vacc")
-        if choice == "Age adjusted":
-            plot_adult_hospitalizations_vaccinations(hosp_vac_data_1)
-        else:
-            age_group = st.selectbox("Choose age group", options=age_groups_hosp, index=1,
-                                     key="age_group_hospitalizations_vaccines")
-            plot_age_group_hospitalizations_vaccinations(hosp_vac_data_2, age_group)
-    elif option == "US - Hospitalizations and Vaccines (Booster)":
-        choice = st.radio("Choose age-adjusted or not", options=["Age adjusted", "Age group"], index=0,
-                          key="hosp_vacc_booster")
-        if choice == "Age adjusted":
-            plot_booster_adult_hospitalizations_vaccinations(hosp_vac_data_3)
+    option = st.sidebar.selectbox("Plots", options=list(PAGES), index=0)
+    st.session_state["data_generation"] = data_cache.generation()
+    with instrumentation.rerun(option) as report:
+        handler = PAGES[option]
+        try:
+            datasets = [DATASET_LOADERS[name]() for name in handler["datasets"]]
+        except FileNotFoundError as e:
+            # Sources are not downloaded by the app (the county deaths are not in the repository): the page says how.
+            st.error("This page needs data that is not available yet: {}".format(e))
         else:
-            age_group = st.selectbox("Choose age group", options=age_groups_hosp, index=1,
-                                     key="age_group_hospitalizations_vaccines_booster")
-            plot_booster_age_group_hospitalizations_vaccinations(hosp_vac_data_4, age_group)
-    elif option == "US - Cases, Deaths and Vaccines":
-        st.write('<style>div.row-widget.stRadio > div{flex-direction:row;}</style>', unsafe_allow_html=True)
-        col1, col2 = st.columns([1, 1])
-        with col1:
-            main_choice = st.radio("Plot", options=["Overall", "Age group", "Vaccine type"], index=0, key="cdvb_choice")
-        with col2:
-            cd_choice = st.radio("Cases/Deaths", options=["Cases", "Deaths"], index=0,
-                                 key="age_group_cases_deaths_vaccines")
-
-        if main_choice == "Overall":
-            plot_overall_cases_vaccinations(cas_dth_vac_data_1, cd_choice)
-        elif main_choice == "Age group":
-            age_group = st.selectbox("Choose age group", options=age_groups_cdv, index=2,
-                                     key="age_group_cases_deaths_vaccines_booster")
-            plot_age_group_cases_vaccinations(cas_dth_vac_data_1, cd_choice, age_group)
-        elif main_choice == "Vaccine type":
-            plot_vaccine_cases_vaccinations(cas_dth_vac_data_1, cd_choice)
-    elif option == "US - Cases, Deaths and Vaccines (Booster)":
-        st.write('<style>div.row-widget.stRadio > div{flex-direction:row;}</style>', unsafe_allow_html=True)
-        col1, col2 = st.columns([1, 1])
-        with col1:
-            main_choice = st.radio("Plot", options=["Overall", "Age group", "Vaccine type"], index=0, key="cdvb_choice")
-        with col2:
-            cd_choice = st.radio("Cases/Deaths", options=["Cases", "Deaths"], index=0,
-                                 key="age_group_cases_deaths_vaccines")
-
-        if main_choice == "Overall":
-            plot_overall_cases_vaccinations_booster(cas_dth_vac_data_2, cd_choice)
-        elif main_choice == "Age group":
-            age_group = st.selectbox("Choose age group", options=age_groups_cdvb, index=2,
-                                     key="age_group_cases_deaths_vaccines_booster")
-            plot_age_group_cases_vaccinations_booster(cas_dth_vac_data_2, cd_choice, age_group)
-        elif main_choice == "Vaccine type":
-            vaccine = st.selectbox("Choose vaccine type", options=vacc_types, index=2,
-                                   key="vac_cases_deaths_vaccines_booster")
-            plot_vaccine_cases_vaccinations_booster(cas_dth_vac_data_2, cd_choice, vaccine)
-    elif option == "Thank you!":
-        st.write("")
-        st.markdown("<h1 style='text-align: center; color: #636EFA;'>Thank you!</h1>", unsafe_allow_html=True)
-        st.snow()
-        st.balloons()
+            handler["render"](*datasets)
+
+    if st.sidebar.checkbox("Show timings", value=DEBUG, key="debug_timings"):
+        debug_panel(report)
+
+    if PREFETCH:
+        data_cache.prefetch(DATASET_LOADERS.values())
+    data_cache.start_refresher()
+    watch_data()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import store
+from compaction import compact
+from state_index import build_state_index, state_slice
+
+SOURCE = "counties"
+NAME = "covid_cube"
+NODES = "covid_cube_nodes"
+NATION = "US"
+LEVELS = ["nation", "state", "county"]
+FREQUENCIES = {"day": "D", "week": "W-SAT"}
+MEASURES = ["Deaths", "daily_deaths"]
+KEY_COLUMNS = ["UID", "iso2", "iso3", "code3", "FIPS", "Admin2", "Province_State", "Country_Region", "Lat", "Long_",
+               "Combined_Key", "Population"]
+
+
+def county_matrix(wide):
+    # Cumulative deaths of the JHU county time series as a (county, day) matrix with its dates, missing as zero.
+    columns = [column for column in wide.columns if column not in KEY_COLUMNS]
+    dates = pd.to_datetime(pd.Index(columns), format="%m/%d/%y")
+    return np.nan_to_num(wide[columns].to_numpy(dtype="float64")), dates
+
+
+def build_nodes(wide):
+    # The hierarchy: the nation, then every state, then every county under its state, in the order of the cube.
+    states = np.sort(wide["Province_State"].astype(str).unique())
+    population = wide["Population"].to_numpy(dtype="float64")
+    state_population = pd.Series(population).groupby(wide["Province_State"].astype(str).to_numpy()).sum()
+    order = np.lexsort((wide["Combined_Key"].astype(str).to_numpy(), wide["Province_State"].astype(str).to_numpy()))
+    counties = wide.iloc[order]
+    return pd.DataFrame({
+        "node": [NATION] + list(states) + counties["Combined_Key"].astype(str).tolist(),
+        "level": ["nation"] + ["state"] * len(states) + ["county"] * len(counties),
+        "parent": [None] + [NATION] * len(states) + counties["Province_State"].astype(str).tolist(),
+        "name": [NATION] + list(states) + counties["Admin2"].astype(str).tolist(),
+        "FIPS": np.concatenate([[np.nan] * (1 + len(states)), counties["FIPS"].to_numpy(dtype="float64")]),
+        "Population": np.concatenate([[np.nansum(population)], state_population.reindex(states).to_numpy(),
+                                      population[order]]),
+    })
+
+
+def rollups(wide, nodes):
+    # Cumulative and daily deaths of every node of `nodes` per day and per week, one row per (frequency, node,
+    # date) in the order of the nodes. County daily deaths are the day-over-day differences clamped at zero (as in
+    # cleaning.daily_deltas); states and the nation sum those of their counties.
+    counts, dates = county_matrix(wide)
+    order = np.lexsort((wide["Combined_Key"].astype(str).to_numpy(), wide["Province_State"].astype(str).to_numpy()))
+    counts = counts[order]
+    daily = np.zeros_like(counts)
+    np.fmax(np.diff(counts, axis=1), 0, out=daily[:, 1:])
+    codes = pd.Index(nodes.loc[nodes["level"] == "state", "node"]).get_indexer(
+        wide["Province_State"].astype(str).to_numpy()[order])
+    levels = {}
+    for name, values in [("Deaths", counts), ("daily_deaths", daily)]:
+        states = np.zeros((codes.max(initial=-1) + 1, values.shape[1]))
+        np.add.at(states, codes, values)
+        levels[name] = np.vstack([states.sum(axis=0, keepdims=True), states, values])
+
+    # Weeks end on Saturdays (the MMWR weeks of the CDC tables); the last one may be partial.
+    weeks = dates.to_period(FREQUENCIES["week"]).end_time.normalize()
+    starts = np.flatnonzero(np.r_[True, weeks[1:] != weeks[:-1]])
+    ends = np.append(starts[1:], len(dates)) - 1
+    frames = []
+    for frequency, frame_dates, measures in [
+        ("day", dates, levels),
+        ("week", weeks[starts], {"Deaths": levels["Deaths"][:, ends],
+                                 "daily_deaths": np.add.reduceat(levels["daily_deaths"], starts, axis=1)}),
+    ]:
+        n_dates = len(frame_dates)
+        frame = pd.DataFrame({
+            "frequency": frequency,
+            "node": pd.Categorical(np.repeat(nodes["node"].to_numpy(), n_dates), categories=nodes["node"]),
+            "date": np.tile(np.asarray(frame_dates, dtype="datetime64[ns]"), len(nodes)),
+        })
+        for name in MEASURES:
+            frame[name] = measures[name].ravel()
+        frames.append(frame)
+    data = pd.concat(frames, ignore_index=True)
+    data["frequency"] = data["frequency"].astype("category")
+    return data
+
+
+def build(wide):
+    nodes = build_nodes(wide)
+    data = rollups(wide, nodes)
+    data.attrs["source_version"] = nodes.attrs["source_version"] = wide.attrs.get("version")
+    return data, nodes
+
+
+def assemble(data, nodes):
+    # The loaded cube: the hierarchy, the children of every node and one state_index-style index per frequency,
+    # so that a node's series is one contiguous slice found by its bounds.
+    version = data.attrs.get("source_version")
+    data = compact(NAME, data)
+    frames = {}
+    for frequency in FREQUENCIES:
+        frame = data[data["frequency"] == frequency].drop(columns="frequency")
+        frame.attrs["version"] = version
+        frames[frequency] = build_state_index(frame, group="node")
+    return {
+        "version": version,
+        "nodes": nodes.set_index("node"),
+        "children": nodes.dropna(subset=["parent"]).groupby("parent", sort=False)["node"].apply(list).to_dict(),
+        "frames": frames,
+    }
+
+
+def load(store_dir=None):
+    # The stored rollups when they were computed from the current county dataset, else built now.
+    version = store.dataset_version(SOURCE, store_dir)
+    paths = [store.store_path(name, store_dir) for name in (NAME, NODES)]
+    if all(os.path.exists(path) for path in paths):
+        data, nodes = store.load(NAME, store_dir), store.load(NODES, store_dir)
+        if data.attrs.get("source_version") == version == nodes.attrs.get("source_version"):
+            return assemble(data, nodes)
+    return assemble(*build(store.load(SOURCE, store_dir)))
+
+
+def cube_slice(cube, node, frequency="day", start_date=None, end_date=None):
+    return state_slice(cube["frames"][frequency], node, start_date, end_date)
+
+
+def children_totals(cube, node, frequency="day", start_date=None, end_date=None):
+    # Deaths in the date range and the latest cumulative count of every child of `node`, from their slices only.
+    rows = []
+    for child in cube["children"].get(node, []):
+        data = cube_slice(cube, child, frequency, start_date, end_date)
+        rows.append((child, cube["nodes"].at[child, "name"], data["daily_deaths"].sum(),
+                     data["Deaths"].iloc[-1] if len(data) else np.nan))
+    totals = pd.DataFrame(rows, columns=["node", "name", "deaths in range", "cumulative deaths"])
+    return totals.sort_values("deaths in range", ascending=False, kind="stable").set_index("node")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="County, state and national rollups of the JHU county deaths")
+    parser.add_argument("--store-dir", default=store.STORE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data, nodes = build(store.load(SOURCE, args.store_dir))
+    store.write_store(NODES, nodes, args.store_dir)
+    path = store.write_store(NAME, data, args.store_dir)
+    print("{}: {} nodes, {} rows -> {} ({:.2f}s)".format(NAME, len(nodes), len(data), path,
+                                                        time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import functools
+import logging
+import os
+import threading
+import time
+import weakref
+
+import store
+
+TTL = float(os.environ.get("COVID_DATA_TTL", 0))
+# COVID_REFRESH_SECONDS sets how often the refresher looks for changed files (0 turns it off, and callers check the
+# files themselves); a changed file is loaded once its version has not moved for COVID_REFRESH_SETTLE seconds, so
+# that a CSV still being copied in is not read.
+REFRESH_SECONDS = float(os.environ.get("COVID_REFRESH_SECONDS", 10))
+SETTLE_SECONDS = float(os.environ.get("COVID_REFRESH_SETTLE", 1))
+
+logger = logging.getLogger("covid.data")
+
+_entries = {}
+_loaders = {}
+_locks = {}
+_locks_lock = threading.Lock()
+# Guards _stats, updated from the sessions and the refresher. Reentrant: a garbage collection run while it is held may
+# release a version and take it again.
+_stats_lock = threading.RLock()
+_prefetch = {"started": False}
+_refresher = {"thread": None, "stop": None}
+_stats = {"hits": 0, "misses": 0, "lookup_seconds": 0.0, "load_seconds": 0.0, "swaps": 0, "refreshes": 0,
+          "refresh_seconds": 0.0, "last_refresh_seconds": 0.0, "refresh_errors": 0, "live_versions": 0,
+          "peak_live_versions": 0}
+
+
+class Snapshot(dict):
+    # A loaded dataset bundle; unlike a plain dict it can be tracked until the last session reading it lets go.
+    pass
+
+
+def _lock(key):
+    with _locks_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _versions(sources):
+    return tuple(store.dataset_version(name) for name in sources)
+
+
+def _fresh(entry, versions, ttl):
+    if entry is None or entry["versions"] != versions:
+        return False
+    return not ttl or time.monotonic() - entry["loaded_at"] < ttl
+
+
+def _count(field, value=1):
+    with _stats_lock:
+        _stats[field] += value
+
+
+def _released():
+    _count("live_versions", -1)
+
+
+def _track(value):
+    # Counts the versions of the datasets still referenced: the current ones and the replaced ones that a session
+    # is still reading.
+    if isinstance(value, dict) and not isinstance(value, Snapshot):
+        value = Snapshot(value)
+    if isinstance(value, Snapshot):
+        with _stats_lock:
+            _stats["live_versions"] += 1
+            _stats["peak_live_versions"] = max(_stats["peak_live_versions"], _stats["live_versions"])
+        weakref.finalize(value, _released)
+    return value
+
+
+def _load(key, versions):
+    # Loads a dataset and swaps it in with one assignment: callers holding the previous version keep reading it.
+    start = time.perf_counter()
+    value = _track(_loaders[key]["load"]())
+    _count("load_seconds", time.perf_counter() - start)
+    if key in _entries:
+        _count("swaps")
+    _entries[key] = {"value": value, "versions": versions, "loaded_at": time.monotonic()}
+    return value
+
+
+def cached(sources, ttl=None):
+    # Loads the value once per process and hands the same object to every caller (callers must not mutate it).
+    # It is loaded again when one of the store datasets in `sources` changes on disk or, with a TTL, when it expires:
+    # by the refresher when it runs, otherwise by the first caller to notice.
+    def decorator(load):
+        key = load.__module__ + "." + load.__qualname__
+        _loaders[key] = {"load": load, "sources": list(sources), "ttl": ttl}
+
+        @functools.wraps(load)
+        def wrapper():
+            start = time.perf_counter()
+            entry = _entries.get(key)
+            if entry is not None and _refresher["thread"] is not None:
+                _count("lookup_seconds", time.perf_counter() - start)
+                _count("hits")
+                return entry["value"]
+            versions = _versions(sources)
+            fresh = _fresh(entry, versions, TTL if ttl is None else ttl)
+            _count("lookup_seconds", time.perf_counter() - start)
+            if fresh:
+                _count("hits")
+                return entry["value"]
+
+            # One thread loads while the others wait for its result instead of loading the dataset again.
+            with _lock(key):
+                entry = _entries.get(key)
+                if _fresh(entry, versions, TTL if ttl is None else ttl):
+                    _count("hits")
+                    return entry["value"]
+                _count("misses")
+                return _load(key, versions)
+
+        # Callers that cache what they derive from the value key it on the same datasets.
+        wrapper.sources = list(sources)
+        return wrapper
+
+    return decorator
+
+
+def refresh(settle=None):
+    # Reloads every loaded dataset whose files changed (or whose TTL expired), one at a time. A load that fails
+    # leaves the previous version in place until the files change again. Returns the keys of the swapped datasets.
+    settle = SETTLE_SECONDS if settle is None else settle
+    swapped = []
+    for key, loader in list(_loaders.items()):
+        entry = _entries.get(key)
+        versions = _versions(loader["sources"])
+        if _fresh(entry, versions, TTL if loader["ttl"] is None else loader["ttl"]) or \
+                entry is None or entry.get("failed") == versions:
+            continue
+        if settle:
+            time.sleep(settle)
+            if _versions(loader["sources"]) != versions:
+                continue
+        start = time.perf_counter()
+        with _lock(key):
+            try:
+                _load(key, versions)
+            except Exception:
+                logger.exception("refresh of %s failed, still serving the previous version", key)
+                _count("refresh_errors")
+                entry["failed"] = versions
+                continue
+        seconds = time.perf_counter() - start
+        with _stats_lock:
+            _stats["refreshes"] += 1
+            _stats["refresh_seconds"] += seconds
+            _stats["last_refresh_seconds"] = seconds
+        swapped.append(key)
+    return swapped
+
+
+def start_refresher(interval=None):
+    # Starts the refresher thread, once per process, unless the interval is 0.
+    interval = REFRESH_SECONDS if interval is None else interval
+    with _locks_lock:
+        if _refresher["thread"] is not None or interval <= 0:
+            return
+        stop = threading.Event()
+        thread = threading.Thread(target=_refresh_loop, args=(interval, stop), name="data-refresh", daemon=True)
+        _refresher.update(thread=thread, stop=stop)
+    thread.start()
+
+
+def stop_refresher():
+    with _locks_lock:
+        thread, stop = _refresher["thread"], _refresher["stop"]
+        _refresher.update(thread=None, stop=None)
+    if thread is not None:
+        stop.set()
+        thread.join()
+
+
+def _refresh_loop(interval, stop):
+    while not stop.wait(interval):
+        try:
+            refresh()
+        except Exception:
+            logger.exception("refresh failed")
+
+
+def prefetch(loaders):
+    # Loads the given datasets in a background thread, once per process, so later pages find them ready.
+    with _locks_lock:
+        if _prefetch["started"]:
+            return
+        _prefetch["started"] = True
+    threading.Thread(target=_load_all, args=(list(loaders),), name="data-prefetch", daemon=True).start()
+
+
+def _load_all(loaders):
+    for load in loaders:
+        try:
+            load()
+        except Exception:
+            logger.exception("prefetch of %s failed", load.__name__)
+
+
+def clear():
+    _entries.clear()
+
+
+def generation():
+    # Changes whenever a loaded dataset is replaced by a new version.
+    return _stats["swaps"]
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats, entries=len(_entries))
+
+
+def metrics_text():
+    # Refresh totals and live versions in the Prometheus text exposition format.
+    values = stats()
+    lines = []
+    for field, metric, kind, help_text in [
+        ("refreshes", "covid_data_refreshes_total", "counter", "Datasets reloaded by the refresher."),
+        ("refresh_seconds", "covid_data_refresh_seconds_total", "counter", "Time spent reloading datasets."),
+        ("refresh_errors", "covid_data_refresh_errors_total", "counter", "Reloads that failed."),
+        ("live_versions", "covid_data_versions_live", "gauge", "Dataset versions still referenced."),
+        ("peak_live_versions", "covid_data_versions_live_peak", "gauge", "Most dataset versions referenced at once."),
+    ]:
+        lines += ["# HELP {} {}".format(metric, help_text), "# TYPE {} {}".format(metric, kind),
+                  "{} {}".format(metric, values[field])]
+    return "\n".join(lines) + "\n"
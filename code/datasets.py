@@ -0,0 +1,131 @@
+import argparse
+import time
+
+import cube
+import data_cache
+import derived
+import international
+import intervals
+import store
+from compaction import compact, memory_report
+from compare import build_population
+from incidence import CDV_KEYS, CDVB_KEYS, pivot_incidence
+from instrumentation import timed
+from sources import age_groups
+from state_index import build_state_index
+from variants import label_variants
+
+
+@timed("loader")
+@data_cache.cached(sources=["covid", derived.NAME, "population", "variant_eras"])
+def load_data():
+    # Dates stay datetime64 from the store to the plots, so date filters compare int64 values and not Python dates.
+    data = store.load("covid")
+    version = data.attrs["version"]
+    data = data.merge(derived.load(data), on=derived.KEYS, how="left")
+    eras = store.load("variant_eras")
+    data["Variant"] = label_variants(data, eras)
+    data = compact("covid", data)
+    # The labels are part of the data: cached figures of the old eras must not be reused.
+    data.attrs["version"] = "{}+{}".format(version, eras.attrs["version"])
+    return {
+        "data": data,
+        "index": build_state_index(data),
+        "population": build_population(store.load("population")),
+        "states": get_all_states(data),
+        "variants": get_all_variants(data),
+    }
+
+
+@timed("loader")
+@data_cache.cached(sources=["hosp_adults", "hosp_age_group", "hosp_adults_booster", "hosp_age_group_booster"])
+def load_hospitalizations_vaccinations_data():
+    data_1 = compact("hosp_adults", store.load("hosp_adults"))
+    data_2 = compact("hosp_age_group", store.load("hosp_age_group"))
+    data_3 = compact("hosp_adults_booster", store.load("hosp_adults_booster"))
+    data_4 = compact("hosp_age_group_booster", store.load("hosp_age_group_booster"))
+    return {
+        "data": (data_1, data_2, data_3, data_4),
+        "age_groups": get_all_age_groups_hospitalizations(data_2),
+    }
+
+
+@timed("loader")
+@data_cache.cached(sources=["cdv", "cdv_booster", intervals.store_name("cdv"), intervals.store_name("cdv_booster")])
+def load_cases_deaths_vaccinations_data():
+    data_1 = compact("cdv", intervals.with_intervals(store.load("cdv"), "cdv"))
+    data_2 = compact("cdv_booster", intervals.with_intervals(store.load("cdv_booster"), "cdv_booster"))
+    return {
+        "data": (data_1, data_2),
+        "incidence": (pivot_incidence(data_1, CDV_KEYS), pivot_incidence(data_2, CDVB_KEYS)),
+        "age_groups_cdv": get_all_age_groups_cdv(data_1),
+        "age_groups_cdvb": get_all_age_groups_cdvb(data_2),
+        "vaccine_types": get_all_vaccine_types(),
+    }
+
+
+@timed("loader")
+@data_cache.cached(sources=[cube.SOURCE, cube.NAME, cube.NODES])
+def load_county_data():
+    return cube.load()
+
+
+@timed("loader")
+@data_cache.cached(sources=international.SOURCES + [international.NAME])
+def load_international_data():
+    return international.load()
+
+
+@timed("helper")
+def get_all_states(df):
+    return df["Province_State"].unique().tolist()
+
+
+@timed("helper")
+def get_all_variants(df):
+    return df["Variant"].unique().tolist()
+
+
+@timed("helper")
+def get_all_age_groups_hospitalizations(df):
+    return df["Age group"].unique().tolist()
+
+
+@timed("helper")
+def get_all_age_groups_cdv(df):
+    return age_groups(df, "cdv")
+
+
+@timed("helper")
+def get_all_age_groups_cdvb(df):
+    return age_groups(df, "cdv_booster")
+
+
+@timed("helper")
+def get_all_vaccine_types():
+    return ["Janssen", "Moderna", "Pfizer"]
+
+
+DATASET_LOADERS = {
+    "covid": load_data,
+    "hospitalizations": load_hospitalizations_vaccinations_data,
+    "cases_deaths": load_cases_deaths_vaccinations_data,
+    "counties": load_county_data,
+    "international": load_international_data,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load every dataset and report its memory before and after compaction")
+    parser.parse_args()
+    start = time.perf_counter()
+    for loader in DATASET_LOADERS.values():
+        loader()
+    report = memory_report()
+    print(report.to_string(formatters={"saved": "{:.1%}".format}))
+    print("total: {} -> {} bytes ({:.2f}s)".format(report["before"].sum(), report["after"].sum(),
+                                                   time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
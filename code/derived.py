@@ -0,0 +1,138 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import store
+from cleaning import DAILY_COLUMNS, group_order, group_starts
+
+NAME = "covid_derived"
+WINDOWS = [7, 14]
+GROWTH_WINDOW = 7
+# Rows before the first new one that the windows and the week-over-week growth of the new rows can read.
+CONTEXT_ROWS = max(max(WINDOWS), 2 * GROWTH_WINDOW) - 1
+KEYS = ["Province_State", "date"]
+
+
+def derived_columns(columns=None):
+    names = []
+    for column in columns or DAILY_COLUMNS.values():
+        for window in WINDOWS:
+            names += ["{}_mean{}".format(column, window), "{}_sum{}".format(column, window)]
+        names.append("{}_wow".format(column))
+    return names
+
+
+def window_sums(values, present, local, window):
+    # Sums and non-missing counts over the last `window` rows that restart at every group (local is the row's
+    # position within its group).
+    sums = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(present)])
+    end = np.arange(1, len(values) + 1)
+    begin = end - np.minimum(local + 1, window)
+    return sums[end] - sums[begin], counts[end] - counts[begin]
+
+
+def derive(data, columns=None, group="Province_State", date="date"):
+    # Rolling means (over the available rows at the start of a state), rolling sums (full windows only) and
+    # week-over-week growth of the 7-day sum for every state, one row per day. Rows are (state, date) sorted.
+    order, codes = group_order(data, group, date)
+    if order is not None:
+        data = data.take(order)
+    starts = np.flatnonzero(group_starts(codes))
+    local = np.arange(len(data)) - np.repeat(starts, np.diff(np.append(starts, len(data))))
+
+    derived = {group: data[group].to_numpy(), date: data[date].to_numpy()}
+    for column in columns or DAILY_COLUMNS.values():
+        values = data[column].to_numpy(dtype="float64")
+        present = ~np.isnan(values)
+        for window in WINDOWS:
+            sums, counts = window_sums(values, present, local, window)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                derived["{}_mean{}".format(column, window)] = sums / counts
+            derived["{}_sum{}".format(column, window)] = np.where(local >= window - 1, sums, np.nan)
+        weekly = window_sums(values, present, local, GROWTH_WINDOW)[0]
+        previous = np.full(len(values), np.nan)
+        previous[GROWTH_WINDOW:] = weekly[:-GROWTH_WINDOW]
+        previous[local < 2 * GROWTH_WINDOW - 1] = np.nan
+        with np.errstate(invalid="ignore", divide="ignore"):
+            growth = weekly / previous - 1
+        derived["{}_wow".format(column)] = np.where(np.isfinite(growth), growth, np.nan)
+    derived = pd.DataFrame(derived)
+    derived[group] = derived[group].astype(data[group].dtype)
+    return derived
+
+
+def appended_rows(data, derived, group="Province_State", date="date"):
+    # Positions of the rows of `data` newer than the last derived date of their state, or None when `derived` is
+    # not a per-state prefix of `data` (rows were removed or inserted) and everything must be derived again.
+    # Edits to existing rows are not detected: those go through a full update.
+    last = derived.groupby(group, observed=True)[date].max()
+    codes, states = pd.factorize(data[group])
+    known = last.reindex(states).to_numpy()[codes]
+    old = data[date].to_numpy() <= known
+    if old.sum() != len(derived) or not last.index.isin(states).all():
+        return None
+    return np.flatnonzero(~old)
+
+
+def update(data, derived=None, columns=None, group="Province_State", date="date"):
+    # Derives only the rows appended since `derived` was computed, reading up to CONTEXT_ROWS earlier rows of
+    # their state, and appends them (the result is no longer sorted by state and date). Returns the derived rows
+    # and how many of them were computed.
+    if derived is None or list(derived.columns) != [group, date] + derived_columns(columns):
+        return derive(data, columns, group, date), len(data)
+    new = appended_rows(data, derived, group, date)
+    if new is None:
+        return derive(data, columns, group, date), len(data)
+    if not len(new):
+        return derived, 0
+
+    order, codes = group_order(data, group, date)
+    is_new = np.zeros(len(data), dtype=bool)
+    is_new[new] = True
+    if order is not None:
+        data, is_new = data.take(order), is_new[order]
+    starts = np.flatnonzero(group_starts(codes))
+    lengths = np.diff(np.append(starts, len(data)))
+    first_new = np.full(len(starts), len(data))
+    np.minimum.at(first_new, np.repeat(np.arange(len(starts)), lengths)[is_new], np.flatnonzero(is_new))
+    context = np.arange(len(data)) >= np.repeat(np.maximum(first_new - CONTEXT_ROWS, starts), lengths)
+
+    tail = derive(data[context], columns, group, date)[is_new[context]]
+    return pd.concat([derived, tail], ignore_index=True), len(new)
+
+
+def load(data, store_dir=None):
+    # The stored derived columns when they were computed from this version of `data`, else derived now.
+    if os.path.exists(store.store_path(NAME, store_dir)):
+        derived = store.load(NAME, store_dir)
+        if derived.attrs.get("source_version") == data.attrs.get("version"):
+            return derived
+    return derive(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling means, rolling sums and week-over-week growth per state")
+    parser.add_argument("--store-dir", default=store.STORE_DIR)
+    parser.add_argument("--full", action="store_true", help="Derive every row again")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = store.load("covid", args.store_dir)
+    derived = None
+    if not args.full and os.path.exists(store.store_path(NAME, args.store_dir)):
+        derived = store.load(NAME, args.store_dir)
+    derived, rows = update(data, derived)
+    path = store.store_path(NAME, args.store_dir)
+    if rows or derived.attrs.get("source_version") != data.attrs["version"]:
+        derived.attrs["source_version"] = data.attrs["version"]
+        store.write_store(NAME, derived, args.store_dir)
+    print("{}: {} of {} rows derived -> {} ({:.2f}s)".format(NAME, rows, len(derived), path,
+                                                          time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
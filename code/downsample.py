@@ -0,0 +1,27 @@
+import numpy as np
+
+
+def minmax_indices(y, max_points):
+    # Positions of the points to draw: the minimum and maximum of each of max_points // 2 equal buckets, plus the
+    # first and last point, so every peak and trough survives. Series that already fit are returned whole.
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    y = np.asarray(y, dtype="float64")
+    buckets = max(max_points // 2, 1)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    highs = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    lows = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    keep = np.concatenate([[0, n - 1], highs, lows])
+    return np.unique(keep[keep < n])
+
+
+def downsample(x, y, max_points):
+    keep = minmax_indices(y, max_points)
+    if len(keep) == len(y):
+        return x, y
+    return x.iloc[keep], y.iloc[keep]
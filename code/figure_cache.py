@@ -0,0 +1,110 @@
+import datetime
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from instrumentation import count_bytes
+
+MAX_BYTES = int(os.environ.get("COVID_FIGURE_CACHE_BYTES", 64 * 2 ** 20))
+
+
+class FigureCache:
+    # LRU cache of figures serialized to JSON, evicting the least recently used ones above max_bytes.
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            spec = self.entries.get(key)
+            if spec is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return spec
+
+    def put(self, key, spec):
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            if len(spec) > self.max_bytes:
+                return
+            self.entries[key] = spec
+            self.size += len(spec)
+            while self.size > self.max_bytes:
+                self.size -= len(self.entries.popitem(last=False)[1])
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+FIGURE_CACHE = FigureCache()
+
+
+class UnversionedData(ValueError):
+    pass
+
+
+def dataset_version(data):
+    # Only the version the loaders stamp identifies a dataset: ids are reused once a frame is collected.
+    version = data.attrs.get("version") if isinstance(data, pd.DataFrame) else data.get("version")
+    if not version:
+        raise UnversionedData("dataset without a version")
+    return version
+
+
+def key_part(value):
+    if isinstance(value, (pd.DataFrame, dict)):
+        return "dataset", dataset_version(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(key_part(item) for item in value)
+    if isinstance(value, (datetime.date, pd.Timestamp)):
+        return value.isoformat()
+    return value
+
+
+def figure_key(name, args, kwargs):
+    return name, tuple(key_part(arg) for arg in args), tuple(sorted((k, key_part(v)) for k, v in kwargs.items()))
+
+
+def cached_figure(build, cache=FIGURE_CACHE):
+    # Returns the figure that build(*args, **kwargs) would, rebuilding it only when the arguments or the
+    # version of the datasets passed in have not been seen recently. Figures of unversioned datasets are not cached.
+    @functools.wraps(build)
+    def wrapper(*args, **kwargs):
+        try:
+            key = figure_key(build.__name__, args, kwargs)
+        except UnversionedData:
+            return build(*args, **kwargs)
+        spec = cache.get(key)
+        if spec is not None:
+            count_bytes(len(spec))
+            # The cached JSON was validated when the figure was built: validating it again costs as much as a build.
+            return go.Figure(json.loads(spec), _validate=False)
+        fig = build(*args, **kwargs)
+        spec = fig.to_json()
+        cache.put(key, spec)
+        count_bytes(len(spec))
+        return fig
+
+    return wrapper
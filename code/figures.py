@@ -0,0 +1,40 @@
+import os
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Figures with more points than this over all their line traces are drawn with WebGL (Scattergl): SVG traces stall
+# the browser once many states are selected.
+WEBGL_POINTS = int(os.environ.get("COVID_WEBGL_POINTS", 5000))
+
+TEMPLATE = "covid"
+TICKS = dict(ticks="outside", tickwidth=2, tickcolor="crimson", ticklen=10)
+# Every figure embeds its template and Plotly copies it into each new figure: only the defaults of the trace types
+# the dashboard draws are kept from Plotly's.
+TRACE_TYPES = ["scatter", "scattergl", "heatmap"]
+
+_plotly = pio.templates["plotly"]
+_template = go.layout.Template(layout=_plotly.layout,
+                               data={kind: _plotly.data[kind] for kind in TRACE_TYPES})
+# A template's x and y axes apply to all of them, the secondary y axes included.
+_template.layout.update(font=dict(family="Courier New, monospace", size=12, color="Black"), xaxis=TICKS, yaxis=TICKS)
+pio.templates[TEMPLATE] = _template
+
+
+def figure(traces, secondary=None, **layout):
+    # Builds a figure in a single constructor call, validated once. `traces` are the keyword dicts of its traces;
+    # those without a "type" are scatter traces, drawn with WebGL above WEBGL_POINTS points. With `secondary` (the
+    # title of a second y axis on the right), traces with secondary_y=True are drawn against it, as in make_subplots.
+    points = sum(len(trace["y"]) for trace in traces if "type" not in trace)
+    kind = "scattergl" if points > WEBGL_POINTS else "scatter"
+    data = []
+    for trace in traces:
+        trace = dict(trace)
+        if trace.pop("secondary_y", False):
+            trace["yaxis"] = "y2"
+        trace.setdefault("type", kind)
+        data.append(trace)
+    if secondary is not None:
+        layout.update(xaxis_domain=[0.0, 0.94], yaxis2=dict(anchor="x", overlaying="y", side="right",
+                                                            title_text=secondary))
+    return go.Figure(data=data, layout=dict(template=TEMPLATE, **layout))
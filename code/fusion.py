@@ -0,0 +1,331 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+import store
+
+REPORTS_DIR = os.environ.get("COVID_REPORTS_DIR", os.path.join(store.ROOT_DIR, "..", "COVID-19", "csse_covid_19_data",
+                                                              "csse_covid_19_daily_reports_us"))
+VACCINATIONS_PATH = os.path.join(store.DATA_DIR, "people_vaccinated_us_timeline.csv")
+PARTITIONS_DIR = os.path.join(store.STORE_DIR, "daily_reports")
+MANIFEST_FILE = "manifest.json"
+BATCH_ROWS = 100000
+
+# Canonical daily-report schema; older report vintages use the names on the left of RENAMED_COLUMNS.
+REPORT_DTYPES = {
+    "Province_State": "string",
+    "Country_Region": "string",
+    "Last_Update": "string",
+    "Lat": "float64",
+    "Long_": "float64",
+    "Confirmed": "float64",
+    "Deaths": "float64",
+    "Recovered": "float64",
+    "Active": "float64",
+    "FIPS": "float64",
+    "Incident_Rate": "float64",
+    "Total_Test_Results": "float64",
+    "People_Hospitalized": "float64",
+    "Case_Fatality_Ratio": "float64",
+    "UID": "float64",
+    "ISO3": "string",
+    "Testing_Rate": "float64",
+    "Hospitalization_Rate": "float64",
+}
+RENAMED_COLUMNS = {
+    "People_Tested": "Total_Test_Results",
+    "Mortality_Rate": "Case_Fatality_Ratio",
+    "Incidence_Rate": "Incident_Rate",
+    "Long": "Long_",
+}
+VACCINATION_DTYPES = {
+    "Combined_Key": "string",
+    "People_Fully_Vaccinated": "float64",
+    "People_Partially_Vaccinated": "float64",
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def file_changed(path, entry):
+    # Size and mtime are checked first so that unchanged files are never read; the hash decides when they differ.
+    signature = file_signature(path)
+    if entry and entry["size"] == signature["size"] and entry["mtime"] == signature["mtime"]:
+        return False, entry
+    signature["sha256"] = file_hash(path)
+    if entry and entry["sha256"] == signature["sha256"]:
+        return False, dict(entry, mtime=signature["mtime"])
+    return True, signature
+
+
+def load_manifest(partitions_dir=None):
+    path = os.path.join(partitions_dir or PARTITIONS_DIR, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"reports": {}, "vaccinations": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, partitions_dir=None):
+    path = os.path.join(partitions_dir or PARTITIONS_DIR, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def partition_name(date):
+    return "date={}".format(date)
+
+
+def report_date(path):
+    return pd.to_datetime(os.path.basename(path).replace(".csv", ""), format="%m-%d-%Y").strftime("%Y-%m-%d")
+
+
+def normalize_report(data):
+    data = data.rename(columns=RENAMED_COLUMNS).reindex(columns=list(REPORT_DTYPES))
+    return data.astype(REPORT_DTYPES)
+
+
+def read_report(path):
+    data = normalize_report(pd.read_csv(path))
+    data["date"] = pd.Timestamp(report_date(path))
+    return data
+
+
+def read_vaccinations(path=None):
+    data = pd.read_csv(path or VACCINATIONS_PATH)
+    data["Date"] = pd.to_datetime(data["Date"], format="%Y-%m-%d")
+    return data
+
+
+def vaccination_hashes(vaccinations):
+    row_hashes = pd.util.hash_pandas_object(vaccinations, index=False)
+    return {date.strftime("%Y-%m-%d"): hashlib.sha256(group.values.tobytes()).hexdigest()
+            for date, group in row_hashes.groupby(vaccinations["Date"])}
+
+
+def merge_vaccinations(report, vaccinations):
+    merged = report.merge(vaccinations, left_on=["Province_State", "date"], right_on=["Province_State", "Date"],
+                          how="left")
+    merged = merged.drop(["FIPS_y", "Lat_y", "Long__y", "Country_Region_y", "Date"], axis=1, errors="ignore")
+    merged = merged.rename(columns={"Country_Region_x": "Country_Region", "Lat_x": "Lat", "Long__x": "Long",
+                                    "FIPS_x": "FIPS"})
+    return merged.astype(VACCINATION_DTYPES)
+
+
+def fuse_day(path, vaccinations):
+    return merge_vaccinations(read_report(path), vaccinations)
+
+
+def fuse_days(tasks, workers=None, prefetch=None):
+    # Yields fused days in task order while keeping at most `prefetch` parsed days in flight.
+    workers = min(workers or os.cpu_count(), max(len(tasks), 1))
+    if workers == 1:
+        for task in tasks:
+            yield fuse_day(*task)
+        return
+    prefetch = prefetch or workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = deque()
+        for task in tasks:
+            futures.append(executor.submit(fuse_day, *task))
+            if len(futures) >= prefetch:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+def iter_batches(frames, batch_rows=BATCH_ROWS):
+    batch, rows = [], 0
+    for frame in frames:
+        batch.append(frame)
+        rows += len(frame)
+        if rows >= batch_rows:
+            yield pd.concat(batch, ignore_index=True)
+            batch, rows = [], 0
+    if batch:
+        yield pd.concat(batch, ignore_index=True)
+
+
+def write_batches(batches, output):
+    rows = 0
+    if output.endswith(".feather"):
+        writer = schema = None
+        try:
+            for batch in batches:
+                table = pa.Table.from_pandas(batch, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pa.ipc.new_file(output, schema)
+                writer.write_table(table.cast(schema))
+                rows += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+    for batch in batches:
+        batch.to_csv(output, mode="a" if rows else "w", header=not rows, index=False)
+        rows += len(batch)
+    return rows
+
+
+def report_tasks(paths, vaccinations):
+    by_date = dict(tuple(vaccinations.groupby("Date")))
+    tasks = []
+    for path in sorted(paths, key=report_date):
+        tasks.append((path, by_date.get(pd.Timestamp(report_date(path)), vaccinations.iloc[:0])))
+    return tasks
+
+
+def fuse(reports_dir=None, vaccinations_path=None, output=None, workers=None, batch_rows=BATCH_ROWS):
+    start = time.perf_counter()
+    paths = glob.glob(os.path.join(reports_dir or REPORTS_DIR, "*.csv"))
+    tasks = report_tasks(paths, read_vaccinations(vaccinations_path))
+    rows = write_batches(iter_batches(fuse_days(tasks, workers), batch_rows), output)
+    seconds = time.perf_counter() - start
+    return {"files": len(tasks), "rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds if seconds else 0}
+
+
+def ingest(reports_dir=None, vaccinations_path=None, partitions_dir=None, full=False, workers=None):
+    start = time.perf_counter()
+    reports_dir = reports_dir or REPORTS_DIR
+    vaccinations_path = vaccinations_path or VACCINATIONS_PATH
+    partitions_dir = partitions_dir or PARTITIONS_DIR
+    if full and os.path.exists(partitions_dir):
+        shutil.rmtree(partitions_dir)
+    os.makedirs(partitions_dir, exist_ok=True)
+
+    manifest = load_manifest(partitions_dir)
+    reports = manifest["reports"]
+    files = {os.path.basename(path): path for path in glob.glob(os.path.join(reports_dir, "*.csv"))}
+
+    for name in sorted(set(reports) - set(files)):
+        path = store.store_path(partition_name(reports.pop(name)["date"]), partitions_dir)
+        if os.path.exists(path):
+            os.remove(path)
+
+    # A changed report is only recorded in the manifest once its partition is written, so one that fails to fuse is
+    # retried by the next run.
+    pending, entries = {}, {}
+    for name, path in sorted(files.items()):
+        changed, entry = file_changed(path, reports.get(name))
+        entry["date"] = report_date(path)
+        if changed:
+            pending[name] = path
+            entries[name] = entry
+        else:
+            reports[name] = entry
+
+    # Only the days whose vaccination rows changed need to be merged again.
+    vaccinations = None
+    changed, vaccinations_entry = file_changed(vaccinations_path, manifest["vaccinations"])
+    if changed:
+        vaccinations = read_vaccinations(vaccinations_path)
+        hashes = vaccination_hashes(vaccinations)
+        previous = manifest["vaccinations"].get("dates", {})
+        changed_dates = {date for date in set(hashes) | set(previous) if hashes.get(date) != previous.get(date)}
+        for name, path in files.items():
+            if report_date(path) in changed_dates:
+                pending[name] = path
+                entries.setdefault(name, reports.get(name))
+        vaccinations_entry["dates"] = hashes
+
+    rows = 0
+    try:
+        if pending and vaccinations is None:
+            vaccinations = read_vaccinations(vaccinations_path)
+        tasks = report_tasks(pending.values(), vaccinations) if pending else []
+        for (path, _), merged in zip(tasks, fuse_days(tasks, workers)):
+            name = os.path.basename(path)
+            entry = entries[name]
+            store.write_store(partition_name(entry["date"]), merged, partitions_dir)
+            entry["rows"] = len(merged)
+            reports[name] = entry
+            rows += len(merged)
+        # The vaccination hashes only hold once every day they changed has been merged again.
+        manifest["vaccinations"] = vaccinations_entry
+    finally:
+        save_manifest(manifest, partitions_dir)
+
+    seconds = time.perf_counter() - start
+    return {"files": len(pending), "rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds if seconds else 0}
+
+
+def iter_partitions(partitions_dir=None, start_date=None, end_date=None):
+    partitions_dir = partitions_dir or PARTITIONS_DIR
+    manifest = load_manifest(partitions_dir)
+    dates = sorted({entry["date"] for entry in manifest["reports"].values()})
+    if start_date is not None:
+        dates = [date for date in dates if date >= str(start_date)]
+    if end_date is not None:
+        dates = [date for date in dates if date <= str(end_date)]
+    for date in dates:
+        yield store.load(partition_name(date), store_dir=partitions_dir)
+
+
+def load_partitions(partitions_dir=None, start_date=None, end_date=None):
+    frames = list(iter_partitions(partitions_dir, start_date, end_date))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuse the JHU daily US reports with the vaccination timeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest new or changed daily reports")
+    ingest_parser.add_argument("--reports-dir", default=REPORTS_DIR)
+    ingest_parser.add_argument("--vaccinations", default=VACCINATIONS_PATH)
+    ingest_parser.add_argument("--partitions-dir", default=PARTITIONS_DIR)
+    ingest_parser.add_argument("--full", action="store_true", help="Drop the manifest and rebuild every partition")
+    ingest_parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count)")
+
+    default_output = os.path.join(store.DATA_DIR, "us_covid19_vaccine_cases_deaths.csv")
+    export_parser = subparsers.add_parser("export", help="Write all partitions to a single CSV or Feather file")
+    export_parser.add_argument("output", nargs="?", default=default_output)
+    export_parser.add_argument("--partitions-dir", default=PARTITIONS_DIR)
+    export_parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+
+    fuse_parser = subparsers.add_parser("fuse", help="Fuse every daily report straight into one output file")
+    fuse_parser.add_argument("output", nargs="?", default=default_output)
+    fuse_parser.add_argument("--reports-dir", default=REPORTS_DIR)
+    fuse_parser.add_argument("--vaccinations", default=VACCINATIONS_PATH)
+    fuse_parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count)")
+    fuse_parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        stats = ingest(args.reports_dir, args.vaccinations, args.partitions_dir, args.full, args.workers)
+        print("{} {} files, {} rows in {:.2f}s ({:.0f} rows/s)".format(
+            "full" if args.full else "incremental", stats["files"], stats["rows"], stats["seconds"],
+            stats["rows_per_sec"]))
+    elif args.command == "export":
+        rows = write_batches(iter_batches(iter_partitions(args.partitions_dir), args.batch_rows), args.output)
+        print("{} rows -> {}".format(rows, args.output))
+    elif args.command == "fuse":
+        stats = fuse(args.reports_dir, args.vaccinations, args.output, args.workers, args.batch_rows)
+        print("{} files, {} rows -> {} in {:.2f}s ({:.0f} rows/s)".format(
+            stats["files"], stats["rows"], args.output, stats["seconds"], stats["rows_per_sec"]))
+
+
+if __name__ == "__main__":
+    main()
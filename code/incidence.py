@@ -0,0 +1,25 @@
+import pandas as pd
+
+CDV_KEYS = ["outcome", "Age group", "Vaccine product"]
+CDVB_KEYS = ["outcome", "age_group", "vaccine_product"]
+
+
+def pivot_incidence(data, keys, date="date"):
+    # One date-indexed frame of the numeric columns per (outcome, age group, vaccine product), all reindexed onto
+    # the same dates so that series of different cells line up point for point.
+    data = data.dropna(subset=[date] + keys)
+    dates = pd.Index(sorted(data[date].unique()), name=date)
+    columns = data.select_dtypes("number").columns
+    series = {}
+    for key, group in data.groupby(keys, observed=True, sort=False):
+        series[key] = group.set_index(date)[columns].reindex(dates)
+    return {
+        "version": data.attrs.get("version"),
+        "dates": dates,
+        "series": series,
+        "empty": pd.DataFrame(index=dates, columns=columns, dtype="float64"),
+    }
+
+
+def incidence_series(incidence, outcome, age_group, product):
+    return incidence["series"].get((outcome, age_group, product), incidence["empty"])
@@ -0,0 +1,176 @@
+import contextlib
+import contextvars
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import store
+
+# COVID_PROFILE=1 captures a cProfile of the next rerun of the app (once per process) into PROFILE_DIR, and
+# COVID_TIMING_LOG=1 logs one line of timings per rerun.
+PROFILE = os.environ.get("COVID_PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("COVID_PROFILE_DIR", os.path.join(store.ROOT_DIR, "profiles"))
+LOG_RERUNS = os.environ.get("COVID_TIMING_LOG", "0") == "1"
+METRICS = [
+    ("calls", "covid_calls_total", "Instrumented calls."),
+    ("seconds", "covid_call_seconds_total", "Time spent in instrumented calls."),
+    ("bytes", "covid_payload_bytes_total", "Bytes of the payloads returned by instrumented calls."),
+]
+
+logger = logging.getLogger("covid.timing")
+if LOG_RERUNS and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+_totals = {}
+_lock = threading.Lock()
+_profiled = {"done": False}
+_rerun = contextvars.ContextVar("rerun", default=None)
+_call = contextvars.ContextVar("call", default=None)
+
+
+def payload_bytes(value):
+    # In-memory size of what a call returned: DataFrames and arrays without deep inspection of object columns.
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=False).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(payload_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_bytes(item) for item in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 0
+
+
+def record(kind, name, seconds, size=0):
+    with _lock:
+        total = _totals.setdefault((kind, name), {"calls": 0, "seconds": 0.0, "bytes": 0})
+        total["calls"] += 1
+        total["seconds"] += seconds
+        total["bytes"] += size
+    report = _rerun.get()
+    if report is not None:
+        report["calls"].append({"kind": kind, "name": name, "seconds": seconds, "bytes": size})
+
+
+def count_bytes(size):
+    # Reports the payload of the innermost timed call in place of the size of its return value (serialized figures).
+    call = _call.get()
+    if call is not None:
+        call["bytes"] = (call["bytes"] or 0) + size
+
+
+def timed(kind):
+    # Records every call of the function: its elapsed time and payload size, in the process totals and in the
+    # report of the current rerun.
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            call = {"bytes": None}
+            token = _call.set(call)
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                _call.reset(token)
+            size = payload_bytes(result) if call["bytes"] is None else call["bytes"]
+            record(kind, function.__name__, seconds, size)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _start_profile():
+    with _lock:
+        if not PROFILE or _profiled["done"]:
+            return None
+        _profiled["done"] = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _save_profile(profiler, label):
+    # Raw stats for snakeviz/pstats, plus the top functions by cumulative time as text.
+    profiler.disable()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = "rerun-{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_"))
+    path = os.path.join(PROFILE_DIR, name + ".prof")
+    profiler.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(40)
+    with open(os.path.join(PROFILE_DIR, name + ".txt"), "w") as f:
+        f.write(text.getvalue())
+    return path
+
+
+@contextlib.contextmanager
+def rerun(label):
+    # Collects the timed calls of one run of the app script into a report, profiling it when COVID_PROFILE is set
+    # and no rerun of this process has been profiled yet.
+    report = {"label": label, "calls": [], "seconds": 0.0, "profile": None}
+    token = _rerun.set(report)
+    profiler = _start_profile()
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report["seconds"] = time.perf_counter() - start
+        _rerun.reset(token)
+        if profiler is not None:
+            report["profile"] = _save_profile(profiler, label)
+        record("rerun", label, report["seconds"])
+        if LOG_RERUNS:
+            logger.info(log_line(report))
+
+
+def summary(report):
+    # Calls of a rerun grouped by kind and name, slowest first.
+    calls = pd.DataFrame(report["calls"], columns=["kind", "name", "seconds", "bytes"])
+    grouped = calls.groupby(["kind", "name"], sort=False).agg(calls=("seconds", "size"), seconds=("seconds", "sum"),
+                                                             bytes=("bytes", "sum"))
+    return grouped.sort_values("seconds", ascending=False)
+
+
+def log_line(report):
+    kinds = {}
+    for call in report["calls"]:
+        kind = kinds.setdefault(call["kind"], {"calls": 0, "seconds": 0.0, "bytes": 0})
+        kind["calls"] += 1
+        kind["seconds"] += call["seconds"]
+        kind["bytes"] += call["bytes"]
+    parts = ["rerun={!r}".format(report["label"]), "seconds={:.3f}".format(report["seconds"])]
+    for name, kind in kinds.items():
+        parts.append("{}={:.3f}s/{}/{}B".format(name, kind["seconds"], kind["calls"], kind["bytes"]))
+    if report["profile"]:
+        parts.append("profile={}".format(report["profile"]))
+    return " ".join(parts)
+
+
+def metrics_text():
+    # The process totals in the Prometheus text exposition format.
+    with _lock:
+        totals = {key: dict(total) for key, total in _totals.items()}
+    lines = []
+    for field, metric, help_text in METRICS:
+        lines += ["# HELP {} {}".format(metric, help_text), "# TYPE {} counter".format(metric)]
+        for (kind, name), total in sorted(totals.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append('{}{{kind="{}",name="{}"}} {}'.format(metric, kind, label, total[field]))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,117 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import store
+from compaction import compact
+from state_index import build_state_index, state_slice
+
+NAME = "international"
+# Per metric: the wide source dataset and its axis column. Cases and vaccinations are dated; the death series are
+# aligned on the days since each country entered the table (DAY), with calendar dates for China only.
+METRICS = {
+    "cases": {"source": "intl_cases", "axis": "date"},
+    "deaths": {"source": "intl_deaths", "axis": "DAY", "dates": "Date for China", "dated": ["China"]},
+    "vaccinations": {"source": "intl_vaccinations", "axis": "Date"},
+}
+SOURCES = [spec["source"] for spec in METRICS.values()]
+
+
+def source_versions(store_dir=None, data_dir=None):
+    return [store.dataset_version(name, store_dir, data_dir) for name in SOURCES]
+
+
+def melt(wide, metric, calendar):
+    # One row per (country, axis value) of a wide table; dated tables are first reindexed onto `calendar`, the
+    # days shared by every dated metric, so their series line up point for point.
+    spec = METRICS[metric]
+    axis = wide[spec["axis"]]
+    countries = [column for column in wide.columns if column not in (spec["axis"], spec.get("dates"))]
+    if "dates" in spec:
+        days = axis.to_numpy(dtype="int64")
+        dates = np.full((len(countries), len(wide)), np.datetime64("NaT"), dtype="datetime64[ns]")
+        known = np.asarray(wide[spec["dates"]], dtype="datetime64[ns]")
+        dates[[i for i, country in enumerate(countries) if country in spec["dated"]]] = known
+    else:
+        wide = wide[axis.notna()].set_index(spec["axis"]).reindex(calendar)
+        days = (calendar - calendar[0]).days.to_numpy()
+        dates = np.broadcast_to(calendar.to_numpy(dtype="datetime64[ns]"), (len(countries), len(calendar)))
+    values = wide[countries].to_numpy(dtype="float64").T
+    return pd.DataFrame({
+        "metric": metric,
+        "country": np.repeat(countries, values.shape[1]),
+        "date": dates.ravel(),
+        "day": np.tile(days, len(countries)),
+        "value": values.ravel(),
+    })
+
+
+def build(sources):
+    # The long table of every metric and country, missing values dropped, sorted by metric, country and day.
+    dated = [sources[spec["source"]][spec["axis"]] for spec in METRICS.values() if "dates" not in spec]
+    calendar = pd.date_range(min(dates.min() for dates in dated), max(dates.max() for dates in dated), freq="D")
+    data = pd.concat([melt(sources[spec["source"]], metric, calendar) for metric, spec in METRICS.items()],
+                     ignore_index=True)
+    data = data[data["value"].notna()].sort_values(["metric", "country", "day"], kind="stable")
+    data = data.reset_index(drop=True).astype({"metric": "category", "country": "category"})
+    data.attrs["source_versions"] = [sources[name].attrs.get("version") for name in SOURCES]
+    return data
+
+
+def assemble(data):
+    # The loaded bundle: one state_index-style index per metric, so that a country's series is one contiguous slice
+    # found by its bounds, and the countries of every metric.
+    version = "+".join(data.attrs.get("source_versions"))
+    data = compact(NAME, data)
+    frames = {}
+    for metric in METRICS:
+        frame = data[data["metric"] == metric].drop(columns="metric")
+        frame.attrs["version"] = version
+        frames[metric] = build_state_index(frame, group="country", date="day")
+    return {
+        "version": version,
+        "frames": frames,
+        "countries": {metric: sorted(frame["bounds"]) for metric, frame in frames.items()},
+        "dates": (data["date"].min(), data["date"].max()),
+    }
+
+
+def load(store_dir=None, data_dir=None):
+    # The stored long table when it was built from the current wide files, else built now.
+    versions = source_versions(store_dir, data_dir)
+    if os.path.exists(store.store_path(NAME, store_dir)):
+        data = store.load(NAME, store_dir)
+        if list(data.attrs.get("source_versions") or []) == versions:
+            return assemble(data)
+    return assemble(build({name: store.load(name, store_dir, data_dir) for name in SOURCES}))
+
+
+def country_series(international, metric, country, measure="cumulative"):
+    # The series of one country: cumulative values, their clamped daily differences or 7-day averages of those.
+    data = state_slice(international["frames"][metric], country)
+    if measure == "cumulative":
+        return data
+    daily = np.fmax(np.diff(data["value"].to_numpy(dtype="float64"), prepend=np.nan), 0)
+    if measure == "mean7":
+        daily = pd.Series(daily).rolling(7, min_periods=1).mean().to_numpy()
+    return data.assign(value=daily)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Melt the wide international series into one long table")
+    parser.add_argument("--data-dir", default=store.DATA_DIR)
+    parser.add_argument("--store-dir", default=store.STORE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = build({name: store.load(name, args.store_dir, args.data_dir) for name in SOURCES})
+    path = store.write_store(NAME, data, args.store_dir)
+    print("{}: {} rows, {} countries -> {} ({:.2f}s)".format(NAME, len(data), data["country"].nunique(), path,
+                                                            time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+import store
+
+CONFIDENCE = 0.95
+RESAMPLES = int(os.environ.get("COVID_BOOTSTRAP_RESAMPLES", 10000))
+# Cells resampled together: a batch holds BATCH_CELLS x RESAMPLES draws per vaccination status.
+BATCH_CELLS = 64
+SEED = 0
+PER_PEOPLE = 100000
+LOWER, UPPER = "{} lower", "{} upper"
+
+# Per dataset: the (with outcome, population) columns of every vaccination status, then the IR columns (a status)
+# and IRR columns (unvaccinated status, vaccinated status) built from them. Crude rates get exact intervals; the
+# age-adjusted ones, whose age weights are not published, get a parametric bootstrap of the status counts.
+SERIES = {
+    "cdv": {
+        "counts": {
+            "vax": ("Vaccinated with outcome", "Fully vaccinated population"),
+            "unvax": ("Unvaccinated with outcome", "Unvaccinated population"),
+        },
+        "crude": {"Crude vax IR": "vax", "Crude unvax IR": "unvax", "Crude IRR": ("unvax", "vax")},
+        "adjusted": {"Age adjusted vax IR": "vax", "Age adjusted unvax IR": "unvax",
+                     "Age adjusted IRR": ("unvax", "vax")},
+    },
+    "cdv_booster": {
+        "counts": {
+            "booster": ("boosted_with_outcome", "boosted_population"),
+            "primary": ("primary_series_only_with_outcome", "primary_series_only_population"),
+            "unvax": ("unvaccinated_with_outcome", "unvaccinated_population"),
+        },
+        "crude": {"crude_booster_ir": "booster", "crude_primary_series_only_ir": "primary", "crude_unvax_ir": "unvax",
+                  "crude_booster_irr": ("unvax", "booster"), "crude_irr": ("unvax", "primary")},
+        "adjusted": {"age_adj_booster_ir": "booster", "age_adj_vax_ir": "primary", "age_adj_unvax_ir": "unvax",
+                     "age_adj_booster_irr": ("unvax", "booster"), "age_adj_irr": ("unvax", "primary")},
+    },
+}
+
+
+def store_name(name):
+    return name + "_intervals"
+
+
+def poisson_interval(counts, alpha):
+    # Exact (Garwood) interval of a Poisson mean from the observed counts.
+    with np.errstate(invalid="ignore"):
+        lower = np.where(counts > 0, stats.gamma.ppf(alpha / 2, np.maximum(counts, 1)), 0.0)
+        upper = stats.gamma.ppf(1 - alpha / 2, counts + 1)
+    return np.where(np.isnan(counts), np.nan, lower), upper
+
+
+def ratio_interval(numerator, denominator, alpha):
+    # Exact interval of the ratio of two Poisson means: conditional on the total, the numerator count is binomial,
+    # and the Clopper-Pearson interval of its proportion p maps to the ratio p / (1 - p).
+    total = numerator + denominator
+    with np.errstate(invalid="ignore", divide="ignore"):
+        low = np.where(numerator > 0, stats.beta.ppf(alpha / 2, np.maximum(numerator, 1), denominator + 1), 0.0)
+        high = np.where(denominator > 0, stats.beta.ppf(1 - alpha / 2, numerator + 1, np.maximum(denominator, 1)),
+                        1.0)
+        lower, upper = low / (1 - low), high / (1 - high)
+    undefined = np.isnan(total) | (total == 0)
+    return np.where(undefined, np.nan, lower), np.where(undefined, np.nan, upper)
+
+
+def exact_intervals(data, spec, alpha):
+    counts = {status: data[count].to_numpy(dtype="float64") for status, (count, _) in spec["counts"].items()}
+    people = {status: data[population].to_numpy(dtype="float64")
+              for status, (_, population) in spec["counts"].items()}
+    bounds = {}
+    for column, status in spec["crude"].items():
+        if isinstance(status, tuple):
+            lower, upper = ratio_interval(counts[status[0]], counts[status[1]], alpha)
+            scale = people[status[1]] / people[status[0]]
+        else:
+            lower, upper = poisson_interval(counts[status], alpha)
+            scale = PER_PEOPLE / people[status]
+        bounds[column] = (lower * scale, upper * scale)
+    return bounds
+
+
+def percentiles(samples, quantiles):
+    # Nearest-rank quantiles of every row over its non-NaN samples (infinite ratios included), NaN for rows
+    # without any.
+    samples = np.sort(samples, axis=1)
+    present = (~np.isnan(samples)).sum(axis=1)
+    rows = np.arange(len(samples))
+    return [np.where(present > 0, samples[rows, np.rint(q * np.maximum(present - 1, 0)).astype("int64")], np.nan)
+            for q in quantiles]
+
+
+def bootstrap_batch(task):
+    # Percentile intervals of the adjusted IRs and IRRs of one batch of cells: every status count is redrawn from
+    # a Poisson with the observed mean `resamples` times and scales that status's adjusted IR. Cells with no
+    # events in a status get no interval for its IR and IRRs.
+    counts, rates, statuses, alpha, resamples, seed = task
+    rng = np.random.default_rng(seed)
+    scaled = {}
+    for status, observed in counts.items():
+        draws = rng.poisson(np.nan_to_num(observed)[:, None], size=(len(observed), resamples))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scaled[status] = draws / np.where(observed > 0, observed, np.nan)[:, None]
+    bounds = {}
+    for column, status in statuses.items():
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if isinstance(status, tuple):
+                samples = rates[column][:, None] * scaled[status[0]] / scaled[status[1]]
+            else:
+                samples = rates[column][:, None] * scaled[status]
+        bounds[column] = percentiles(samples, [alpha / 2, 1 - alpha / 2])
+    return bounds
+
+
+def bootstrap_tasks(data, spec, statuses, alpha, resamples, seed):
+    # Only cells with an adjusted value are resampled, in batches of BATCH_CELLS with independent seeds, so the
+    # results do not depend on the number of workers.
+    cells = np.flatnonzero(data[list(statuses)].notna().any(axis=1).to_numpy())
+    batches = [cells[start:start + BATCH_CELLS] for start in range(0, len(cells), BATCH_CELLS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    tasks = []
+    for rows, batch_seed in zip(batches, seeds):
+        counts = {status: data[count].to_numpy(dtype="float64")[rows]
+                  for status, (count, _) in spec["counts"].items()}
+        rates = {column: data[column].to_numpy(dtype="float64")[rows] for column in statuses}
+        tasks.append((counts, rates, statuses, alpha, resamples, batch_seed))
+    return batches, tasks
+
+
+def run_tasks(tasks, workers=None):
+    workers = min(workers or os.cpu_count(), max(len(tasks), 1))
+    if workers == 1:
+        return [bootstrap_batch(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(bootstrap_batch, tasks))
+
+
+def confidence_intervals(data, name, confidence=CONFIDENCE, resamples=RESAMPLES, workers=1, seed=SEED):
+    # Lower and upper bounds of every IR and IRR column of `data` (an ingested cdv or cdv_booster dataset), one
+    # row per row of `data`.
+    spec = SERIES[name]
+    alpha = 1 - confidence
+    bounds = exact_intervals(data, spec, alpha)
+    statuses = {column: status for column, status in spec["adjusted"].items() if column in data}
+    batches, tasks = bootstrap_tasks(data, spec, statuses, alpha, resamples, seed)
+    for column in statuses:
+        bounds[column] = (np.full(len(data), np.nan), np.full(len(data), np.nan))
+    for rows, result in zip(batches, run_tasks(tasks, workers)):
+        for column, (lower, upper) in result.items():
+            bounds[column][0][rows], bounds[column][1][rows] = lower, upper
+    intervals = pd.DataFrame({key.format(column): values[i] for column, values in bounds.items()
+                              for i, key in enumerate((LOWER, UPPER))}, index=data.index)
+    intervals.attrs["source_version"] = data.attrs.get("version")
+    return intervals
+
+
+def load(data, name, store_dir=None):
+    # The stored intervals when they were computed from this version of `data`, else computed now in-process.
+    path = store.store_path(store_name(name), store_dir)
+    if os.path.exists(path):
+        intervals = store.load(store_name(name), store_dir)
+        if intervals.attrs.get("source_version") == data.attrs.get("version"):
+            return intervals.set_axis(data.index)
+    return confidence_intervals(data, name)
+
+
+def with_intervals(data, name, store_dir=None):
+    version = data.attrs.get("version")
+    intervals = load(data, name, store_dir)
+    data = pd.concat([data, intervals], axis=1)
+    # The bounds are part of the data: cached figures of intervals computed again must not be reused. Intervals
+    # computed in-process derive from `data` alone, so its version covers them.
+    data.attrs["version"] = "{}+{}".format(version, intervals.attrs.get("version", "computed"))
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confidence intervals of the incidence rates and rate ratios")
+    parser.add_argument("datasets", nargs="*", help="Datasets (default: {})".format(", ".join(SERIES)))
+    parser.add_argument("--store-dir", default=store.STORE_DIR)
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--resamples", type=int, default=RESAMPLES)
+    parser.add_argument("--workers", type=int, help="Bootstrap processes (default: one per CPU)")
+    args = parser.parse_args()
+    unknown = sorted(set(args.datasets) - set(SERIES))
+    if unknown:
+        parser.error("unknown datasets: {}".format(", ".join(unknown)))
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be between 0 and 1")
+
+    for name in args.datasets or SERIES:
+        start = time.perf_counter()
+        data = store.load(name, args.store_dir)
+        intervals = confidence_intervals(data, name, args.confidence, args.resamples, args.workers)
+        path = store.write_store(store_name(name), intervals, args.store_dir)
+        print("{}: {} rows -> {} ({:.2f}s)".format(name, len(intervals), path, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
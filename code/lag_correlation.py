@@ -0,0 +1,151 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from datasets import load_data
+
+MAX_LAG = 90
+# Fewer overlapping days than this leave the correlation at a lag undefined.
+MIN_PAIRS = int(os.environ.get("COVID_LAG_MIN_PAIRS", 30))
+VACCINATIONS = {"daily": "daily_fully_vaccinated", "coverage": "People_Fully_Vaccinated"}
+DEATHS = "daily_deaths"
+ALL_ERAS = "All"
+
+_results = {}
+_results_lock = threading.Lock()
+
+
+def segments(index):
+    # (state, era, start, stop) rows of the state index: each state's whole history, then one block per variant era.
+    variants = pd.Categorical(index["data"]["Variant"])
+    codes = variants.codes
+    rows = []
+    for state, (start, stop) in index["bounds"].items():
+        rows.append((state, ALL_ERAS, start, stop))
+        edges = np.concatenate([[start], np.flatnonzero(np.diff(codes[start:stop])) + start + 1, [stop]])
+        rows += [(state, variants.categories[codes[low]], low, high)
+                 for low, high in zip(edges[:-1], edges[1:]) if codes[low] >= 0]
+    return rows
+
+
+def padded(values, starts, lengths):
+    # One row per segment, left-aligned and NaN-padded to the longest segment.
+    offsets = np.cumsum(lengths) - lengths
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    columns = np.arange(lengths.sum()) - np.repeat(offsets, lengths)
+    matrix = np.full((len(lengths), max(lengths.max(initial=0), 1)), np.nan)
+    matrix[rows, columns] = values[np.repeat(starts, lengths) + columns]
+    return matrix
+
+
+def standardized(matrix):
+    # Zero mean and unit variance over the present values of each row (Pearson correlations do not change, and the
+    # FFT sums below stay well conditioned), with 0 for the missing ones and the mask of the present ones.
+    present = ~np.isnan(matrix)
+    counts = np.maximum(present.sum(axis=1, keepdims=True), 1)
+    centred = np.where(present, matrix - np.where(present, matrix, 0.0).sum(axis=1, keepdims=True) / counts, 0.0)
+    scale = np.sqrt((centred ** 2).sum(axis=1, keepdims=True) / counts)
+    return centred / np.where(scale > 0, scale, 1.0), present.astype("float64")
+
+
+def lagged_correlations(x, y, max_lag=MAX_LAG, min_pairs=MIN_PAIRS):
+    # Pearson correlation of x[t] with y[t + lag] for lags 0..max_lag over the days where both are present, for
+    # every row of the (segments, days) matrices at once. The six lagged sums it needs (pairs, sums, sums of
+    # squares and cross products) are cross-correlations, computed for all lags together with real FFTs padded so
+    # that no lag wraps around.
+    x, mx = standardized(x)
+    y, my = standardized(y)
+    size = 1 << int(np.ceil(np.log2(x.shape[1] + max_lag + 1)))
+    fx = {name: np.conj(np.fft.rfft(a, size, axis=1)) for name, a in [("1", mx), ("x", x), ("xx", x * x)]}
+    fy = {name: np.fft.rfft(a, size, axis=1) for name, a in [("1", my), ("y", y), ("yy", y * y)]}
+
+    def lagged(a, b):
+        return np.fft.irfft(fx[a] * fy[b], size, axis=1)[:, :max_lag + 1]
+
+    pairs = np.rint(lagged("1", "1"))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x, mean_y = lagged("x", "1") / pairs, lagged("1", "y") / pairs
+        var_x = lagged("xx", "1") / pairs - mean_x ** 2
+        var_y = lagged("1", "yy") / pairs - mean_y ** 2
+        r = (lagged("x", "y") / pairs - mean_x * mean_y) / np.sqrt(var_x * var_y)
+    defined = (pairs >= max(min_pairs, 2)) & (var_x > 1e-9) & (var_y > 1e-9)
+    return np.where(defined, np.clip(r, -1.0, 1.0), np.nan)
+
+
+def compute_lag_correlations(index, vaccination="daily", max_lag=MAX_LAG):
+    # Correlation of vaccinations with daily deaths `lag` days later, one row per (state, era), one column per lag.
+    if vaccination not in VACCINATIONS:
+        raise ValueError("unknown vaccination measure {!r}".format(vaccination))
+    rows = segments(index)
+    starts = np.array([row[2] for row in rows], dtype="int64")
+    lengths = np.array([row[3] - row[2] for row in rows], dtype="int64")
+    data = index["data"]
+    x = padded(data[VACCINATIONS[vaccination]].to_numpy(dtype="float64"), starts, lengths)
+    y = padded(data[DEATHS].to_numpy(dtype="float64"), starts, lengths)
+    return pd.DataFrame(lagged_correlations(x, y, max_lag),
+                        index=pd.MultiIndex.from_tuples([row[:2] for row in rows], names=["state", "era"]),
+                        columns=pd.RangeIndex(max_lag + 1, name="lag"))
+
+
+def lag_correlations(index, vaccination="daily", max_lag=MAX_LAG):
+    # The matrix for this version of the covid dataset, computed once per process and measure; entries of older
+    # versions are dropped when a new one is computed. Callers must not mutate it.
+    key = (index["version"], vaccination, max_lag)
+    with _results_lock:
+        if key in _results:
+            return _results[key]
+    matrix = compute_lag_correlations(index, vaccination, max_lag)
+    with _results_lock:
+        for old in [old for old in _results if old[0] != key[0]]:
+            del _results[old]
+        _results[key] = matrix
+    return matrix
+
+
+def strongest_lags(matrix):
+    # The lag of the largest absolute correlation of every row, with its correlation.
+    values = matrix.to_numpy()
+    defined = ~np.isnan(values).all(axis=1)
+    lags = np.argmax(np.where(np.isnan(values), -1.0, np.abs(values)), axis=1)
+    return pd.DataFrame({
+        "lag": np.where(defined, matrix.columns.to_numpy()[lags], -1),
+        "correlation": np.where(defined, values[np.arange(len(values)), lags], np.nan),
+    }, index=matrix.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Correlation of vaccinations with daily deaths 0-90 days later, "
+                                                 "per state and variant era")
+    parser.add_argument("--vaccination", default="daily", choices=list(VACCINATIONS),
+                        help="Daily fully vaccinated people or cumulative coverage")
+    parser.add_argument("--max-lag", type=int, default=MAX_LAG)
+    parser.add_argument("--era", help="Only this variant era ({} for whole histories)".format(ALL_ERAS))
+    parser.add_argument("--output", help="CSV file for the matrix (default: standard output)")
+    args = parser.parse_args()
+    if args.max_lag < 0:
+        parser.error("--max-lag must not be negative")
+
+    start = time.perf_counter()
+    covid = load_data()
+    eras = [ALL_ERAS] + covid["variants"]
+    if args.era is not None and args.era not in eras:
+        parser.error("unknown era {!r} (choose from {})".format(args.era, ", ".join(map(str, eras))))
+    matrix = lag_correlations(covid["index"], args.vaccination, args.max_lag)
+    if args.era is not None:
+        matrix = matrix.xs(args.era, level="era", drop_level=False)
+    if args.output is None:
+        matrix.to_csv(sys.stdout, float_format="%.4f")
+        return
+    matrix.to_csv(args.output, float_format="%.4f")
+    print(strongest_lags(matrix).to_string(float_format="{:.3f}".format))
+    print("{} rows x {} lags -> {} ({:.2f}s)".format(len(matrix), args.max_lag + 1, args.output,
+                                                    time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,435 +1,388 @@
-import numpy as np
-import plotly.graph_objects as go
-import streamlit as st
-from plotly.subplots import make_subplots
-
-
-def plot_daily_deaths(data, start_date, end_date, states):
-    data = data[np.logical_and(data["date"] >= start_date, data["date"] <= end_date)]
-    fig = go.Figure()
-    for state in states:
-        state_data = data[data["Province_State"] == state]
-        x = state_data["date"]
-        y = state_data["daily_deaths"]
-        fig.add_trace(go.Scatter(x=x, y=y, mode='lines+markers', name=state))
-    fig.update_layout(
+import os
+
+from compare import MEASURES, compare_states, comparison_series
+from cube import cube_slice
+from downsample import downsample
+from figure_cache import cached_figure
+from figures import figure
+from incidence import incidence_series
+from international import country_series
+from instrumentation import timed
+from intervals import LOWER, UPPER
+from lag_correlation import lag_correlations
+from state_index import state_slice
+
+# Daily series are drawn with at most one minimum and one maximum per 4 pixels of the expected plot width.
+PLOT_WIDTH = int(os.environ.get("COVID_PLOT_WIDTH", 1200))
+MAX_POINTS = PLOT_WIDTH // 2
+
+MEASURE_TITLES = {"daily": "{}", "mean7": "{} (7-day average)", "mean14": "{} (14-day average)",
+                  "cumulative": "Cumulative {}"}
+
+
+def measure_title(title, measure, population=None):
+    title = MEASURE_TITLES[measure].format(title if measure != "cumulative" else title[len("Daily "):].lower())
+    return title + " per 100k" if population is not None else title
+
+
+def interval(x, data, column, color):
+    # Traces of the shaded 95% confidence band of `column` (from intervals.py), to be drawn under the lines after them.
+    if LOWER.format(column) not in data:
+        return []
+    fill = "rgba({}, {}, {}, 0.2)".format(*(int(color[i:i + 2], 16) for i in (1, 3, 5)))
+    return [dict(x=x, y=data[UPPER.format(column)], mode="lines", line_width=0, showlegend=False, hoverinfo="skip"),
+            dict(x=x, y=data[LOWER.format(column)], mode="lines", line_width=0, fill="tonexty", fillcolor=fill,
+                 showlegend=False, hoverinfo="skip")]
+
+
+def state_traces(comparison):
+    traces = []
+    for state in comparison["states"]:
+        x, y = downsample(*comparison_series(comparison, state), MAX_POINTS)
+        traces.append(dict(x=x, y=y, mode='lines+markers', name=state))
+    return traces
+
+
+@timed("plot")
+@cached_figure
+def plot_daily_deaths(index, start_date, end_date, states, measure="daily", population=None):
+    comparison = compare_states(index, states, "daily_deaths", start_date, end_date, measure, population)
+    return figure(
+        state_traces(comparison),
         title="US States - Daily Deaths",
         xaxis_title="Date",
-        yaxis_title="Daily death count",
-        legend_title="State",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        yaxis_title=measure_title("Daily death count", measure, population),
+        legend=dict(title_text="State", yanchor="top", y=1.3, xanchor="left", x=0.8),
     )
-    fig.update_xaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.8))
-    st.plotly_chart(fig, use_container_width=True)
-
-
-def plot_daily_vaccines(data, start_date, end_date, states):
-    data = data[np.logical_and(data["date"] >= start_date, data["date"] <= end_date)]
-    fig = go.Figure()
-    for state in states:
-        state_data = data[data["Province_State"] == state]
-        x = state_data["date"]
-        y = state_data["daily_fully_vaccinated"]
-        fig.add_trace(go.Scatter(x=x, y=y, mode='lines+markers', name=state))
-    fig.update_layout(
+
+
+@timed("plot")
+@cached_figure
+def plot_daily_vaccines(index, start_date, end_date, states, measure="daily", population=None):
+    comparison = compare_states(index, states, "daily_fully_vaccinated", start_date, end_date, measure, population)
+    return figure(
+        state_traces(comparison),
         title="US States - Daily Vaccines",
         xaxis_title="Date",
-        yaxis_title="Daily fully vaccinated count",
-        legend_title="State",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        yaxis_title=measure_title("Daily fully vaccinated count", measure, population),
+        legend=dict(title_text="State", yanchor="top", y=1.3, xanchor="left", x=0.8),
     )
-    fig.update_xaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.8))
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_daily_deaths_vaccines(data, start_date, end_date, state):
-    data = data[np.logical_and(data["date"] >= start_date, data["date"] <= end_date)]
-    state_data = data[data["Province_State"] == state]
+@timed("plot")
+@cached_figure
+def plot_daily_deaths_vaccines(index, start_date, end_date, state, measure="daily"):
+    state_data = state_slice(index, state, start_date, end_date)
     x = state_data["date"]
-    y1 = state_data["daily_deaths"]
-    y2 = state_data["daily_fully_vaccinated"]
+    y1 = state_data[MEASURES[measure].format("daily_deaths")]
+    y2 = state_data[MEASURES[measure].format("daily_fully_vaccinated")]
 
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', name="Deaths"), secondary_y=False)
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', name="Fully Vaccinated"), secondary_y=True)
-    fig.update_layout(
+    return figure(
+        [dict(x=x, y=y1, mode='lines+markers', name="Deaths"),
+         dict(x=x, y=y2, mode='lines+markers', name="Fully Vaccinated", secondary_y=True)],
+        secondary=measure_title("Daily fully vaccinated count", measure),
         title="US States - Daily Deaths and Vaccines",
         xaxis_title="Date",
-        legend_title=state,
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        yaxis_title=measure_title("Daily death count", measure),
+        legend=dict(title_text=state, yanchor="top", y=1.3, xanchor="left", x=0.8),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.8))
-    fig.update_xaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10, col=1)
-    fig.update_yaxes(title_text="Daily death count", secondary_y=False)
-    fig.update_yaxes(title_text="Daily fully vaccinated count", secondary_y=True)
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_overall_deaths_vaccines(data, start_date, end_date, state):
-    data = data[np.logical_and(data["date"] >= start_date, data["date"] <= end_date)]
-    state_data = data[data["Province_State"] == state]
-    x = state_data["date"]
-    y1 = state_data["Deaths"]
-    y2 = state_data["People_Fully_Vaccinated"]
+@timed("plot")
+@cached_figure
+def plot_overall_deaths_vaccines(index, start_date, end_date, state):
+    state_data = state_slice(index, state, start_date, end_date)
+    x1, y1 = downsample(state_data["date"], state_data["Deaths"], MAX_POINTS)
+    x2, y2 = downsample(state_data["date"], state_data["People_Fully_Vaccinated"], MAX_POINTS)
 
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', name="Deaths"), secondary_y=False)
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', name="Fully Vaccinated"), secondary_y=True)
-    fig.update_layout(
+    return figure(
+        [dict(x=x1, y=y1, mode='lines+markers', name="Deaths"),
+         dict(x=x2, y=y2, mode='lines+markers', name="Fully Vaccinated", secondary_y=True)],
+        secondary="Overall fully vaccinated count",
         title="US States - Overall Deaths and Vaccines",
         xaxis_title="Date",
-        legend_title=state,
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        yaxis_title="Overall death count",
+        legend=dict(title_text=state, yanchor="top", y=1.3, xanchor="left", x=0.8),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.8))
-    fig.update_xaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10, col=1)
-    fig.update_yaxes(title_text="Overall death count", secondary_y=False)
-    fig.update_yaxes(title_text="Overall fully vaccinated count", secondary_y=True)
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_variant_daily_deaths_vaccines(data, state, variant):
-    state_data = data[np.logical_and(data["Province_State"] == state, data["Variant"] == variant)]
+@timed("plot")
+@cached_figure
+def plot_variant_daily_deaths_vaccines(index, state, variant, measure="daily"):
+    state_data = state_slice(index, state)
+    state_data = state_data[state_data["Variant"] == variant]
     x = state_data["date"]
-    y1 = state_data["daily_deaths"]
-    y2 = state_data["daily_fully_vaccinated"]
+    y1 = state_data[MEASURES[measure].format("daily_deaths")]
+    y2 = state_data[MEASURES[measure].format("daily_fully_vaccinated")]
 
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', name="Deaths"), secondary_y=False)
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', name="Fully Vaccinated"), secondary_y=True)
-    fig.update_layout(
+    return figure(
+        [dict(x=x, y=y1, mode='lines+markers', name="Deaths"),
+         dict(x=x, y=y2, mode='lines+markers', name="Fully Vaccinated", secondary_y=True)],
+        secondary=measure_title("Daily fully vaccinated count", measure),
         title="US States - Variant Analysis",
         xaxis_title="Date",
-        legend_title=state,
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        yaxis_title=measure_title("Daily death count", measure),
+        legend=dict(title_text=state, yanchor="top", y=1.3, xanchor="left", x=0.8),
+    )
+
+
+@timed("plot")
+@cached_figure
+def plot_lag_correlations(index, vaccination, era):
+    matrix = lag_correlations(index, vaccination).xs(era, level="era")
+    # A heatmap has no tick marks: the template's are turned off.
+    return figure(
+        [dict(type="heatmap", x=matrix.columns, y=matrix.index, z=matrix.to_numpy(), zmin=-1, zmax=1,
+              colorscale="RdBu", colorbar=dict(title="r"))],
+        title="US States - Correlation of {} with daily deaths ({})".format(
+            "daily fully vaccinated" if vaccination == "daily" else "vaccination coverage", era),
+        xaxis=dict(title_text="Lag (days after vaccination)", ticks=""),
+        yaxis=dict(title_text="State", ticks="", autorange="reversed"),
+        height=max(400, 18 * len(matrix)),
+    )
+
+
+@timed("plot")
+@cached_figure
+def plot_drilldown(cube, node, frequency, measure, start_date, end_date):
+    data = cube_slice(cube, node, frequency, start_date, end_date)
+    column = "Deaths" if measure == "cumulative" else "daily_deaths"
+    x, y = downsample(data["date"], data[column], MAX_POINTS)
+    level, name = cube["nodes"].at[node, "level"], cube["nodes"].at[node, "name"]
+
+    return figure(
+        [dict(x=x, y=y, mode='lines+markers', name=name)],
+        title="US {} - {} {} deaths".format(level.capitalize(), "Weekly" if frequency == "week" else "Daily",
+                                             "cumulative" if measure == "cumulative" else "new"),
+        xaxis_title="Week ending" if frequency == "week" else "Date",
+        yaxis_title="Cumulative death count" if measure == "cumulative" else "Death count",
+        legend_title=node,
+        showlegend=True,
+    )
+
+
+# Per international metric: the axis of its series, the axis title, and the titles of its daily and cumulative values.
+INTERNATIONAL_AXES = {
+    "cases": ("date", "Date", "Daily cases", "Cumulative cases"),
+    "deaths": ("day", "Days since the country entered the table", "Daily deaths", "Cumulative deaths"),
+    "vaccinations": ("date", "Date", "Daily people fully vaccinated (%)", "People fully vaccinated (%)"),
+}
+
+
+@timed("plot")
+@cached_figure
+def plot_international(international, metric, countries, measure):
+    axis, axis_title, daily_title, cumulative_title = INTERNATIONAL_AXES[metric]
+    title = cumulative_title if measure == "cumulative" else measure_title(daily_title, measure)
+    traces = []
+    for country in countries:
+        data = country_series(international, metric, country, measure)
+        x, y = downsample(data[axis], data["value"], MAX_POINTS)
+        traces.append(dict(x=x, y=y, mode='lines', name=country))
+    return figure(
+        traces,
+        title="Countries - " + title,
+        xaxis_title=axis_title,
+        yaxis_title=title,
+        legend_title="Country",
+        showlegend=True,
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.8))
-    fig.update_xaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10, col=1)
-    fig.update_yaxes(title_text="Daily death count", secondary_y=False)
-    fig.update_yaxes(title_text="Daily fully vaccinated count", secondary_y=True)
-    st.plotly_chart(fig, use_container_width=True)
 
 
+@timed("plot")
+@cached_figure
 def plot_adult_hospitalizations_vaccinations(data):
     x = data["Week ending"]
     y1 = data["Rate in unvaccinated"]
     y2 = data["Rate in fully vaccinated"]
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', name='Rate in unvaccinated people'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', name='Rate in fully vaccinated people'))
-    fig.update_layout(
+    return figure(
+        [dict(x=x, y=y1, mode='lines+markers', name='Rate in unvaccinated people'),
+         dict(x=x, y=y2, mode='lines+markers', name='Rate in fully vaccinated people')],
         title="Age-Adjusted Rates of COVID-19-Associated Hospitalizations by Vaccination Status in Adults Ages ≥18 Years",
         title_y=0.95,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Rate per 100000 populations",
+        legend=dict(yanchor="top", y=1.23, xanchor="left", x=0.7),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.23, xanchor="left", x=0.7))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Rate per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
+@timed("plot")
+@cached_figure
 def plot_age_group_hospitalizations_vaccinations(data, age_group):
     data = data[data["Age group"] == age_group]
     x = data["Week ending"]
     y1 = data["Rate in unvaccinated"]
     y2 = data["Rate in fully vaccinated"]
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', name='Rate in unvaccinated people'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', name='Rate in fully vaccinated people'))
-    fig.update_layout(
+    return figure(
+        [dict(x=x, y=y1, mode='lines+markers', name='Rate in unvaccinated people'),
+         dict(x=x, y=y2, mode='lines+markers', name='Rate in fully vaccinated people')],
         title="Rates of COVID-19-Associated Hospitalizations by Vaccination Status for Age group: {}".format(age_group),
         title_y=0.95,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Rate per 100000 populations",
+        legend=dict(yanchor="top", y=1.23, xanchor="left", x=0.7),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.23, xanchor="left", x=0.7))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Rate per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
+@timed("plot")
+@cached_figure
 def plot_booster_adult_hospitalizations_vaccinations(data):
     x = data["Week ending"]
     y1 = data["Rate in unvaccinated"]
     y2 = data["Rate in fully vaccinated without additional or booster"]
     y3 = data["Rate in fully vaccinated with additional or booster"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Rate in unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
-                             name='Rate in fully vaccinated without additional or booster'))
-    fig.add_trace(go.Scatter(x=x, y=y3, mode='lines+markers', line_color='#00CC96',
-                             name='Rate in fully vaccinated with additional or booster'))
-
-    fig.update_layout(
+    return figure(
+        [dict(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Rate in unvaccinated'),
+         dict(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
+              name='Rate in fully vaccinated without additional or booster'),
+         dict(x=x, y=y3, mode='lines+markers', line_color='#00CC96',
+              name='Rate in fully vaccinated with additional or booster')],
         title="Age-Adjusted Rates of COVID-19-Associated Hospitalizations by Vaccination Status in Adults Ages ≥18 Years",
         title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Rate per 100000 populations",
+        legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.52),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.52))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Rate per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
+@timed("plot")
+@cached_figure
 def plot_booster_age_group_hospitalizations_vaccinations(data, age_group):
     data = data[data["Age group"] == age_group]
     x = data["Week ending"]
     y1 = data["Rate in unvaccinated"]
     y2 = data["Rate in fully vaccinated without additional or booster"]
     y3 = data["Rate in fully vaccinated with additional or booster"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Rate in unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
-                             name='Rate in fully vaccinated without additional or booster'))
-    fig.add_trace(go.Scatter(x=x, y=y3, mode='lines+markers', line_color='#00CC96',
-                             name='Rate in fully vaccinated with additional or booster'))
-
-    fig.update_layout(
+    return figure(
+        [dict(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Rate in unvaccinated'),
+         dict(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
+              name='Rate in fully vaccinated without additional or booster'),
+         dict(x=x, y=y3, mode='lines+markers', line_color='#00CC96',
+              name='Rate in fully vaccinated with additional or booster')],
         title="Rates of COVID-19-Associated Hospitalizations by Vaccination Status for Age group: {}".format(age_group),
         title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Rate per 100000 populations",
+        legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.52),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.52))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Rate per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_overall_cases_vaccinations(data, title_choice):
+@timed("plot")
+@cached_figure
+def plot_overall_cases_vaccinations(incidence, title_choice):
     choice = "case" if title_choice == "Cases" else "death"
-    data = data[np.logical_and(data["outcome"] == choice,
-                               np.logical_and(data["Age group"] == "all_ages_adj",
-                                              data["Vaccine product"] == "all_types"))]
-    x = data["date"]
+    data = incidence_series(incidence, choice, "all_ages_adj", "all_types")
+    x = data.index
     y1 = data["Age adjusted unvax IR"]
     y2 = data["Age adjusted vax IR"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
-                             name='Vaccinated with atleast a primary series'))
-
-    fig.update_layout(
+    return figure(
+        [*interval(x, data, "Age adjusted unvax IR", '#EF553B'),
+         *interval(x, data, "Age adjusted vax IR", '#636EFA'),
+         dict(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Unvaccinated'),
+         dict(x=x, y=y2, mode='lines+markers', line_color='#636EFA', name='Vaccinated with atleast a primary series')],
         title="Rates of COVID-19 {} by Vaccination Status".format(title_choice),
         title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Incidence per 100000 populations",
+        legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Incidence per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_age_group_cases_vaccinations(data, title_choice, age_group):
+@timed("plot")
+@cached_figure
+def plot_age_group_cases_vaccinations(incidence, title_choice, age_group):
     choice = "case" if title_choice == "Cases" else "death"
-    data = data[np.logical_and(data["outcome"] == choice,
-                               np.logical_and(data["Age group"] == age_group, data["Vaccine product"] == "all_types"))]
-    x = data["date"]
+    data = incidence_series(incidence, choice, age_group, "all_types")
+    x = data.index
     y1 = data["Crude unvax IR"]
     y2 = data["Crude vax IR"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
-                             name='Vaccinated with a primary series'))
-
-    fig.update_layout(
+    return figure(
+        [*interval(x, data, "Crude unvax IR", '#EF553B'),
+         *interval(x, data, "Crude vax IR", '#636EFA'),
+         dict(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Unvaccinated'),
+         dict(x=x, y=y2, mode='lines+markers', line_color='#636EFA', name='Vaccinated with a primary series')],
         title="Rates of COVID-19 {} by Vaccination Status for Age Group: {}".format(title_choice, age_group),
         title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Incidence per 100000 populations",
+        legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Incidence per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_vaccine_cases_vaccinations(data, title_choice):
+@timed("plot")
+@cached_figure
+def plot_vaccine_cases_vaccinations(incidence, title_choice):
     choice = "case" if title_choice == "Cases" else "death"
-    data = data[np.logical_and(data["outcome"] == choice, data["Age group"] == "all_ages_adj")]
-    x = data["date"].unique().tolist()
-    y1 = data[data["Vaccine product"] == "all_types"]["Age adjusted unvax IR"]
-    y2 = data[data["Vaccine product"] == "Janssen"]["Age adjusted vax IR"]
-    y3 = data[data["Vaccine product"] == "Moderna"]["Age adjusted vax IR"]
-    y4 = data[data["Vaccine product"] == "Pfizer"]["Age adjusted vax IR"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#000000', name='Unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#EF553B', name='Janssen'))
-    fig.add_trace(go.Scatter(x=x, y=y3, mode='lines+markers', line_color='#636EFA', name='Moderna'))
-    fig.add_trace(go.Scatter(x=x, y=y4, mode='lines+markers', line_color='#00CC96', name='Pfizer'))
-
-    fig.update_layout(
+    x = incidence["dates"]
+    unvax = incidence_series(incidence, choice, "all_ages_adj", "all_types")
+    janssen = incidence_series(incidence, choice, "all_ages_adj", "Janssen")
+    moderna = incidence_series(incidence, choice, "all_ages_adj", "Moderna")
+    pfizer = incidence_series(incidence, choice, "all_ages_adj", "Pfizer")
+    y1 = unvax["Age adjusted unvax IR"]
+    y2 = janssen["Age adjusted vax IR"]
+    y3 = moderna["Age adjusted vax IR"]
+    y4 = pfizer["Age adjusted vax IR"]
+    return figure(
+        [*interval(x, unvax, "Age adjusted unvax IR", '#000000'),
+         *interval(x, janssen, "Age adjusted vax IR", '#EF553B'),
+         *interval(x, moderna, "Age adjusted vax IR", '#636EFA'),
+         *interval(x, pfizer, "Age adjusted vax IR", '#00CC96'),
+         dict(x=x, y=y1, mode='lines+markers', line_color='#000000', name='Unvaccinated'),
+         dict(x=x, y=y2, mode='lines+markers', line_color='#EF553B', name='Janssen'),
+         dict(x=x, y=y3, mode='lines+markers', line_color='#636EFA', name='Moderna'),
+         dict(x=x, y=y4, mode='lines+markers', line_color='#00CC96', name='Pfizer')],
         title="Rates of COVID-19 {} by Vaccination Status for all vaccine types".format(title_choice),
         title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Incidence per 100000 populations",
+        legend=dict(yanchor="top", y=1.34, xanchor="left", x=0.84),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.34, xanchor="left", x=0.84))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Incidence per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_overall_cases_vaccinations_booster(data, title_choice):
-    choice = "case" if title_choice == "Cases" else "death"
-    data = data[np.logical_and(data["outcome"] == choice,
-                               np.logical_and(data["age_group"] == "all_ages", data["vaccine_product"] == "all_types"))]
-    x = data["date"]
-    y1 = data["age_adj_unvax_ir"]
-    y2 = data["age_adj_vax_ir"]
-    y3 = data["age_adj_booster_ir"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
-                             name='Vaccinated with a primary series only'))
-    fig.add_trace(go.Scatter(x=x, y=y3, mode='lines+markers', line_color='#00CC96',
-                             name='Vaccinated with a primary series and booster dose'))
-
-    fig.update_layout(
-        title="Rates of COVID-19 {} by Vaccination Status and Booster Dose".format(title_choice),
+def booster_figure(data, columns, title):
+    # Unvaccinated, primary series only and boosted rates of a booster incidence series, with their intervals.
+    x = data.index
+    colors = ['#EF553B', '#636EFA', '#00CC96']
+    names = ['Unvaccinated', 'Vaccinated with a primary series only',
+             'Vaccinated with a primary series and booster dose']
+    return figure(
+        [*[trace for column, color in zip(columns, colors) for trace in interval(x, data, column, color)],
+         *[dict(x=x, y=data[column], mode='lines+markers', line_color=color, name=name)
+           for column, color, name in zip(columns, colors, names)]],
+        title=title,
         title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
+        xaxis_title="Date (Weekly)",
+        yaxis_title="Incidence per 100000 populations",
+        legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55),
     )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Incidence per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_age_group_cases_vaccinations_booster(data, title_choice, age_group):
+@timed("plot")
+@cached_figure
+def plot_overall_cases_vaccinations_booster(incidence, title_choice):
     choice = "case" if title_choice == "Cases" else "death"
-    data = data[np.logical_and(data["outcome"] == choice,
-                               np.logical_and(data["age_group"] == age_group, data["vaccine_product"] == "all_types"))]
-    x = data["date"]
-    y1 = data["crude_unvax_ir"]
-    y2 = data["crude_primary_series_only_ir"]
-    y3 = data["crude_booster_ir"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
-                             name='Vaccinated with a primary series only'))
-    fig.add_trace(go.Scatter(x=x, y=y3, mode='lines+markers', line_color='#00CC96',
-                             name='Vaccinated with a primary series and booster dose'))
-
-    fig.update_layout(
-        title="Rates of COVID-19 {} by Vaccination Status and Booster Dose for Age Group: {}".format(title_choice,
-                                                                                                     age_group),
-        title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
-    )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Incidence per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
+    data = incidence_series(incidence, choice, "all_ages", "all_types")
+    return booster_figure(data, ["age_adj_unvax_ir", "age_adj_vax_ir", "age_adj_booster_ir"],
+                          "Rates of COVID-19 {} by Vaccination Status and Booster Dose".format(title_choice))
 
 
-def plot_vaccine_cases_vaccinations_booster(data, title_choice, vaccine):
+@timed("plot")
+@cached_figure
+def plot_age_group_cases_vaccinations_booster(incidence, title_choice, age_group):
     choice = "case" if title_choice == "Cases" else "death"
-    data = data[np.logical_and(data["outcome"] == choice,
-                               np.logical_and(data["age_group"] == "all_ages", data["vaccine_product"] == vaccine))]
-    x = data["date"]
-    y1 = data["age_adj_unvax_ir"]
-    y2 = data["age_adj_vax_ir"]
-    y3 = data["age_adj_booster_ir"]
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y1, mode='lines+markers', line_color='#EF553B', name='Unvaccinated'))
-    fig.add_trace(go.Scatter(x=x, y=y2, mode='lines+markers', line_color='#636EFA',
-                             name='Vaccinated with a primary series only'))
-    fig.add_trace(go.Scatter(x=x, y=y3, mode='lines+markers', line_color='#00CC96',
-                             name='Vaccinated with a primary series and booster dose'))
-
-    fig.update_layout(
-        title="Rates of COVID-19 {} by Vaccination Status and Booster Dose for Vaccine: {}".format(title_choice,
-                                                                                                   vaccine),
-        title_y=1,
-        xaxis_title="Date",
-        font=dict(
-            family="Courier New, monospace",
-            size=12,
-            color="Black"
-        )
-    )
-    fig.update_layout(legend=dict(yanchor="top", y=1.3, xanchor="left", x=0.55))
-    fig.update_xaxes(title_text="Date (Weekly)", ticks="outside", tickwidth=2, tickcolor='crimson', ticklen=10)
-    fig.update_yaxes(title_text="Incidence per 100000 populations", ticks="outside", tickwidth=2, tickcolor='crimson',
-                     ticklen=10)
-    st.plotly_chart(fig, use_container_width=True)
+    data = incidence_series(incidence, choice, age_group, "all_types")
+    return booster_figure(data, ["crude_unvax_ir", "crude_primary_series_only_ir", "crude_booster_ir"],
+                          "Rates of COVID-19 {} by Vaccination Status and Booster Dose for Age Group: {}".format(
+                              title_choice, age_group))
+
+
+@timed("plot")
+@cached_figure
+def plot_vaccine_cases_vaccinations_booster(incidence, title_choice, vaccine):
+    choice = "case" if title_choice == "Cases" else "death"
+    data = incidence_series(incidence, choice, "all_ages", vaccine)
+    return booster_figure(data, ["age_adj_unvax_ir", "age_adj_vax_ir", "age_adj_booster_ir"],
+                          "Rates of COVID-19 {} by Vaccination Status and Booster Dose for Vaccine: {}".format(
+                              title_choice, vaccine))
@@ -0,0 +1,259 @@
+import argparse
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import lag_correlation
+import plots
+import store
+from cube import NATION
+from datasets import DATASET_LOADERS
+from figure_cache import key_part
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.environ.get("COVID_RENDER_DIR", os.path.join(store.ROOT_DIR, "snapshots"))
+MANIFEST_FILE = "manifest.json"
+FORMATS = ["html", "json"]
+
+_bundles = {}
+
+
+def load_bundles(names):
+    return {name: DATASET_LOADERS[name]() for name in names}
+
+
+def resolve(bundles, path):
+    # A path such as ("cases_deaths", "incidence", 0) names one dataset inside a loaded bundle.
+    value = bundles[path[0]]
+    for part in path[1:]:
+        value = value[part]
+    return value
+
+
+def state_views(covid):
+    data = covid["data"]
+    dates = (data["date"].iloc[0], data["date"].iloc[-1])
+    for state in covid["states"]:
+        yield "plot_daily_deaths", [("covid", "index")], [*dates, [state]]
+        yield "plot_daily_vaccines", [("covid", "index")], [*dates, [state]]
+        yield "plot_daily_deaths_vaccines", [("covid", "index")], [*dates, state]
+        yield "plot_overall_deaths_vaccines", [("covid", "index")], [*dates, state]
+        for variant in covid["variants"]:
+            yield "plot_variant_daily_deaths_vaccines", [("covid", "index")], [state, variant]
+    for vaccination in lag_correlation.VACCINATIONS:
+        for era in [lag_correlation.ALL_ERAS] + covid["variants"]:
+            yield "plot_lag_correlations", [("covid", "index")], [vaccination, era]
+
+
+def hospitalization_views(hosp_vac):
+    yield "plot_adult_hospitalizations_vaccinations", [("hospitalizations", "data", 0)], []
+    yield "plot_booster_adult_hospitalizations_vaccinations", [("hospitalizations", "data", 2)], []
+    for age_group in hosp_vac["age_groups"]:
+        yield "plot_age_group_hospitalizations_vaccinations", [("hospitalizations", "data", 1)], [age_group]
+        yield "plot_booster_age_group_hospitalizations_vaccinations", [("hospitalizations", "data", 3)], [age_group]
+
+
+def incidence_views(cas_dth_vac):
+    cdv = [("cases_deaths", "incidence", 0)]
+    cdvb = [("cases_deaths", "incidence", 1)]
+    for choice in ["Cases", "Deaths"]:
+        yield "plot_overall_cases_vaccinations", cdv, [choice]
+        yield "plot_vaccine_cases_vaccinations", cdv, [choice]
+        yield "plot_overall_cases_vaccinations_booster", cdvb, [choice]
+        for age_group in cas_dth_vac["age_groups_cdv"]:
+            yield "plot_age_group_cases_vaccinations", cdv, [choice, age_group]
+        for age_group in cas_dth_vac["age_groups_cdvb"]:
+            yield "plot_age_group_cases_vaccinations_booster", cdvb, [choice, age_group]
+        for vaccine in cas_dth_vac["vaccine_types"]:
+            yield "plot_vaccine_cases_vaccinations_booster", cdvb, [choice, vaccine]
+
+
+def county_views(cube):
+    # The nation and every state, at both frequencies, over the whole date range.
+    for frequency, frame in cube["frames"].items():
+        dates = (frame["data"]["date"].iloc[0], frame["data"]["date"].iloc[-1])
+        for node in [NATION] + cube["children"][NATION]:
+            yield "plot_drilldown", [("counties",)], [node, frequency, "daily", *dates]
+
+
+def international_views(international):
+    # Every metric with all of its countries, as daily values and cumulative ones.
+    for metric, countries in international["countries"].items():
+        for measure in ["daily", "cumulative"]:
+            yield "plot_international", [("international",)], [metric, countries, measure]
+
+
+VIEWS = {
+    "covid": state_views,
+    "hospitalizations": hospitalization_views,
+    "cases_deaths": incidence_views,
+    "counties": county_views,
+    "international": international_views,
+}
+
+
+def local_modules(module, found=None):
+    # The modules of this directory that `module` imports, directly or through one another.
+    found = {} if found is None else found
+    found[module.__name__] = module
+    for value in vars(module).values():
+        imported = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+        path = getattr(imported, "__file__", None)
+        if imported is not None and imported.__name__ not in found and path \
+                and os.path.dirname(os.path.abspath(path)) == CODE_DIR:
+            local_modules(imported, found)
+    return found
+
+
+def code_version():
+    # Hash of the source of this script and every module it uses to load the datasets and build the figures: a
+    # change to any of them renders every view again, while touching a file without changing it does not.
+    digest = hashlib.sha256()
+    for module in sorted(local_modules(sys.modules[__name__]).values(), key=lambda module: module.__name__):
+        with open(module.__file__, "rb") as f:
+            digest.update(os.path.basename(module.__file__).encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def view_name(plot, params):
+    # Dates are left out of the name: every snapshot covers the whole date range.
+    parts = [str(item) for param in params if not isinstance(param, datetime.date)
+             for item in (param if isinstance(param, list) else [param])]
+    return plot + "/" + (re.sub(r"[^A-Za-z0-9._-]+", "_", "-".join(parts)) or "all")
+
+
+def iter_views(bundles, code_version):
+    # Every (plot, parameters) combination the dashboard can show, with a key that changes whenever one of its
+    # datasets, its parameters or the code does.
+    for name, bundle in bundles.items():
+        for plot, sources, params in VIEWS[name](bundle):
+            args = [resolve(bundles, path) for path in sources] + params
+            key = repr((code_version, key_part(args)))
+            yield {
+                "name": view_name(plot, params),
+                "plot": plot,
+                "sources": sources,
+                "params": params,
+                "key": hashlib.sha256(key.encode()).hexdigest(),
+            }
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def output_paths(output_dir, view, formats):
+    return [os.path.join(output_dir, "{}.{}".format(view["name"], fmt)) for fmt in formats]
+
+
+def _init_worker(names):
+    # Forked workers find the parent's datasets already in the data cache; spawned ones load them once here.
+    _bundles.update(load_bundles(names))
+
+
+def render_view(view, output_dir, formats):
+    build = inspect.unwrap(getattr(plots, view["plot"]))
+    fig = build(*[resolve(_bundles, path) for path in view["sources"]], *view["params"])
+    for path, fmt in zip(output_paths(output_dir, view, formats), formats):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == "html":
+            fig.write_html(path + ".tmp", include_plotlyjs="cdn")
+        else:
+            with open(path + ".tmp", "w") as f:
+                f.write(fig.to_json())
+        os.replace(path + ".tmp", path)
+    return view["name"], view["key"]
+
+
+def _render_view(args):
+    return render_view(*args)
+
+
+def render_views(views, names, output_dir, formats, workers=None):
+    workers = min(workers or os.cpu_count(), max(len(views), 1))
+    tasks = [(view, output_dir, formats) for view in views]
+    if workers == 1:
+        _init_worker(names)
+        return [_render_view(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(names,)) as executor:
+        return list(executor.map(_render_view, tasks, chunksize=max(len(tasks) // (workers * 4), 1)))
+
+
+def render(names=None, output_dir=None, formats=None, workers=None, force=False, plot_names=None):
+    output_dir = output_dir or OUTPUT_DIR
+    formats = formats or FORMATS
+    names = names or list(DATASET_LOADERS)
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    bundles = load_bundles(names)
+    manifest = {} if force else load_manifest(output_dir)
+    views = [view for view in iter_views(bundles, code_version())
+             if not plot_names or view["plot"] in plot_names]
+    pending = [view for view in views
+               if manifest.get(view["name"]) != view["key"]
+               or not all(os.path.exists(path) for path in output_paths(output_dir, view, formats))]
+
+    render_start = time.perf_counter()
+    workers = min(workers or os.cpu_count(), max(len(pending), 1))
+    if pending:
+        manifest.update(render_views(pending, names, output_dir, formats, workers))
+        save_manifest(manifest, output_dir)
+
+    seconds = time.perf_counter() - start
+    render_seconds = time.perf_counter() - render_start
+    return {
+        "views": len(views),
+        "rendered": len(pending),
+        "skipped": len(views) - len(pending),
+        "workers": workers if pending else 0,
+        "seconds": seconds,
+        "figures_per_sec": len(pending) / render_seconds if pending else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every dashboard view to static HTML/JSON files")
+    parser.add_argument("datasets", nargs="*", help="Datasets whose views to render (default: all)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--plots", nargs="+", help="Only render these plot functions")
+    parser.add_argument("--workers", type=int, nargs="+", default=[None],
+                        help="Renderer processes (default: CPU count); several counts render once per count")
+    parser.add_argument("--force", action="store_true", help="Render views whose inputs have not changed too")
+
+    args = parser.parse_args()
+    unknown = sorted(set(args.datasets) - set(DATASET_LOADERS))
+    if unknown:
+        parser.error("unknown datasets: {}".format(", ".join(unknown)))
+    unknown = sorted(set(args.plots or []) - {name for name in dir(plots) if name.startswith("plot_")})
+    if unknown:
+        parser.error("unknown plots: {}".format(", ".join(unknown)))
+
+    for i, workers in enumerate(args.workers):
+        # Timing several worker counts only makes sense if each one renders the whole grid.
+        stats = render(args.datasets or None, args.output_dir, args.formats, workers, args.force or i > 0, args.plots)
+        print("{} views: {} rendered, {} unchanged in {:.2f}s with {} workers ({:.1f} figures/s)".format(
+            stats["views"], stats["rendered"], stats["skipped"], stats["seconds"], stats["workers"],
+            stats["figures_per_sec"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv
+
+HOSPITALIZATION_RATES = ["Rate in unvaccinated", "Rate in fully vaccinated"]
+BOOSTER_HOSPITALIZATION_RATES = ["Rate in fully vaccinated with additional or booster",
+                                 "Rate in fully vaccinated without additional or booster", "Rate in unvaccinated"]
+CDV_NUMBERS = ["Vaccinated with outcome", "Fully vaccinated population", "Unvaccinated with outcome",
+               "Unvaccinated population", "Crude vax IR", "Crude unvax IR", "Crude IRR", "Age adjusted vax IR",
+               "Age adjusted unvax IR", "Age adjusted IRR"]
+CDVB_NUMBERS = ["boosted_with_outcome", "boosted_population", "primary_series_only_with_outcome",
+                "primary_series_only_population", "unvaccinated_with_outcome", "unvaccinated_population",
+                "crude_booster_ir", "crude_primary_series_only_ir", "crude_unvax_ir", "crude_booster_irr", "crude_irr",
+                "age_adj_booster_ir", "age_adj_vax_ir", "age_adj_unvax_ir", "age_adj_booster_irr", "age_adj_irr"]
+# Excel turned the 12-17 and 5-11 age groups of the published files into dates.
+AGE_GROUP_FIXES = {"Dec-17": "12-17", "05-Nov": "05-11"}
+
+# Per CDC source file: the title lines above its header, every column in file order with its type ("str",
+# "category", "float64", "int64" or "date"), the published format of its dates, the fixes of mangled labels and
+# the label of the all-ages rows, which are not an age group of their own.
+SCHEMAS = {
+    "hosp_adults": {
+        "preamble": 2,
+        "columns": {"Week ending": "date", **dict.fromkeys(HOSPITALIZATION_RATES, "float64")},
+        "dates": {"Week ending": "%Y-%m-%d"},
+    },
+    "hosp_age_group": {
+        "preamble": 2,
+        "columns": {"Week ending": "date", "Age group": "category",
+                    **dict.fromkeys(HOSPITALIZATION_RATES, "float64")},
+        "dates": {"Week ending": "%Y-%m-%d"},
+    },
+    "hosp_adults_booster": {
+        "preamble": 2,
+        "columns": {"Week ending": "date", **dict.fromkeys(BOOSTER_HOSPITALIZATION_RATES, "float64")},
+        "dates": {"Week ending": "%Y-%m-%d"},
+    },
+    "hosp_age_group_booster": {
+        "preamble": 2,
+        "columns": {"Week ending": "date", "Age group": "category",
+                    **dict.fromkeys(BOOSTER_HOSPITALIZATION_RATES, "float64")},
+        "dates": {"Week ending": "%d-%m-%Y"},
+    },
+    "cdv": {
+        "columns": {"outcome": "category", "month": "str", "MMWR week": "int64", "Age group": "category",
+                    "Vaccine product": "category", **dict.fromkeys(CDV_NUMBERS, "float64"),
+                    "Continuity correction": "int64", "date": "date"},
+        "dates": {"date": "%m-%d-%Y"},
+        "replace": {"Age group": AGE_GROUP_FIXES},
+        "totals": {"Age group": "all_ages_adj"},
+    },
+    "cdv_booster": {
+        "columns": {"outcome": "category", "date": "date", "month": "str", "mmwr_week": "int64",
+                    "age_group": "category", "vaccine_product": "category", **dict.fromkeys(CDVB_NUMBERS, "float64"),
+                    "continuity_correction": "int64"},
+        "dates": {"date": "%m-%d-%Y"},
+        "replace": {"age_group": AGE_GROUP_FIXES},
+        "totals": {"age_group": "all_ages"},
+    },
+}
+# Types of the CSV parse itself: labels and dates are read as dictionaries (categories of their text, each date is
+# then parsed once), whole numbers as floats since the files end with blank rows.
+LABELS = pa.dictionary(pa.int32(), pa.string())
+READ_TYPES = {"str": pa.string(), "category": LABELS, "date": LABELS, "float64": pa.float64(), "int64": pa.float64()}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def check_columns(name, columns):
+    expected = list(SCHEMAS[name]["columns"])
+    if list(columns) != expected:
+        missing = [column for column in expected if column not in columns]
+        unexpected = [column for column in columns if column not in expected]
+        if not missing and not unexpected:
+            raise SchemaError("{}: the columns were reordered".format(name))
+        raise SchemaError("{}: the columns changed (missing: {}, unexpected: {})".format(name, missing, unexpected))
+
+
+def parse(name, path):
+    # Reads a CDC source file with the types of its schema: nothing is inferred, and a value that does not fit its
+    # type stops the parse with its row.
+    schema = SCHEMAS[name]
+    try:
+        table = csv.read_csv(path, read_options=csv.ReadOptions(skip_rows=schema.get("preamble", 0)),
+                             convert_options=csv.ConvertOptions(
+                                 column_types={column: READ_TYPES[kind] for column, kind in schema["columns"].items()},
+                                 strings_can_be_null=True))
+    except pa.ArrowInvalid as e:
+        raise SchemaError("{}: {}".format(name, e)) from e
+    return normalize(name, table.to_pandas())
+
+
+def fix_labels(values, mapping):
+    # Fixes the categories of a label column, merging a fixed label into the same label already present.
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.replace(mapping)
+    labels = values.cat.categories.map(lambda label: mapping.get(label, label))
+    categories = labels.unique()
+    codes = values.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, categories.get_indexer(labels)[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=values.index)
+
+
+def parse_dates(values, date_format):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        dates = pd.to_datetime(values.cat.categories, format=date_format)
+        return pd.Series(dates.take(values.cat.codes, allow_fill=True, fill_value=pd.NaT), index=values.index)
+    return pd.to_datetime(values, format=date_format)
+
+
+def normalize(name, data):
+    # A parsed table in the types of its schema: blank rows dropped, labels fixed and dates parsed with their format.
+    # Columns that changed or values that do not fit their type raise a SchemaError.
+    schema = SCHEMAS[name]
+    check_columns(name, data.columns)
+    data = data.dropna(how="all").reset_index(drop=True)
+    columns = {}
+    for column, kind in schema["columns"].items():
+        values = data[column]
+        if column in schema.get("replace", {}):
+            values = fix_labels(values, schema["replace"][column])
+        try:
+            if kind == "date":
+                values = parse_dates(values, schema["dates"][column])
+            elif values.dtype != kind:
+                values = values.astype(kind)
+        except (TypeError, ValueError) as e:
+            raise SchemaError("{}: column {!r} is not {}: {}".format(
+                name, column, schema["dates"].get(column, kind), e)) from e
+        columns[column] = values
+    return pd.DataFrame(columns)
+
+
+def age_groups(data, name):
+    # The age groups of a CDC table, without its all-ages rows.
+    (column, totals), = SCHEMAS[name]["totals"].items()
+    return sorted(set(data[column].dropna()) - {totals})
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from cleaning import group_order, group_starts
+
+
+def build_state_index(data, group="Province_State", date="date"):
+    # Rows sorted by (state, date) so that every state is one contiguous block with ordered dates.
+    order, codes = group_order(data, group, date)
+    if order is not None:
+        data = data.take(order)
+    data = data.reset_index(drop=True)
+    starts = np.flatnonzero(group_starts(codes))
+    stops = np.append(starts[1:], len(data))
+    states = data[group].to_numpy()[starts]
+    return {
+        "version": data.attrs.get("version"),
+        "data": data,
+        "dates": data[date].to_numpy(),
+        "bounds": {state: (start, stop) for state, start, stop in zip(states, starts, stops)},
+    }
+
+
+def as_datetime64(value, dates):
+    # Dates from the widgets and the API (datetime.date, Timestamp or ISO string) in the unit of the index.
+    return pd.Timestamp(value).to_datetime64().astype(dates.dtype)
+
+
+def state_bounds(index, state, start_date=None, end_date=None):
+    start, stop = index["bounds"].get(state, (0, 0))
+    dates = index["dates"][start:stop]
+    low = 0 if start_date is None else np.searchsorted(dates, as_datetime64(start_date, dates), side="left")
+    high = len(dates) if end_date is None else np.searchsorted(dates, as_datetime64(end_date, dates), side="right")
+    return start + low, start + max(low, high)
+
+
+def state_slice(index, state, start_date=None, end_date=None):
+    start, stop = state_bounds(index, state, start_date, end_date)
+    return index["data"].iloc[start:stop]
@@ -0,0 +1,204 @@
+import argparse
+import os
+import shutil
+import time
+from collections import defaultdict
+from urllib.request import urlopen
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import sources
+
+BASE_URL = "https://raw.githubusercontent.com/aanchal22/DAVH_Covid-19/main/data/"
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DATA_DIR = os.environ.get("COVID_DATA_DIR", os.path.join(ROOT_DIR, "data"))
+STORE_DIR = os.environ.get("COVID_STORE_DIR", os.path.join(ROOT_DIR, "store"))
+
+# The international series of the Tableau workbooks: wide, one float column per country, "null" for missing values.
+INTERNATIONAL_READ = {"encoding": "utf-8-sig", "na_values": ["null"], "keep_default_na": False}
+
+DATASETS = {
+    "covid": {
+        "file": "us_covid19_vaccine_cases_deaths_daily_count_variant.csv",
+        "categories": ["Province_State", "Country_Region", "Variant"],
+        "dates": ["date"],
+    },
+    # The CDC tables are parsed with their schemas in sources.py.
+    "hosp_adults": {"file": "adults_hospitalizations_vaccinations.csv"},
+    "hosp_age_group": {"file": "age_group_hospitalizations_vaccinations.csv"},
+    "hosp_adults_booster": {"file": "adults_hospitalizations_vaccinations_booster.csv"},
+    "hosp_age_group_booster": {"file": "age_group_hospitalizations_vaccinations_booster.csv"},
+    "cdv": {"file": "cases_deaths_vaccinations.csv"},
+    "cdv_booster": {"file": "cases_deaths_vaccinations_booster.csv"},
+    "population": {
+        "file": "state_population.csv",
+    },
+    "variant_eras": {
+        "file": "variant_eras.csv",
+        "dates": ["start", "end"],
+    },
+    "intl_cases": {
+        "file": "data-cases.csv",
+        "read": dict(INTERNATIONAL_READ, dtype=defaultdict(lambda: "float64", {"date": "str"})),
+        "dates": {"date": "%m/%d/%Y"},
+    },
+    "intl_deaths": {
+        "file": "data-death.csv",
+        "read": dict(INTERNATIONAL_READ,
+                     dtype=defaultdict(lambda: "float64", {"DAY": "int64", "Date for China": "str"})),
+        "dates": {"Date for China": "%m/%d/%Y"},
+    },
+    "intl_vaccinations": {
+        "file": "data-vaccination.csv",
+        "read": dict(INTERNATIONAL_READ, dtype=defaultdict(lambda: "float64", {"Date": "str"}),
+                     usecols=lambda column: column not in ("X.1", "X.2")),
+        "dates": {"Date": "%d/%m/%Y"},
+    },
+    "counties": {
+        "file": "time_series_covid19_deaths_US.csv",
+        "url": "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/"
+               "csse_covid_19_time_series/time_series_covid19_deaths_US.csv",
+        "categories": ["Province_State"],
+    },
+}
+
+
+def source_path(name, data_dir=None):
+    return os.path.join(data_dir or DATA_DIR, DATASETS[name]["file"])
+
+
+def source_url(name):
+    return DATASETS[name].get("url", BASE_URL + DATASETS[name]["file"])
+
+
+def check_sources(names, data_dir=None):
+    missing = [source_path(name, data_dir) for name in names if not os.path.exists(source_path(name, data_dir))]
+    if missing:
+        raise FileNotFoundError("missing source files (`python store.py fetch` downloads them): {}".format(
+            ", ".join(missing)))
+
+
+def store_path(name, store_dir=None):
+    return os.path.join(store_dir or STORE_DIR, name + ".feather")
+
+
+def file_version(path):
+    if not os.path.exists(path):
+        return path
+    stat = os.stat(path)
+    return "{}-{}".format(stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_version(name, store_dir=None, data_dir=None):
+    path = store_path(name, store_dir)
+    if not os.path.exists(path) and name in DATASETS:
+        path = source_path(name, data_dir)
+    return file_version(path)
+
+
+def read_source(name, data_dir=None):
+    check_sources([name], data_dir)
+    path = source_path(name, data_dir)
+    if name in sources.SCHEMAS:
+        data = sources.parse(name, path)
+    else:
+        data = convert_source(name, pd.read_csv(path, **DATASETS[name].get("read", {})))
+    data.attrs["version"] = file_version(path)
+    return data
+
+
+def convert_source(name, data):
+    # The cleanup of a freshly parsed source file: dates and categorical columns.
+    if name in sources.SCHEMAS:
+        return sources.normalize(name, data)
+    spec = DATASETS[name]
+    # Dates are a list of columns, or a dict of columns to their format.
+    dates = spec.get("dates", [])
+    for column in dates:
+        data[column] = pd.to_datetime(data[column], format=dates[column] if isinstance(dates, dict) else None)
+    for column in spec.get("categories", []):
+        data[column] = data[column].astype("category")
+    return data
+
+
+def write_store(name, data, store_dir=None, compression="uncompressed"):
+    path = store_path(name, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    tmp_path = path + ".tmp"
+    feather.write_feather(table, tmp_path, compression=compression)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load(name, store_dir=None, data_dir=None):
+    path = store_path(name, store_dir)
+    if not os.path.exists(path):
+        return read_source(name, data_dir)
+    # Uncompressed files are mapped and read in place; lz4 or zstd ones are decompressed into memory.
+    data = feather.read_table(path, memory_map=True).to_pandas()
+    data.attrs["version"] = file_version(path)
+    return data
+
+
+def ingest(names=None, data_dir=None, store_dir=None, compression="uncompressed"):
+    names = list(names or DATASETS)
+    check_sources(names, data_dir)
+    results = {}
+    for name in names:
+        start = time.perf_counter()
+        data = read_source(name, data_dir)
+        path = write_store(name, data, store_dir, compression)
+        results[name] = path
+        print("{}: {} rows -> {} ({:.2f}s)".format(name, len(data), path, time.perf_counter() - start))
+    return results
+
+
+def fetch(names=None, data_dir=None, force=False):
+    # The only step that needs internet access: downloads the source files missing from the data directory.
+    for name in names or DATASETS:
+        path = source_path(name, data_dir)
+        if os.path.exists(path) and not force:
+            continue
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with urlopen(source_url(name)) as response, open(tmp_path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        os.replace(tmp_path, path)
+        print("{}: {} -> {} ({:.2f}s)".format(name, source_url(name), path, time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline columnar store for the dashboard datasets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Convert the source CSVs into Feather files")
+    ingest_parser.add_argument("datasets", nargs="*", help="Datasets to ingest (default: all)")
+    ingest_parser.add_argument("--data-dir", default=DATA_DIR)
+    ingest_parser.add_argument("--store-dir", default=STORE_DIR)
+    ingest_parser.add_argument("--compression", default="uncompressed", choices=["lz4", "zstd", "uncompressed"],
+                               help="lz4 and zstd files are smaller but cannot be memory-mapped")
+
+    fetch_parser = subparsers.add_parser("fetch", help="Download the source CSVs missing from the data directory")
+    fetch_parser.add_argument("datasets", nargs="*", help="Datasets to download (default: all)")
+    fetch_parser.add_argument("--data-dir", default=DATA_DIR)
+    fetch_parser.add_argument("--force", action="store_true", help="Download the files present too")
+
+    args = parser.parse_args()
+    unknown = sorted(set(getattr(args, "datasets", [])) - set(DATASETS))
+    if unknown:
+        parser.error("unknown datasets: {}".format(", ".join(unknown)))
+    if args.command == "ingest":
+        try:
+            ingest(args.datasets or None, args.data_dir, args.store_dir, args.compression)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+    elif args.command == "fetch":
+        fetch(args.datasets or None, args.data_dir, args.force)
+
+
+if __name__ == "__main__":
+    main()
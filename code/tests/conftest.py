@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of the code directory import one another by their flat names, as when run from there.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
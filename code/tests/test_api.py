@@ -0,0 +1,52 @@
+import json
+import os
+
+import anyio
+import pandas as pd
+from starlette.requests import Request
+
+import api
+import data_cache
+import store
+from benchmarks.suite import write_source
+from benchmarks.synthetic import make_covid_data, make_population, make_variant_eras
+
+STATE = "Alabama"
+
+
+def get(app, path, query, path_params):
+    route = next(route for route in app.routes if route.path == path)
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": [],
+             "path_params": path_params, "app": app}
+    return anyio.run(route.endpoint, Request(scope)).body
+
+
+def test_state_series_follow_reingested_variant_eras(tmp_path, monkeypatch):
+    # With the refresher off nothing reloads load_data between the two requests: only the response key can tell
+    # that the eras it labels the rows with have changed.
+    monkeypatch.setattr(store, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(store, "STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(data_cache, "REFRESH_SECONDS", 0)
+    os.makedirs(store.DATA_DIR)
+    data_cache.clear()
+    api.RESPONSE_CACHE.clear()
+    write_source("covid", make_covid_data(3, "2021-06-01", "2021-09-30"), store.DATA_DIR)
+    write_source("population", make_population(3), store.DATA_DIR)
+    write_source("variant_eras", make_variant_eras(), store.DATA_DIR)
+    store.ingest(["covid", "population", "variant_eras"])
+
+    app = api.create_app(prefetch=False)
+    app.state.limiter = anyio.CapacityLimiter(1)
+    query = "columns=date,Variant"
+    before = json.loads(get(app, "/states/{state}", query, {"state": STATE}))["columns"]
+    assert set(before["Variant"]) == {"Delta", "Omicron"}
+
+    eras = make_variant_eras()
+    eras["Variant"] = ["Alpha", "Delta", "Mu"]
+    write_source("variant_eras", eras, store.DATA_DIR)
+    store.ingest(["variant_eras"])
+
+    after = json.loads(get(app, "/states/{state}", query, {"state": STATE}))["columns"]
+    assert after["date"] == before["date"]
+    assert set(after["Variant"]) == {"Delta", "Mu"}
+    data_cache.clear()
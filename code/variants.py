@@ -0,0 +1,71 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import store
+
+NAME = "variant_eras"
+# Days on the shared axis given to each era table: every date since 1970 +/- 1400 years fits in one.
+TABLE_DAYS = 1 << 20
+
+
+def axis_days(dates, missing):
+    # Days since 1970 shifted into [0, TABLE_DAYS), with `missing` for NaT.
+    days = np.asarray(dates, dtype="datetime64[D]")
+    return np.where(np.isnat(days), missing, days.astype("int64") + TABLE_DAYS // 2)
+
+
+def table_offsets(states, tables):
+    # Where each row's table starts on the shared axis: 0 for the eras without a state, then one per state.
+    if not len(tables):
+        return np.zeros(len(states), dtype="int64")
+    codes, uniques = pd.factorize(states)
+    return (np.append(tables.get_indexer(uniques), -1)[codes] + 1) * TABLE_DAYS
+
+
+def label_variants(data, eras, group="Province_State", date="date"):
+    # The era holding each row's date, from the eras of the row's state when the table has any, else from the
+    # eras without a state. The tables are laid end to end on one axis of days, so a single searchsorted over the
+    # era ends labels every row. Eras of a table must not overlap; dates outside every era, and NaT, get NaN.
+    if group not in eras:
+        eras = eras.assign(**{group: np.nan})
+    tables = pd.Index(eras[group].dropna().unique())
+    offsets = table_offsets(eras[group], tables)
+    starts = offsets + axis_days(eras["start"], 0)
+    ends = offsets + axis_days(eras["end"], TABLE_DAYS - 1)
+    order = np.argsort(ends, kind="stable")
+    starts, ends = starts[order], ends[order]
+    names = pd.Index(eras["Variant"].unique())
+    codes = names.get_indexer(eras["Variant"])[order]
+
+    # A missing date has no place on the axis: its key is only a placeholder and the row is masked out below.
+    known = ~np.isnat(np.asarray(data[date], dtype="datetime64[D]"))
+    keys = table_offsets(data[group], tables) + axis_days(data[date], 0)
+    position = np.minimum(np.searchsorted(ends, keys, side="left"), len(ends) - 1)
+    inside = known & (starts[position] <= keys) & (keys <= ends[position])
+    return pd.Categorical.from_codes(np.where(inside, codes[position], -1), categories=names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Label the fused daily counts with the variant eras")
+    parser.add_argument("input", nargs="?",
+                        default=os.path.join(store.DATA_DIR, "us_covid19_vaccine_cases_deaths_daily_count.csv"))
+    parser.add_argument("output", nargs="?", default=os.path.join(store.DATA_DIR, store.DATASETS["covid"]["file"]))
+    parser.add_argument("--data-dir", default=store.DATA_DIR, help="Directory holding the era table")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = pd.read_csv(args.input)
+    data["date"] = pd.to_datetime(data["date"])
+    eras = store.read_source(NAME, args.data_dir)
+    data["Variant"] = label_variants(data, eras)
+    data["date"] = data["date"].dt.strftime("%Y-%m-%d")
+    data.to_csv(args.output, index=False)
+    print("{} rows labelled -> {} ({:.2f}s)".format(len(data), args.output, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()